@@ -1,37 +1,268 @@
-from flask import Flask, request, jsonify
-from automation import process_single_expense
+import json
+import re
+import threading
+import time
+from flask import Flask, Response, g, request, jsonify, url_for
+from automation import (
+    process_single_expense,
+    process_expense_batch,
+    current_driver_pool,
+    get_driver_pool,
+    PoolExhausted,
+    DRIVER_POOL_SIZE,
+)
+from job_queue import JobQueue, JobWorkers, JobFailed
+from metrics import (
+    BROWSER_POOL_EVENTS,
+    BROWSER_SESSIONS,
+    CONTENT_TYPE,
+    EXPENSES,
+    HTTP_REQUEST_SECONDS,
+    JOBS,
+    REGISTRY,
+)
 
 app = Flask(__name__)
 
+REQUIRED_FIELDS = ["booking_id", "vendor_name", "property_name", "amount"]
+MAX_BATCH_SIZE = 500
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+# booking IDs end up in file names (bill PDF, error screenshot)
+BOOKING_ID_PATTERN = re.compile(r"[A-Za-z0-9-]+")
+
+
+def validate_expense(data):
+    """
+    (job payload, None) for a valid expense, or (None, error message)
+    """
+    if not isinstance(data, dict):
+        return None, "Expense must be a JSON object"
+    if not all(data.get(field) for field in REQUIRED_FIELDS):
+        return None, "Missing required fields"
+    payload = {field: data.get(field) for field in REQUIRED_FIELDS}
+    if isinstance(payload["booking_id"], bool) or not isinstance(payload["booking_id"], (str, int)):
+        return None, "booking_id must be a string or a number"
+    payload["booking_id"] = str(payload["booking_id"]).strip()
+    if not BOOKING_ID_PATTERN.fullmatch(payload["booking_id"]):
+        return None, "booking_id may only contain letters, digits and hyphens"
+    payload["sub"] = data.get("sub")
+    return payload, None
+
+
+def read_expense_batch():
+    """
+    (expenses, errors) from a JSON array body or an NDJSON body, one expense
+    per line. errors hold the index and message of every unusable item
+    """
+    body = request.get_data(as_text=True)
+    if request.mimetype in NDJSON_TYPES:
+        items, errors = [], []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                errors.append({"index": len(items), "message": f"Invalid JSON: {e}"})
+                items.append(None)
+        if errors:
+            return None, errors
+    else:
+        try:
+            items = json.loads(body)
+        except ValueError as e:
+            return None, [{"index": None, "message": f"Invalid JSON: {e}"}]
+        if not isinstance(items, list):
+            return None, [{"index": None, "message": "Expected a JSON array of expenses"}]
+
+    if not items:
+        return None, [{"index": None, "message": "No expenses given"}]
+    if len(items) > MAX_BATCH_SIZE:
+        return None, [{"index": None, "message": f"At most {MAX_BATCH_SIZE} expenses per batch"}]
+
+    expenses, errors = [], []
+    for index, item in enumerate(items):
+        payload, message = validate_expense(item)
+        if message:
+            errors.append({"index": index, "message": message})
+        expenses.append(payload)
+    return (None, errors) if errors else (expenses, [])
+
+
+def run_expense_job(payload):
+    try:
+        success = process_single_expense(
+            payload["booking_id"],
+            payload["vendor_name"],
+            payload["property_name"],
+            payload["amount"],
+            payload.get("sub"),
+            # a job cut off by a crash may already be on the admin site
+            confirm_duplicate=not payload.get("resumed")
+        )
+    except PoolExhausted:
+        # nothing was attempted; the job is retried
+        raise
+    except Exception:
+        EXPENSES.labels("single", "failed").inc()
+        raise
+    EXPENSES.labels("single", "success" if success else "failed").inc()
+    if not success:
+        raise JobFailed("Logging failed")
+    return {"message": "Expense logged"}
+
+
+def run_expense_batch_job(payload):
+    results = process_expense_batch(payload["expenses"], confirm_duplicate=not payload.get("resumed"))
+    failed = sum(1 for r in results if r["status"] != "success")
+    EXPENSES.labels("batch", "success").inc(len(results) - failed)
+    EXPENSES.labels("batch", "failed").inc(failed)
+    summary = {
+        "total": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results
+    }
+    if failed:
+        raise JobFailed(f"{failed} of {len(results)} expenses failed", summary)
+    return summary
+
+
+_job_queue = None
+_job_workers = None
+_jobs_lock = threading.Lock()
+
+
+def get_job_queue():
+    """
+    The process-wide JobQueue, opened on first use rather than at import:
+    opening it takes this process's owner lock and queues again the jobs of
+    dead processes
+    """
+    global _job_queue, _job_workers
+    with _jobs_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+            # one worker per pooled browser; more would only wait on a lease
+            _job_workers = JobWorkers(
+                _job_queue,
+                {"expense": run_expense_job, "expense_batch": run_expense_batch_job},
+                workers=DRIVER_POOL_SIZE,
+                retry_on=(PoolExhausted,)
+            )
+        return _job_queue
+
+
+def start_job_workers():
+    get_job_queue()
+    _job_workers.start()
+
+
+# ------------------ Metrics ------------------
+POOL_EVENTS = ("leases", "started", "start_failures", "recycled", "crashed", "timeouts")
+
+
+def collect_job_counts():
+    for status, count in get_job_queue().counts().items():
+        JOBS.labels(status).set(count)
+
+
+def collect_pool_stats():
+    pool = current_driver_pool()
+    if pool is None:
+        return
+    stats = pool.stats()
+    for state in ("idle", "leased", "starting"):
+        BROWSER_SESSIONS.labels(state).set(stats[state])
+    for event in POOL_EVENTS:
+        BROWSER_POOL_EVENTS.labels(event).set(stats[event])
+
+
+REGISTRY.add_collector(collect_job_counts)
+REGISTRY.add_collector(collect_pool_stats)
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        HTTP_REQUEST_SECONDS.labels(request.method, endpoint, response.status_code).observe(
+            time.perf_counter() - started
+        )
+    return response
+
+
 @app.route('/log-expense', methods=['POST'])
 def log_expense():
     try:
-        data = request.json
+        payload, message = validate_expense(request.json)
+        if message:
+            return jsonify({"status": "error", "message": message}), 400
 
-        booking_id = data.get("booking_id")
-        vendor_name = data.get("vendor_name")
-        property_name = data.get("property_name")
-        amount = data.get("amount")
-        sub_category = data.get("sub")
+        job_id = get_job_queue().enqueue("expense", payload)
+        start_job_workers()
 
-        if not all([booking_id, vendor_name, property_name, amount]):
-            return jsonify({"status": "error", "message": "Missing required fields"}), 400
+        status_url = url_for("job_status", job_id=job_id)
+        return jsonify({"status": "queued", "job_id": job_id, "status_url": status_url}), 202, {"Location": status_url}
 
-        success = process_single_expense(
-            booking_id, vendor_name, property_name, amount, sub_category
-        )
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/log-expenses', methods=['POST'])
+def log_expenses():
+    try:
+        expenses, errors = read_expense_batch()
+        if errors:
+            return jsonify({"status": "error", "message": "Invalid batch", "errors": errors}), 400
 
-        if success:
-            return jsonify({"status": "success", "message": "Expense logged"}), 200
-        else:
-            return jsonify({"status": "error", "message": "Logging failed"}), 500
+        job_id = get_job_queue().enqueue("expense_batch", {"expenses": expenses})
+        start_job_workers()
+
+        status_url = url_for("job_status", job_id=job_id)
+        return jsonify({
+            "status": "queued",
+            "job_id": job_id,
+            "count": len(expenses),
+            "status_url": status_url
+        }), 202, {"Location": status_url}
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    return jsonify(job), 200
+
+@app.route('/jobs', methods=['GET'])
+def job_counts():
+    return jsonify(get_job_queue().counts()), 200
+
+@app.route('/pool', methods=['GET'])
+def pool_stats():
+    # never start browsers from a monitoring request
+    pool = current_driver_pool()
+    if pool is None:
+        return jsonify({"size": DRIVER_POOL_SIZE, "started": False, "idle": 0, "leased": 0, "starting": 0}), 200
+    return jsonify({**pool.stats(), "started": True}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
 @app.route('/', methods=['GET'])
 def home():
     return "StayVista Automation Flask Server Running"
 
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=5000)
+    get_driver_pool()  # start logging the browsers in before the first request
+    start_job_workers()  # pick up jobs left over from the last run
+    app.run(host="0.0.0.0", port=5000, threaded=True)
@@ -0,0 +1,414 @@
+import atexit
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from bill_generation import (
+    Select2Catalog,
+    SessionCache,
+    driver_is_alive,
+    log,
+    log_expense,
+    login_with_session_cache,
+    navigate_to_expenses_add_page,
+    render_invoice_bytes,
+    render_invoices_parallel,
+    render_pool,
+    reset_expense_form,
+    start_logged_in_driver,
+)
+from timing import TIMER
+
+DRIVER_POOL_SIZE = int(os.getenv("DRIVER_POOL_SIZE", "2"))
+DRIVER_MAX_USES = int(os.getenv("DRIVER_MAX_USES", "50"))
+DRIVER_LEASE_TIMEOUT = float(os.getenv("DRIVER_LEASE_TIMEOUT", "120"))
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(os.cpu_count() or 1)))
+
+API_BILLS_FOLDER = "/tmp/stayvista_invoices_pdf/api"
+DEFAULT_HEAD = "Cook Arranged"
+DEFAULT_COST_BEARER = "VISTA"
+
+
+class PoolExhausted(Exception):
+    """
+    No browser became free within the lease timeout
+    """
+
+
+class PooledDriver:
+    def __init__(self, driver, slot_id):
+        self.driver = driver
+        self.id = slot_id
+        self.uses = 0
+        self.form_ready = False
+        self.started_at = time.time()
+
+
+# ------------------ Driver Pool ------------------
+class DriverPool:
+    """
+    A fixed number of logged-in Chrome sessions shared by the server threads.
+    lease() hands out an idle browser, checking it is still alive first.
+    Browsers are replaced in the background after max_uses expenses or a
+    crash, so a request only pays for Chrome startup and login when the pool
+    is cold
+    """
+
+    def __init__(self, username, password, size=DRIVER_POOL_SIZE, max_uses=DRIVER_MAX_USES):
+        self.username = username
+        self.password = password
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.session_cache = SessionCache(username, password)
+        self.catalog = Select2Catalog.load()
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._leased = 0
+        self._starting = 0
+        self._next_id = 0
+        self._closed = False
+        self.counters = {
+            "leases": 0,
+            "started": 0,
+            "start_failures": 0,
+            "recycled": 0,
+            "crashed": 0,
+            "timeouts": 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _count(self, name):
+        with self._cond:
+            self.counters[name] += 1
+
+    def _start_driver(self):
+        with self._cond:
+            self._next_id += 1
+            slot_id = self._next_id
+        started = time.perf_counter()
+        try:
+            driver = start_logged_in_driver(self.username, self.password, self.session_cache)
+        except Exception as e:
+            log(f"❌ Pool browser {slot_id} failed to start: {e}")
+            driver = None
+        if driver is None:
+            self._count("start_failures")
+            return None
+        self._count("started")
+        log(f"Pool browser {slot_id} ready in {time.perf_counter() - started:.1f}s")
+        return PooledDriver(driver, slot_id)
+
+    @staticmethod
+    def _quit(slot):
+        try:
+            slot.driver.quit()
+        except Exception:
+            pass
+
+    def _warm_one(self):
+        slot = self._start_driver()
+        with self._cond:
+            self._starting -= 1
+            if slot is not None and not self._closed:
+                self._idle.append(slot)
+                slot = None
+            self._cond.notify()
+        if slot is not None:
+            self._quit(slot)
+
+    def warm(self, count=None):
+        """
+        Start browsers in the background until the pool is full (or count more)
+        """
+        with self._cond:
+            free = self.size - len(self._idle) - self._leased - self._starting
+            count = free if count is None else min(count, free)
+            self._starting += max(0, count)
+        for _ in range(max(0, count)):
+            threading.Thread(target=self._warm_one, daemon=True, name="driver-pool-warm").start()
+
+    @contextmanager
+    def lease(self, timeout=DRIVER_LEASE_TIMEOUT):
+        """
+        Borrow a logged-in browser (a PooledDriver) for one expense
+        """
+        requested = time.perf_counter()
+        deadline = requested + timeout
+        slot = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("driver pool is closed")
+                if self._idle:
+                    slot = self._idle.pop()
+                    break
+                if len(self._idle) + self._leased + self._starting < self.size:
+                    # nothing warm and room left: start one for this request
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self.counters["timeouts"] += 1
+                    raise PoolExhausted(f"no browser free after {timeout:g}s")
+                self._cond.wait(remaining)
+            self._leased += 1
+            self.counters["leases"] += 1
+
+        try:
+            if slot is not None and not driver_is_alive(slot.driver):
+                log(f"⚠️ Pool browser {slot.id} died while idle, replacing it")
+                self._count("crashed")
+                self._quit(slot)
+                slot = None
+            if slot is None:
+                slot = self._start_driver()
+            if slot is None:
+                raise RuntimeError("could not start a logged-in browser")
+        except BaseException:
+            with self._cond:
+                self._leased -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.perf_counter() - requested
+        TIMER.add("pool.lease_wait", waited)
+        with self._cond:
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            yield slot
+        finally:
+            self._release(slot)
+
+    def _release(self, slot):
+        slot.uses += 1
+        healthy = driver_is_alive(slot.driver)
+        recycle = not healthy or slot.uses >= self.max_uses
+        if not healthy:
+            log(f"⚠️ Pool browser {slot.id} crashed, replacing it")
+        with self._cond:
+            self._leased -= 1
+            if not healthy:
+                self.counters["crashed"] += 1
+            elif recycle:
+                self.counters["recycled"] += 1
+            if not (recycle or self._closed):
+                self._idle.append(slot)
+                slot = None
+            self._cond.notify()
+        if slot is not None:
+            self._quit(slot)
+            if recycle and not self._closed:
+                self.warm(1)
+
+    def stats(self):
+        with self._cond:
+            leases = self.counters["leases"]
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "leased": self._leased,
+                "starting": self._starting,
+                "utilization": round(self._leased / self.size, 3),
+                "max_uses": self.max_uses,
+                "idle_uses": sorted(slot.uses for slot in self._idle),
+                "avg_lease_wait_s": round(self._wait_total / leases, 3) if leases else 0.0,
+                "max_lease_wait_s": round(self._wait_max, 3),
+                **self.counters,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for slot in idle:
+            self._quit(slot)
+        try:
+            self.catalog.save()
+        except OSError:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def current_driver_pool():
+    """
+    The process-wide DriverPool if it has been started, without starting it
+    """
+    return _pool
+
+
+def get_driver_pool():
+    """
+    The process-wide DriverPool, created and warmed on first use
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DriverPool(os.getenv("EMAIL"), os.getenv("PASSWORD"))
+            _pool.warm()
+            atexit.register(_pool.close)
+        return _pool
+
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def get_render_pool():
+    """
+    The process-wide invoice render pool, started on the first batch and
+    kept for the next ones so each batch doesn't pay for new workers
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = render_pool(RENDER_WORKERS)
+            atexit.register(_render_pool.shutdown)
+        return _render_pool
+
+
+# ------------------ Single Expense ------------------
+def _open_expense_form(pool, slot):
+    if slot.form_ready and reset_expense_form(slot.driver):
+        return True
+    if navigate_to_expenses_add_page(slot.driver):
+        return True
+    # most likely the session expired while the browser sat in the pool
+    log(f"Pool browser {slot.id}: expense page unavailable, logging in again")
+    return (
+        login_with_session_cache(slot.driver, pool.username, pool.password, pool.session_cache)
+        and navigate_to_expenses_add_page(slot.driver)
+    )
+
+
+def _log_on_slot(pool, slot, unqid, expense, pdf_bytes, confirm_duplicate=True):
+    """
+    Fill and submit one expense in a leased browser. True on success.
+    confirm_duplicate=False for a job that may already have been submitted
+    """
+    TIMER.begin(unqid, booking_id=str(expense["booking_id"]), source="api", browser=slot.id)
+    success = False
+    try:
+        if not _open_expense_form(pool, slot):
+            slot.form_ready = False
+            return False
+        if not pool.catalog.scraped:
+            pool.catalog.scrape(slot.driver)
+
+        slot.form_ready = False
+        success = bool(log_expense(
+            slot.driver,
+            unqid,
+            expense["booking_id"],
+            DEFAULT_HEAD,
+            expense.get("sub") or "",
+            expense["vendor_name"],
+            expense["property_name"],
+            expense["amount"],
+            DEFAULT_COST_BEARER,
+            API_BILLS_FOLDER,
+            pdf_bytes,
+            pool.catalog,
+            confirm_duplicate=confirm_duplicate
+        ))
+        slot.form_ready = success
+        return success
+    finally:
+        TIMER.finish(ok=success)
+        # upload_bill writes the PDF for Chrome's file input; it isn't needed after
+        try:
+            os.remove(os.path.join(API_BILLS_FOLDER, f"{unqid}.pdf"))
+        except OSError:
+            pass
+
+
+def process_single_expense(booking_id, vendor_name, property_name, amount, sub_category, confirm_duplicate=True):
+    """
+    Log one expense through a pooled, already logged-in browser. sub_category
+    is the free-text expense description. Pass confirm_duplicate=False when
+    re-running a job that was cut off, so the site's duplicate popup is taken
+    as "already logged" instead of confirmed. Returns True on success
+    """
+    pool = get_driver_pool()
+    expense = {
+        "booking_id": booking_id,
+        "vendor_name": vendor_name,
+        "property_name": property_name,
+        "amount": amount,
+        "sub": sub_category,
+    }
+    unqid = f"api-{booking_id}-{uuid.uuid4().hex[:8]}"
+    pdf_bytes = render_invoice_bytes(booking_id, vendor_name, property_name, amount)
+
+    with pool.lease() as slot:
+        success = _log_on_slot(pool, slot, unqid, expense, pdf_bytes, confirm_duplicate)
+    pool.catalog.save()
+    return success
+
+
+# ------------------ Expense Batch ------------------
+def _item_result(index, expense, success, message):
+    return {
+        "index": index,
+        "booking_id": expense["booking_id"],
+        "status": "success" if success else "error",
+        "message": message,
+    }
+
+
+def process_expense_batch(expenses, confirm_duplicate=True):
+    """
+    Log many expenses through one leased browser. Invoices are all rendered
+    first, across the render pool. expenses are dicts with the /log-expense
+    fields; returns one result dict per expense, in order. Raises
+    PoolExhausted only if no expense was attempted, so the batch can be
+    retried. confirm_duplicate as for process_single_expense
+    """
+    pool = get_driver_pool()
+    batch_id = uuid.uuid4().hex[:8]
+    jobs = [
+        (f"api-{e['booking_id']}-{batch_id}-{i}", e["booking_id"], e["vendor_name"], e["property_name"], e["amount"], API_BILLS_FOLDER)
+        for i, e in enumerate(expenses)
+    ]
+
+    results = [None] * len(expenses)
+    pending = []
+    for i, (job, pdf_bytes, error) in enumerate(render_invoices_parallel(jobs, RENDER_WORKERS, in_memory=True, pool=get_render_pool())):
+        if error:
+            results[i] = _item_result(i, expenses[i], False, f"Invoice failed: {error}")
+        else:
+            pending.append((i, job[0], pdf_bytes))
+
+    attempted = False
+    while pending:
+        try:
+            with pool.lease() as slot:
+                log(f"Batch {batch_id}: {len(pending)} expenses on pool browser {slot.id}")
+                while pending:
+                    i, unqid, pdf_bytes = pending.pop(0)
+                    attempted = True
+                    try:
+                        success = _log_on_slot(pool, slot, unqid, expenses[i], pdf_bytes, confirm_duplicate)
+                        message = "Expense logged" if success else "Logging failed"
+                    except Exception as e:
+                        success, message = False, f"{type(e).__name__}: {e}"
+                    results[i] = _item_result(i, expenses[i], success, message)
+                    if not driver_is_alive(slot.driver):
+                        # the lease recycles it; carry on with another browser
+                        break
+        except (PoolExhausted, RuntimeError) as e:
+            if not attempted:
+                raise
+            for i, _, _ in pending:
+                results[i] = _item_result(i, expenses[i], False, str(e))
+            pending = []
+
+    pool.catalog.save()
+    return results
@@ -0,0 +1,64 @@
+import argparse
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+LAZY = """
+import bill_generation
+"""
+
+# Everything the module used to do at import time
+EAGER = """
+import bill_generation as b
+b._register_fonts()
+import invoice_template
+b._load_selenium()
+try:
+    b.get_gs_client()
+    b.get_drive_service()
+    b.get_sheets_service()
+except Exception:
+    # no credentials here: still pay for importing the client libraries
+    import gspread, googleapiclient.discovery, google.oauth2.service_account
+"""
+
+TIMER = """
+import time
+_start = time.perf_counter()
+{body}
+print(time.perf_counter() - _start)
+"""
+
+
+def measure(body, repeat):
+    code = TIMER.format(body=body)
+    best = float("inf")
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        best = min(best, float(out.strip().splitlines()[-1]))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time of bill_generation, lazy vs eager client setup")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per variant (best is kept)")
+    args = parser.parse_args()
+
+    lazy = measure(LAZY, args.repeat)
+    eager = measure(EAGER, args.repeat)
+
+    print(f"import bill_generation  : {lazy * 1000:8.1f} ms")
+    print(f"+ clients/fonts/selenium: {eager * 1000:8.1f} ms")
+    print(f"saved at import         : {(eager - lazy) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import os
+import statistics
+import time
+import bill_generation as b
+
+VARIANTS = {
+    "default profile": dict(block_resources=False, lean=False),
+    "lean + blocking": dict(block_resources=True, lean=True),
+}
+
+
+def time_login_page(driver, repeat):
+    times = []
+    for _ in range(repeat):
+        driver.delete_all_cookies()
+        start = time.perf_counter()
+        driver.get(f"{b.ADMIN_URL}/dashboard")
+        b.WebDriverWait(driver, 30).until(
+            b.EC.presence_of_element_located((b.By.NAME, "email"))
+        )
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def time_expenses_page(driver, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if not b.navigate_to_expenses_add_page(driver):
+            raise RuntimeError("expenses/log did not load")
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def bench(variant, repeat, username, password):
+    driver = b.setup_driver(**variant)
+    try:
+        results = {"login": time_login_page(driver, repeat)}
+        if username and password:
+            if not b.login_with_session_cache(driver, username, password):
+                raise RuntimeError("login failed")
+            results["expenses/log"] = time_expenses_page(driver, repeat)
+        return results
+    finally:
+        driver.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Page-ready time of the admin pages, default vs lean Chrome")
+    parser.add_argument("--repeat", type=int, default=5, help="loads per page and variant")
+    args = parser.parse_args()
+
+    username = os.getenv("EMAIL")
+    password = os.getenv("PASSWORD")
+    if not (username and password):
+        print("EMAIL/PASSWORD not set, timing the login page only")
+
+    for name, variant in VARIANTS.items():
+        for page, times in bench(variant, args.repeat, username, password).items():
+            print(
+                f"{name:<16} {page:<13} first {times[0] * 1000:7.0f} ms"
+                f"  median {statistics.median(times) * 1000:7.0f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
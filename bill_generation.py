@@ -1,63 +1,174 @@
 import os
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+import io
+import json
+import base64
+import hashlib
+import random
+import queue
+import threading
+import multiprocessing
+from functools import partial, wraps
+from urllib.parse import quote, urljoin
 from dotenv import load_dotenv
-from oauth2client.service_account import ServiceAccountCredentials
-from googleapiclient.discovery import build
 from datetime import datetime
 import pytz
-import gspread
-from googleapiclient.http import MediaFileUpload
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select, WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException
 import time
-from google.oauth2 import service_account
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from metrics import RETRIES
+from timing import TIMER, percentile
+
+# Google API clients, Selenium and ReportLab are imported on first use (see
+# get_creds, _load_selenium, _register_fonts) so importing this module stays
+# cheap and does not need secrets
 
 # Load environment variables
 load_dotenv()
 ist = pytz.timezone('Asia/Kolkata')
 now_ist = datetime.now(ist)
 
-with open("credentials.json", "w") as f:
-    f.write(os.getenv("GOOGLE_SHEET_CONNECTOR"))
-
 # Google Sheets Auth
 scope = ["https://www.googleapis.com/auth/drive",
     "https://www.googleapis.com/auth/spreadsheets"]
 
+_init_lock = threading.RLock()
 
-creds = service_account.Credentials.from_service_account_file(
-    "credentials.json",
-    scopes=scope
-)
 
-gs_client = gspread.authorize(creds)    
-drive_service = build('drive', 'v3', credentials=creds)
-sheets_service = build("sheets", "v4", credentials=creds)
+def _init_once(factory):
+    """
+    Cache the result of a zero-argument factory; thread-safe, built on first call
+    """
+    result = []
 
+    @wraps(factory)
+    def wrapper():
+        if not result:
+            with _init_lock:
+                if not result:
+                    result.append(factory())
+        return result[0]
 
-# Try to register DejaVu font, but fall back to default if not found
-try:
-    pdfmetrics.registerFont(TTFont('DejaVu', 'DejaVuLGCSansCondensed.ttf'))
-    pdfmetrics.registerFont(TTFont('DejaVu-Bold', 'DejaVuLGCSansCondensed-Bold.ttf'))
-    DEFAULT_FONT = 'DejaVu'
-except:
-    print("Note: DejaVu font not found. Using default font.")
-    DEFAULT_FONT = 'Helvetica'
+    return wrapper
 
-def upload_to_drive(file_path, drive_folder_id):
-    file_name = os.path.basename(file_path)
 
-    # -------- 1. Find existing files with same name in folder --------
+@_init_once
+def get_creds():
+    """
+    Service account credentials from GOOGLE_SHEET_CONNECTOR, or from a local
+    credentials.json when the variable is not set
+    """
+    from google.oauth2 import service_account
+
+    info = os.getenv("GOOGLE_SHEET_CONNECTOR")
+    if info:
+        return service_account.Credentials.from_service_account_info(
+            json.loads(info),
+            scopes=scope
+        )
+    return service_account.Credentials.from_service_account_file(
+        "credentials.json",
+        scopes=scope
+    )
+
+
+@_init_once
+def get_gs_client():
+    import gspread
+    return gspread.authorize(get_creds())
+
+
+@_init_once
+def get_drive_service():
+    from googleapiclient.discovery import build
+    return build('drive', 'v3', credentials=get_creds(), cache_discovery=False)
+
+
+@_init_once
+def get_sheets_service():
+    from googleapiclient.discovery import build
+    return build("sheets", "v4", credentials=get_creds(), cache_discovery=False)
+
+
+@_init_once
+def _register_fonts():
+    """
+    Try to register DejaVu font, but fall back to default if not found
+    """
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    try:
+        pdfmetrics.registerFont(TTFont('DejaVu', 'DejaVuLGCSansCondensed.ttf'))
+        pdfmetrics.registerFont(TTFont('DejaVu-Bold', 'DejaVuLGCSansCondensed-Bold.ttf'))
+        return 'DejaVu'
+    except:
+        print("Note: DejaVu font not found. Using default font.")
+        return 'Helvetica'
+
+
+@_init_once
+def _load_selenium():
+    """
+    Import Selenium into this module's namespace. Every helper that uses By,
+    EC, Keys, ... calls this first, so none depends on setup_driver having run
+    """
+    global webdriver, By, Select, WebDriverWait, EC, Keys, Options, TimeoutException
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import Select, WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.chrome.options import Options
+    from selenium.common.exceptions import TimeoutException
+    return True
+
+
+DRIVE_FOLDER_ID = "1St6hd_7veFTcaK7dAJC29yfmcDNQo4wf"
+DRIVE_UPLOAD_WORKERS = 8
+
+# ------------------ Drive Retries ------------------
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+def _is_retryable(error):
+    import httplib2
+    from googleapiclient.errors import HttpError
+
+    if isinstance(error, HttpError):
+        if error.resp.status in RETRYABLE_STATUS:
+            return True
+        if error.resp.status == 403:
+            try:
+                errors = json.loads(error.content.decode("utf-8"))["error"]["errors"]
+            except (ValueError, KeyError, TypeError):
+                return False
+            return any(e.get("reason") in RATE_LIMIT_REASONS for e in errors)
+        return False
+    return isinstance(error, (ConnectionError, TimeoutError, httplib2.HttpLib2Error))
+
+def execute_with_backoff(request, http=None, max_retries=6, on_retry=None, span="drive.request"):
+    """
+    Execute a Drive request (or batch), retrying quota errors, 5xx and
+    dropped connections with exponential backoff and jitter.
+    on_retry(error, attempt, delay) is called before every sleep.
+    The whole call, retries included, is timed as span
+    """
+    with TIMER.span(span):
+        for attempt in range(max_retries + 1):
+            try:
+                return request.execute(http=http)
+            except Exception as e:
+                if attempt == max_retries or not _is_retryable(e):
+                    raise
+                delay = min(32, 2 ** attempt) * random.uniform(0.5, 1.0)
+                RETRIES.labels("drive").inc()
+                if on_retry is not None:
+                    on_retry(e, attempt + 1, delay)
+                time.sleep(delay)
+
+def find_drive_files(file_name, drive_folder_id):
+    """
+    PDFs named file_name in the Drive folder, with their md5Checksum
+    """
     query = (
         f"name = '{file_name}' "
         f"and '{drive_folder_id}' in parents "
@@ -65,189 +176,424 @@ def upload_to_drive(file_path, drive_folder_id):
         f"and trashed = false"
     )
 
-    existing = drive_service.files().list(
-        q=query,
-        spaces="drive",
-        fields="files(id, name)",
-        supportsAllDrives=True,
-        includeItemsFromAllDrives=True
-    ).execute().get("files", [])
-
-    # -------- 2. Delete existing files --------
-    for file in existing:
-        drive_service.files().delete(
-            fileId=file["id"],
+    with TIMER.span("drive.list"):
+        return get_drive_service().files().list(
+            q=query,
+            spaces="drive",
+            fields="files(id, name, md5Checksum)",
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True
+        ).execute().get("files", [])
+
+def delete_drive_files(files, http=None, on_retry=None):
+    """
+    Delete Drive files in batched requests (Drive allows 100 calls per batch)
+    """
+    def report(request_id, response, exception):
+        if exception is not None:
+            print(f"⚠️ Failed to delete duplicate {request_id}: {exception}")
+        else:
+            print(f"Deleted duplicate file: {request_id}")
+
+    for start in range(0, len(files), 100):
+        batch = get_drive_service().new_batch_http_request(callback=report)
+        for file in files[start:start + 100]:
+            batch.add(
+                get_drive_service().files().delete(fileId=file["id"], supportsAllDrives=True),
+                request_id=f"{file['name']} ({file['id']})"
+            )
+        execute_with_backoff(batch, http=http, on_retry=on_retry, span="drive.delete")
+
+def upload_to_drive(file_path, drive_folder_id, data=None, existing=None, http=None, on_retry=None):
+    """
+    Upload a PDF to the Drive folder. If a file with the same name exists its
+    content is replaced in place, so the file ID (and any shared link) stays
+    the same; extra same-named duplicates are deleted. When data (the PDF bytes) is given it is streamed from memory and
+    file_path is only used for the file name. existing is the list of
+    same-named files if the caller already knows it (see DriveUploadSession).
+    http overrides the service's shared (not thread-safe) HTTP object
+    """
+    file_name = os.path.basename(file_path)
+
+    # -------- 1. Find existing files with same name in folder --------
+    if existing is None:
+        existing = find_drive_files(file_name, drive_folder_id)
+
+    # -------- 2. Clean up duplicates, keep one file to update --------
+    if len(existing) > 1:
+        delete_drive_files(existing[1:], http=http, on_retry=on_retry)
+
+    # -------- 3. Update in place, or create --------
+    from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+
+    if data is not None:
+        media = MediaIoBaseUpload(
+            io.BytesIO(data),
+            mimetype="application/pdf",
+            resumable=False
+        )
+    else:
+        media = MediaFileUpload(
+            file_path,
+            mimetype="application/pdf",
+            resumable=False
+        )
+
+    if existing:
+        request = get_drive_service().files().update(
+            fileId=existing[0]["id"],
+            media_body=media,
+            fields="id, name, md5Checksum",
             supportsAllDrives=True
-        ).execute()
-        print(f"Deleted existing file: {file['name']}")
+        )
+        return execute_with_backoff(request, http=http, on_retry=on_retry, span="drive.update")
 
-    # -------- 3. Upload new file --------
     file_metadata = {
         "name": file_name,
         "parents": [drive_folder_id]
     }
 
-    media = MediaFileUpload(
-        file_path,
-        mimetype="application/pdf",
-        resumable=False
-    )
-
-    uploaded_file = drive_service.files().create(
+    request = get_drive_service().files().create(
         body=file_metadata,
         media_body=media,
-        fields="id, name",
+        fields="id, name, md5Checksum",
         supportsAllDrives=True
-    ).execute()
+    )
 
-    return uploaded_file
+    return execute_with_backoff(request, http=http, on_retry=on_retry, span="drive.create")
 
-def create_invoice_pdf(unqid, booking_id, vendor_name, property_name, amount, output_folder):
+class DriveUploadSession:
     """
-    Create a StayVista invoice PDF for a single booking
+    Lists a Drive folder once and keeps a name -> files index current as it
+    uploads, so each upload skips the per-file "same name" list query.
+    Safe to share between threads: every thread gets its own authorized HTTP
+    object, and retries and latencies are collected for summary()
+    """
+
+    def __init__(self, drive_folder_id):
+        self.folder_id = drive_folder_id
+        self.index = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.retries = 0
+        self.failures = 0
+        self.latencies = []
+        self._load_index()
+
+    def _http(self):
+        http = getattr(self._local, "http", None)
+        if http is None:
+            import httplib2
+            import google_auth_httplib2
+            http = self._local.http = google_auth_httplib2.AuthorizedHttp(
+                get_creds(), http=httplib2.Http(timeout=60)
+            )
+        return http
+
+    def _on_retry(self, error, attempt, delay):
+        with self._lock:
+            self.retries += 1
+        status = getattr(getattr(error, "resp", None), "status", type(error).__name__)
+        print(f"⚠️ Drive {status}, retry {attempt} in {delay:.1f}s")
+
+    def _load_index(self):
+        query = (
+            f"'{self.folder_id}' in parents "
+            f"and mimeType = 'application/pdf' "
+            f"and trashed = false"
+        )
+        page_token = None
+        while True:
+            request = get_drive_service().files().list(
+                q=query,
+                spaces="drive",
+                fields="nextPageToken, files(id, name, md5Checksum)",
+                pageSize=1000,
+                pageToken=page_token,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            )
+            response = execute_with_backoff(request, http=self._http(), on_retry=self._on_retry, span="drive.list")
+            for file in response.get("files", []):
+                self.index.setdefault(file["name"], []).append(file)
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+        print(f"Indexed {sum(len(v) for v in self.index.values())} files in Drive folder")
+
+    def find(self, file_name):
+        with self._lock:
+            return list(self.index.get(file_name, []))
+
+    def upload(self, file_path, data=None):
+        file_name = os.path.basename(file_path)
+        start = time.perf_counter()
+        try:
+            uploaded = upload_to_drive(
+                file_path,
+                self.folder_id,
+                data=data,
+                existing=self.find(file_name),
+                http=self._http(),
+                on_retry=self._on_retry
+            )
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        with self._lock:
+            self.index[file_name] = [uploaded]
+            self.latencies.append(time.perf_counter() - start)
+        return uploaded
+
+    def summary(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            retries, failures = self.retries, self.failures
+        if not latencies and not failures:
+            return
+        line = f"Drive uploads: {len(latencies)} ok, {failures} failed, {retries} retries"
+        if latencies:
+            p50 = percentile(latencies, 0.5)
+            p95 = percentile(latencies, 0.95)
+            line += f", latency p50 {p50:.2f}s / p95 {p95:.2f}s / max {latencies[-1]:.2f}s"
+        print(line)
+
+# ------------------ Invoice Cache ------------------
+INVOICE_MANIFEST = "invoice_manifest.json"
+
+def invoice_cache_key(unqid, booking_id, vendor_name, property_name, amount):
+    """
+    Hash of everything that ends up in the invoice PDF
+    """
+    fields = [str(v) for v in (unqid, booking_id, vendor_name, property_name, amount)]
+    from invoice_template import TEMPLATE_VERSION
+    fields.append(TEMPLATE_VERSION)
+    return hashlib.sha256(json.dumps(fields).encode("utf-8")).hexdigest()
+
+def load_invoice_manifest(output_folder):
+    path = os.path.join(output_folder, INVOICE_MANIFEST)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_invoice_manifest(output_folder, manifest, keep=None):
+    """
+    Write the manifest atomically; with keep, drop entries and invoice PDFs
+    for other unqids so the folder only holds rows still waiting in the
+    sheet (CI caches it between runs)
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    if keep is not None:
+        manifest = {k: v for k, v in manifest.items() if k in keep}
+        for name in os.listdir(output_folder):
+            stem, ext = os.path.splitext(name)
+            if ext == ".pdf" and stem not in keep:
+                try:
+                    os.remove(os.path.join(output_folder, name))
+                except OSError:
+                    pass
+    path = os.path.join(output_folder, INVOICE_MANIFEST)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+def _file_md5(path):
+    with open(path, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+def invoice_cache_action(manifest, unqid, key, filename, session=None):
+    """
+    "skip"   - identical PDF is already on disk and in Drive
+    "render" - identical PDF is in Drive, only the local copy is missing
+    "upload" - render and upload
+    """
+    entry = (manifest or {}).get(unqid)
+    if not entry or entry.get("key") != key:
+        return "upload"
+
+    if session is not None:
+        existing = session.find(os.path.basename(filename))
+    else:
+        existing = find_drive_files(os.path.basename(filename), DRIVE_FOLDER_ID)
+    if len(existing) != 1 or existing[0].get("md5Checksum") != entry.get("md5"):
+        return "upload"
+
+    if os.path.exists(filename) and _file_md5(filename) == entry["md5"]:
+        return "skip"
+    return "render"
+
+def publish_invoice(unqid, key, filename, data, action, manifest, session=None):
+    """
+    Upload a freshly rendered invoice unless Drive already has the same bytes,
+    and record it in the manifest
+    """
+    if data is not None:
+        md5 = hashlib.md5(data).hexdigest()
+    else:
+        md5 = _file_md5(filename)
+
+    if action == "render" and md5 == manifest[unqid]["md5"]:
+        print(f"{os.path.basename(filename)} unchanged in Drive, skipping upload")
+        return
+
+    if session is not None:
+        uploaded = session.upload(filename, data=data)
+    else:
+        uploaded = upload_to_drive(filename, DRIVE_FOLDER_ID, data=data)
+    print(f"Uploaded {uploaded['name']} to Drive")
+
+    if manifest is not None:
+        manifest[unqid] = {
+            "key": key,
+            "md5": uploaded.get("md5Checksum", md5),
+            "drive_id": uploaded["id"],
+        }
+
+def render_invoice_pdf(unqid, booking_id, vendor_name, property_name, amount, output_folder):
+    """
+    Build the invoice PDF for a single booking and return its path
     """
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
+    from invoice_template import get_invoice_template
+    _register_fonts()
+
     filename = os.path.join(output_folder, f"{unqid}.pdf")
-    doc = SimpleDocTemplate(
-        filename,
-        pagesize=A4,
-        leftMargin=40,
-        rightMargin=40,
-        topMargin=40,
-        bottomMargin=40
-    )
-    # ---------- PASTEL PEACH THEME ----------
-    PEACH_BG = colors.HexColor("#FFF1E6")
-    PEACH_DARK = colors.HexColor("#E07A5F")
-    PEACH_LIGHT = colors.HexColor("#FDE8D7")
-    BORDER = colors.HexColor("#E6A57E")
-    TEXT = colors.HexColor("#333333")
-    CONTENT_WIDTH = 420
-    # ---------- STYLES ----------
-    title = ParagraphStyle(
-        "Title",
-        fontName="Helvetica-Bold",
-        fontSize=22,
-        textColor=PEACH_DARK,
-        alignment=1
-    )
-    # styles = getSampleStyleSheet()
-    vendor_style = ParagraphStyle(
-        "Vendor",
-        fontName="Helvetica-Bold",
-        fontSize=13,
-        alignment=1,
-        textColor=TEXT
-    )
-    property_style = ParagraphStyle(
-        "Property",
-        fontName="Helvetica",
-        fontSize=10,
-        alignment=1,
-        textColor=colors.grey
-    )
-    normal = ParagraphStyle(
-        "Normal",
-        fontName="Helvetica",
-        fontSize=10,
-        textColor=TEXT
-    )
-    footer_style = ParagraphStyle(
-        "Footer",
-        fontName="Helvetica",
-        fontSize=9,
-        alignment=1,
-        textColor=colors.grey
-    )
-    elements = []
-    # ---------------- MAIN CONTENT ----------------
-    content = []
-    # ---------------- HEADER ----------------
-    content.append(Paragraph("STAYVISTA", title))
-    content.append(Spacer(1, 6))
-    content.append(Paragraph("INVOICE", title))
-    content.append(Spacer(1, 20))
-    # ---------------- PAYMENT DETAILS ----------------
-    content.append(Paragraph(vendor_name, vendor_style))
-    content.append(Spacer(1, 4))
-    content.append(Paragraph(property_name, property_style))
-    content.append(Spacer(1, 4))
-    content.append(Paragraph(f"Booking ID: {booking_id}", property_style))
-    content.append(Spacer(1, 20))
-    # ---------------- ITEM TABLE ----------------
-    amt = f"Rs. {amount}"
-    items = [
-        ["Description", "Qty", "Rate", "Amount"],
-        [f"Cook Arranged – Booking {booking_id}", "1", amt, amt]
-    ]
-    item_table = Table(items, colWidths=[220, 50, 75, 75])
-    item_table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), PEACH_DARK),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("BACKGROUND", (0, 1), (-1, -1), PEACH_LIGHT),
-        ("GRID", (0, 0), (-1, -1), 0.5, BORDER),
-        ("ALIGN", (1, 1), (1, -1), "CENTER"),
-        ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
-        ("TOPPADDING", (0, 0), (-1, -1), 10),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 10),
-    ]))
-    content.append(item_table)
-    content.append(Spacer(1, 22))
-    # ---------------- TOTALS ----------------
-    totals = [
-        ["Subtotal", amt],
-        ["Tax", "Rs. 0"],
-        ["Total Amount", amt],
-        ["Amount Paid", "Rs. 0"]
-    ]
-    totals_table = Table(
-        totals,
-        colWidths=[CONTENT_WIDTH * 0.6, CONTENT_WIDTH * 0.4]
-    )
-    totals_table.setStyle(TableStyle([
-        ("BOX", (0, 0), (-1, -1), 1, PEACH_DARK),
-        ("INNERGRID", (0, 0), (-1, -1), 0.25, BORDER),
-        ("BACKGROUND", (0, 0), (-1, -1), colors.whitesmoke),
-        ("BACKGROUND", (0, 2), (-1, 3), PEACH_LIGHT),
-        ("FONTNAME", (0, 2), (-1, 3), "Helvetica-Bold"),
-        ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
-        ("LEFTPADDING", (0, 0), (-1, -1), 12),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 12),
-        ("TOPPADDING", (0, 0), (-1, -1), 8),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-    ]))
-    content.append(totals_table)
-    content.append(Spacer(1, 18))
-    # ---------------- FOOTER ----------------
-    content.append(Paragraph(
-        "This is a system-generated invoice. No signature is required.",
-        footer_style
-    ))
-    # ---------------- PEACH BACKGROUND WRAPPER ----------------
-    wrapper = Table([[content]], colWidths=[CONTENT_WIDTH])
-    wrapper.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, -1), PEACH_BG),
-        ("BOX", (0, 0), (-1, -1), 1, BORDER),
-        ("LEFTPADDING", (0, 0), (-1, -1), 20),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 20),
-        ("TOPPADDING", (0, 0), (-1, -1), 20),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 20),
-        ("ALIGN", (0, 0), (-1, -1), "CENTER")
-    ]))
-    elements.append(wrapper)
-    doc.build(elements)
+    get_invoice_template().render(filename, booking_id, vendor_name, property_name, amount)
     print(f"Created invoice PDF: {filename}")
+    return filename
+
+
+def render_invoice_bytes(booking_id, vendor_name, property_name, amount):
+    """
+    Build the invoice PDF for a single booking in memory and return its bytes
+    """
+    from invoice_template import get_invoice_template
+    _register_fonts()
+
+    buffer = io.BytesIO()
+    get_invoice_template().render(buffer, booking_id, vendor_name, property_name, amount)
+    return buffer.getvalue()
+
+
+def create_invoice_pdf(unqid, booking_id, vendor_name, property_name, amount, output_folder, in_memory=False, manifest=None, session=None):
+    """
+    Create a StayVista invoice PDF for a single booking and upload it to Drive.
+    With in_memory=True nothing is written to output_folder and the PDF bytes
+    are returned so the browser step can write the file only when it needs it.
+    With a manifest (see load_invoice_manifest) unchanged invoices are not
+    rendered or uploaded again. Pass a DriveUploadSession to reuse its folder index
+    """
+    filename = os.path.join(output_folder, f"{unqid}.pdf")
+    key = invoice_cache_key(unqid, booking_id, vendor_name, property_name, amount)
+    action = invoice_cache_action(manifest, unqid, key, filename, session) if manifest is not None else "upload"
+
+    if action == "skip":
+        print(f"Unchanged invoice {filename}, skipping render and upload")
+        return None
+
+    if in_memory:
+        data = render_invoice_bytes(booking_id, vendor_name, property_name, amount)
+    else:
+        data = None
+        render_invoice_pdf(
+            unqid, booking_id, vendor_name, property_name, amount, output_folder
+        )
     # ---- Upload to Drive ----
-    DRIVE_FOLDER_ID = "1St6hd_7veFTcaK7dAJC29yfmcDNQo4wf"
-    uploaded = upload_to_drive(filename, DRIVE_FOLDER_ID)
+    publish_invoice(unqid, key, filename, data, action, manifest, session)
+    return data
+
+
+# ------------------ Batch Rendering ------------------
+def _render_invoice_job(job, in_memory=False):
+    """
+    Process pool entry point: never raises, so one bad row can't sink the batch
+    """
+    try:
+        if in_memory:
+            unqid, booking_id, vendor_name, property_name, amount, _ = job
+            return render_invoice_bytes(booking_id, vendor_name, property_name, amount), None
+        return render_invoice_pdf(*job), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def render_pool(max_workers=None):
+    """
+    Process pool for invoice rendering. Spawn, not fork: forking a process
+    that already runs threads can deadlock the child on a lock one of them held
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def render_invoices_parallel(jobs, max_workers=None, in_memory=False, pool=None):
+    """
+    Render many invoices across a process pool sized to the cores.
+    jobs are render_invoice_pdf argument tuples; yields (job, result, error)
+    in the same order as jobs, as soon as each one is ready. result is the
+    PDF path, or the PDF bytes when in_memory=True. pool is a long-lived
+    render_pool() to use instead of starting one for this call
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return
+
+    max_workers = max_workers or os.cpu_count() or 1
+    max_workers = min(max_workers, len(jobs))
+    render = partial(_render_invoice_job, in_memory=in_memory)
+
+    if max_workers == 1 and pool is None:
+        for job in jobs:
+            yield (job, *render(job))
+        return
+
+    chunksize = max(1, len(jobs) // (max_workers * 4))
+    if pool is not None:
+        for job, (result, error) in zip(jobs, pool.map(render, jobs, chunksize=chunksize)):
+            yield job, result, error
+        return
+    with render_pool(max_workers) as own_pool:
+        for job, (result, error) in zip(jobs, own_pool.map(render, jobs, chunksize=chunksize)):
+            yield job, result, error
+
+# ------------------ Lean Browser ------------------
+BLOCK_RESOURCES = os.getenv("BLOCK_RESOURCES", "1") != "0"
+LEAN_PROFILE = os.getenv("LEAN_PROFILE", "1") != "0"
+CHROME_DISK_CACHE_MB = int(os.getenv("CHROME_DISK_CACHE_MB", "64"))
+
+# Nothing the automation reads: images, web fonts and third-party trackers.
+# Stylesheets stay, Select2 visibility and clickability depend on them.
+# Add more with BLOCKED_URLS="*pattern1*,*pattern2*"
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*connect.facebook.net*", "*hotjar.com*", "*clarity.ms*",
+    "*mixpanel.com*", "*segment.io*", "*intercom.io*", "*newrelic.com*", "*nr-data.net*",
+]
+
+
+def blocked_url_patterns():
+    extra = [p.strip() for p in os.getenv("BLOCKED_URLS", "").split(",") if p.strip()]
+    return BLOCKED_URL_PATTERNS + extra
 
-    print(f"Uploaded {uploaded['name']} to Drive")
 
 # ------------------ Setup Driver (HEADLESS) ------------------
-def setup_driver():
+def setup_driver(block_resources=BLOCK_RESOURCES, lean=LEAN_PROFILE):
+    """
+    Headless Chrome for the admin site. block_resources drops images, fonts
+    and trackers through CDP; lean returns from driver.get at DOMContentLoaded
+    and turns off extensions and background services
+    """
+    _load_selenium()
     chrome_options = Options()
     chrome_options.add_argument("--headless=new")
     chrome_options.add_argument("--window-size=1920,1080")
@@ -259,10 +605,27 @@ def setup_driver():
     chrome_options.add_argument("--disable-blink-features=AutomationControlled")
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
     chrome_options.add_experimental_option("useAutomationExtension", False)
-    chrome_options.add_experimental_option("prefs", {
+    prefs = {
         "download.prompt_for_download": False,
         "safebrowsing.enabled": True
-    })
+    }
+    if lean:
+        # every wait in this module is explicit, so there is no need to sit
+        # out the load event for images and late scripts
+        chrome_options.page_load_strategy = "eager"
+        for arg in (
+            "--disable-extensions",
+            "--disable-background-networking",
+            "--disable-component-update",
+            "--disable-default-apps",
+            "--disable-sync",
+            "--no-first-run",
+            "--mute-audio",
+            f"--disk-cache-size={CHROME_DISK_CACHE_MB * 1024 * 1024}",
+        ):
+            chrome_options.add_argument(arg)
+        prefs["profile.managed_default_content_settings.images"] = 2
+    chrome_options.add_experimental_option("prefs", prefs)
     driver = webdriver.Chrome(options=chrome_options)
     driver.execute_cdp_cmd(
         "Page.addScriptToEvaluateOnNewDocument",
@@ -286,17 +649,21 @@ def setup_driver():
             }
         }
     )
+    if block_resources:
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_url_patterns()})
     
 
     return driver
 
 # ------------------ Login ------------------
 def login_to_stayvista(driver, username, password, max_retries=5):
+    _load_selenium()
     for attempt in range(1, max_retries + 1):
         print(f"Login attempt {attempt}/{max_retries}")
 
         try:
-            driver.get("https://admin.vistarooms.com/dashboard")
+            with TIMER.span("driver.get /dashboard"):
+                driver.get("https://admin.vistarooms.com/dashboard")
 
             WebDriverWait(driver, 15).until(
                 EC.presence_of_element_located((By.NAME, "email"))
@@ -334,30 +701,307 @@ def login_to_stayvista(driver, username, password, max_retries=5):
             print(f"❌ Login failed on attempt {attempt}: {e}")
 
             if attempt < max_retries:
+                RETRIES.labels("login").inc()
                 time.sleep(3)
             else:
                 print("Max login attempts reached")
 
 
     return False
+
+
+# ------------------ Session Cache ------------------
+ADMIN_URL = "https://admin.vistarooms.com"
+SESSION_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "stayvista", "admin_session.bin")
+
+# Resolves to true only if the cookies still reach the expense form without
+# being bounced to the login page
+SESSION_IS_VALID = """
+const done = arguments[arguments.length - 1];
+fetch('/expenses/log', {credentials: 'same-origin', redirect: 'manual'})
+    .then(res => res.status === 200 ? res.text() : '')
+    .then(body => done(body.includes('select2-expensetype-container') &&
+                       !body.includes('loginViaPasswordBtn')))
+    .catch(() => done(false));
+"""
+
+READ_LOCAL_STORAGE = "return Object.assign({}, window.localStorage);"
+
+WRITE_LOCAL_STORAGE = """
+for (const [key, value] of Object.entries(arguments[0])) {
+    window.localStorage.setItem(key, value);
+}
+"""
+
+
+class SessionCache:
+    """
+    Admin-site cookies and localStorage from the last successful login,
+    Fernet-encrypted on disk. The key comes from SESSION_CACHE_KEY, or is
+    derived from the login credentials. Without the cryptography package the
+    cache is simply off and every run logs in
+    """
+
+    def __init__(self, username, password, path=SESSION_CACHE_PATH):
+        self.path = path
+        self._fernet = self._make_fernet(username, password)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _make_fernet(username, password):
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError:
+            print("⚠️ cryptography not installed, session cache disabled")
+            return None
+        key = os.getenv("SESSION_CACHE_KEY")
+        if key:
+            return Fernet(key.encode())
+        if not (username and password):
+            return None
+        raw = hashlib.pbkdf2_hmac(
+            "sha256", password.encode(), f"stayvista-session:{username}".encode(), 200_000
+        )
+        return Fernet(base64.urlsafe_b64encode(raw))
+
+    @property
+    def enabled(self):
+        return self._fernet is not None
+
+    def load(self):
+        """
+        Cached session state, or None when missing, unreadable or expired
+        """
+        if not self.enabled:
+            return None
+        from cryptography.fernet import InvalidToken
+        try:
+            with open(self.path, "rb") as f:
+                state = json.loads(self._fernet.decrypt(f.read()))
+        except (OSError, ValueError, InvalidToken):
+            return None
+        now = time.time()
+        state["cookies"] = [c for c in state.get("cookies", []) if c.get("expiry", now + 1) > now]
+        return state if state["cookies"] else None
+
+    def save(self, driver):
+        if not self.enabled:
+            return
+        state = {
+            "cookies": driver.get_cookies(),
+            "local_storage": driver.execute_script(READ_LOCAL_STORAGE),
+            "saved_at": time.time()
+        }
+        token = self._fernet.encrypt(json.dumps(state).encode())
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(token)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def restore(self, driver):
+        """
+        Load the cached session into a fresh driver and check it with one
+        authenticated fetch. True when the driver is logged in
+        """
+        state = self.load()
+        if state is None:
+            return False
+        try:
+            # cookies and localStorage can only be set on the site's own origin
+            with TIMER.span("driver.get /robots.txt"):
+                driver.get(f"{ADMIN_URL}/robots.txt")
+            for cookie in state["cookies"]:
+                driver.add_cookie(cookie)
+            if state.get("local_storage"):
+                driver.execute_script(WRITE_LOCAL_STORAGE, state["local_storage"])
+            driver.set_script_timeout(15)
+            with TIMER.span("session.check"):
+                valid = driver.execute_async_script(SESSION_IS_VALID)
+        except Exception as e:
+            log(f"⚠️ Could not restore cached session: {e}")
+            valid = False
+        if not valid:
+            print("Cached session expired, logging in")
+            driver.delete_all_cookies()
+            self.clear()
+            return False
+        age = (time.time() - state.get("saved_at", time.time())) / 60
+        print(f"✅ Reused cached session ({age:.0f} min old)")
+        return True
+
+
+def login_with_session_cache(driver, username, password, cache=None):
+    """
+    Reuse the cached admin session when it is still valid, otherwise log in
+    and cache the new session for the next run
+    """
+    cache = cache or SessionCache(username, password)
+    if cache.restore(driver):
+        return True
+    with TIMER.span("login"):
+        if not login_to_stayvista(driver, username, password):
+            return False
+    try:
+        cache.save(driver)
+    except Exception as e:
+        log(f"⚠️ Could not cache session: {e}")
+    return True
+
+
+# Flags window.__expenseSubmitSuccess when the expense POST comes back 200
+SUBMIT_HOOK_SCRIPT = """
+(function() {
+    const origFetch = window.fetch;
+    window.fetch = function() {
+        return origFetch.apply(this, arguments).then(res => {
+            if (res.url.includes('/expenses') && res.status === 200) {
+                window.__expenseSubmitSuccess = true;
+            }
+            return res;
+        });
+    };
+
+    const origOpen = XMLHttpRequest.prototype.open;
+    XMLHttpRequest.prototype.open = function(method, url) {
+        this.addEventListener('load', function() {
+            if (url.includes('/expenses') && this.status === 200) {
+                window.__expenseSubmitSuccess = true;
+            }
+        });
+        origOpen.apply(this, arguments);
+    };
+})();
+"""
+
+
+def install_submit_hook(driver):
+    driver.execute_cdp_cmd(
+        "Page.addScriptToEvaluateOnNewDocument",
+        {"source": SUBMIT_HOOK_SCRIPT}
+    )
+
+
+def start_logged_in_driver(username, password, cache=None):
+    """
+    New headless Chrome with the submit hook installed, logged in to the admin
+    site (from the session cache when possible). Quits the browser and returns
+    None if login fails
+    """
+    driver = setup_driver()
+    install_submit_hook(driver)
+    if not login_with_session_cache(driver, username, password, cache):
+        driver.quit()
+        return None
+    return driver
+
+
+def driver_is_alive(driver):
+    try:
+        driver.execute_script("return 1")
+        return True
+    except Exception:
+        return False
     
 # ------------------ Navigate ------------------
 def navigate_to_expenses_add_page(driver):
+    _load_selenium()
     try:
-        driver.get("https://admin.vistarooms.com/expenses/log")
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.ID, "select2-expensetype-container"))
-        )
+        # timed until the form is usable, not just until driver.get returns
+        with TIMER.span("driver.get /expenses/log"):
+            driver.get("https://admin.vistarooms.com/expenses/log")
+            WebDriverWait(driver, 20).until(
+                EC.presence_of_element_located((By.ID, "select2-expensetype-container"))
+            )
         return True
     except Exception as e:
         print(":x: Navigation failed:", e)
         return False
+
+# ------------------ Form Reset ------------------
+FAST_FORM_RESET = os.getenv("FAST_FORM_RESET", "1") != "0"
+
+RESET_EXPENSE_FORM = """
+const submit = document.querySelector('[name="submitButton"]');
+const form = submit && submit.form;
+if (!form) return false;
+form.reset();
+for (const el of form.querySelectorAll('input[type=file]')) el.value = '';
+if (window.jQuery) {
+    // let Select2 redraw from the reset <select> values
+    for (const el of form.querySelectorAll('select')) {
+        if (jQuery(el).data('select2')) jQuery(el).trigger('change');
+    }
+}
+window.__expenseSubmitSuccess = false;
+return true;
+"""
+
+# Same checks a freshly loaded /expenses/log passes: submit button usable,
+# no dropdown or popup open, and every field we fill back at its default
+EXPENSE_FORM_IS_BLANK = """
+const submit = document.querySelector('[name="submitButton"]');
+if (!submit || submit.disabled || !submit.form) return false;
+if (document.querySelector('.select2-container--open')) return false;
+const popup = document.getElementById('btnYes');
+if (popup && popup.offsetParent !== null) return false;
+for (const id of ['invoice_number', 'bill', 'expense_head_categoriespart']) {
+    const el = document.getElementById(id);
+    if (el && el.value !== '') return false;
+}
+for (const name of ['quantity[]', 'rate_per_unit[]']) {
+    const el = document.getElementsByName(name)[0];
+    if (el && el.value !== '') return false;
+}
+for (const id of ['expensetype', 'expenshead', 'expense_villa_list', 'vendor_name', 'bookingid_expenses']) {
+    const el = document.getElementById(id);
+    if (!el) return false;
+    const initial = Array.from(el.options).find(o => o.defaultSelected);
+    if (el.value !== (initial ? initial.value : '')) return false;
+}
+return true;
+"""
+
+
+@TIMER.timed("form.reset")
+def reset_expense_form(driver, timeout=10):
+    """
+    Clear the expense form in place after a successful submit instead of
+    reloading /expenses/log. Returns False when the page moved on or the
+    reset can't be verified, so the caller falls back to navigation
+    """
+    _load_selenium()
+    if "/expenses/log" not in driver.current_url:
+        return False
+    try:
+        wait = WebDriverWait(driver, timeout, poll_frequency=0.1)
+        wait.until(lambda d: d.execute_script(AJAX_IDLE))
+        if not driver.execute_script(RESET_EXPENSE_FORM):
+            return False
+        wait.until(lambda d: d.execute_script(AJAX_IDLE) and d.execute_script(EXPENSE_FORM_IS_BLANK))
+        return True
+    except Exception as e:
+        log(f"⚠️ Form reset failed: {e}")
+        return False
+
 # ------------------ Handle Duplicate Popup ------------------
-def handle_duplicate_popup(driver, timeout=6):
+def handle_duplicate_popup(driver, timeout=6, confirm=True):
+    _load_selenium()
     try:
         yes_btn = WebDriverWait(driver, timeout).until(
             EC.element_to_be_clickable((By.ID, "btnYes"))
         )
+        if not confirm:
+            print(":warning: Duplicate popup detected — left unconfirmed")
+            return True
         driver.execute_script("arguments[0].click();", yes_btn)
         print(":warning: Duplicate popup detected — clicked YES")
         time.sleep(1)
@@ -365,27 +1009,13 @@ def handle_duplicate_popup(driver, timeout=6):
     except TimeoutException:
         return False
     
-def wait_for_redirect(driver, old_url, timeout=10):
-    try:
-        WebDriverWait(driver, timeout).until(
-            lambda d: d.current_url != old_url
-        )
-        return True
-    except TimeoutException:
-        return False
-        
 # ------------------ Select Vendor ------------------
-def select_vendor(driver, vendor_name):
-    driver.find_element(By.ID, "select2-vendor_name-container").click()
-    search = WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.CLASS_NAME, "select2-search__field"))
-    )
-    search.send_keys(vendor_name)
-    time.sleep(0.5)
-    search.send_keys(Keys.RETURN)
+def select_vendor(driver, vendor_name, catalog=None):
+    choose_select2(driver, "select2-vendor_name-container", vendor_name, catalog)
     
 # ------------------ Tax ------------------
 def set_tax_percentage(driver):
+    _load_selenium()
     Select(
         WebDriverWait(driver, 10).until(
             EC.element_to_be_clickable((By.NAME, "tax_percentage[]"))
@@ -393,7 +1023,8 @@ def set_tax_percentage(driver):
     ).select_by_visible_text("0")
     
 # ------------------ Upload Bill ------------------
-def upload_bill(driver,unqid ,booking_id, bills_folder):
+def upload_bill(driver,unqid ,booking_id, bills_folder, pdf_bytes=None):
+    _load_selenium()
     if not bills_folder:
         print('no bill folder found...')
         return
@@ -401,95 +1032,660 @@ def upload_bill(driver,unqid ,booking_id, bills_folder):
     path = os.path.abspath(path)
     path = os.path.normpath(path)
     print(path)
+    if pdf_bytes is not None:
+        # In-memory invoices only hit the disk here, because Chrome needs a path.
+        # Always rewritten: a PDF left by an earlier run may hold an old amount
+        os.makedirs(bills_folder, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, path)
     if not os.path.exists(path):
         print(f":x: Bill missing: {path}")
         return
     driver.find_element(By.ID, "bill").send_keys(path)
-    
-
-def move_row_to_log(gs_client, unqid):
-    ss = gs_client.open("vista logs")
-    source_ws = ss.worksheet("to be logged")
-    log_ws = ss.worksheet("admin logs")
 
-    rows = source_ws.get_all_values(
-        value_render_option="UNFORMATTED_VALUE"
-    )
 
-    target = str(unqid).strip()
+def bill_pdf_bytes(row, bills_folder):
+    """
+    Invoice PDF for a bill row, from memory or from bills_folder. None if missing
+    """
+    if row.get("pdf") is not None:
+        return row["pdf"]
+    try:
+        with open(os.path.join(bills_folder, f"{row['unqid']}.pdf"), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+    
 
-    for idx, row in enumerate(rows[1:], start=2):
-        if not row:
-            continue
+class SheetRowMover:
+    """
+    Collects logged unqids and moves their rows from "to be logged" to
+    "admin logs" with one read, one append_rows and one batchUpdate per flush.
+    Flushes every batch_size rows so a crash loses at most one small batch.
+    With background=True the flushes run on their own thread (also after
+    linger idle seconds), so add() never waits on Sheets.
+    on_moved(unqids) is called after each successful flush
+    """
 
-        cell_value = str(row[0]).strip()
+    def __init__(self, gs_client, batch_size=10, background=False, linger=5.0, on_moved=None):
+        self.ss = gs_client.open("vista logs")
+        self.source_ws = self.ss.worksheet("to be logged")
+        self.log_ws = self.ss.worksheet("admin logs")
+        self.batch_size = batch_size
+        self.linger = linger
+        self.on_moved = on_moved
+        self.pending = []
+        self.reconcile = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="sheet-mover")
+            self._thread.start()
+
+    def add(self, unqid, reconcile=False):
+        """
+        Queue a logged row for moving. reconcile marks a row an earlier run may
+        already have appended to "admin logs"; it is only deleted if so
+        """
+        with self._lock:
+            self.pending.append(str(unqid).strip())
+            if reconcile:
+                self.reconcile.add(str(unqid).strip())
+            full = len(self.pending) >= self.batch_size
+        if self._thread is not None:
+            self._wakeup.set()
+        elif full:
+            self._flush()
+
+    def flush(self):
+        """
+        Move everything still pending; stops the background thread first
+        """
+        if self._thread is not None:
+            self._closed = True
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self._flush()
+
+    def _run(self):
+        while not self._closed:
+            woken = self._wakeup.wait(self.linger)
+            self._wakeup.clear()
+            with self._lock:
+                waiting = len(self.pending)
+            if waiting >= self.batch_size or (waiting and not woken):
+                try:
+                    self._flush()
+                except Exception as e:
+                    # rows stay pending for the next flush
+                    print(f"⚠️ Moving logged rows failed, will retry: {e}")
+
+    def _flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self.pending = self.pending, []
+            if not batch:
+                return
+            try:
+                self._move(batch)
+            except Exception:
+                with self._lock:
+                    self.pending[:0] = batch
+                raise
+
+    def _move(self, batch):
+        with TIMER.span("sheets.read"):
+            rows = self.source_ws.get_all_values(
+                value_render_option="UNFORMATTED_VALUE"
+            )
 
-        if cell_value == target:
-            # ---- prepend current date ----
+        # first row per unqid
+        found = {}
+        targets = set(batch)
+        for idx, row in enumerate(rows[1:], start=2):
+            if not row:
+                continue
+            cell_value = str(row[0]).strip()
+            if cell_value in targets and cell_value not in found:
+                found[cell_value] = (idx, row)
+
+        with self._lock:
+            recheck = self.reconcile.intersection(batch)
+        logged = set()
+        if recheck:
+            # column B of "admin logs" holds the unqid, after the date
+            with TIMER.span("sheets.read"):
+                logged = {str(v).strip() for v in self.log_ws.col_values(2)} & recheck
+
+        if found:
+            # ---- prepend current date, append to log in sheet order ----
             today = now_ist.strftime("%d-%b-%Y")
-            new_row = [today] + row
-
-            # ---- append to log ----
-            log_ws.append_row(
-                new_row,
-                value_input_option="USER_ENTERED"
-            )
+            moved = sorted(found.values(), key=lambda item: item[0])
+            new_rows = [[today] + row for _, row in moved if str(row[0]).strip() not in logged]
+            if new_rows:
+                with TIMER.span("sheets.append"):
+                    self.log_ws.append_rows(
+                        new_rows,
+                        value_input_option="USER_ENTERED"
+                    )
 
-            # ---- delete from source ----
-            source_ws.delete_rows(idx)
+            # ---- delete from source, bottom-up so indices stay valid ----
+            with TIMER.span("sheets.delete"):
+                self.ss.batch_update({
+                    "requests": [
+                        {
+                            "deleteDimension": {
+                                "range": {
+                                    "sheetId": self.source_ws.id,
+                                    "dimension": "ROWS",
+                                    "startIndex": idx - 1,
+                                    "endIndex": idx
+                                }
+                            }
+                        }
+                        for idx, _ in reversed(moved)
+                    ]
+                })
 
-            print(f"Moved SRNO {unqid} from 'to be logged' → 'admin logs'")
-            return True
+        for unqid in batch:
+            if unqid in found:
+                print(f"Moved SRNO {unqid} from 'to be logged' → 'admin logs'")
+            else:
+                print(f"SRNO {unqid} not found in sheet 'to be logged'")
 
-    print(f"SRNO {unqid} not found in sheet 'to be logged'")
-    return False
+        with self._lock:
+            self.reconcile.difference_update(batch)
+        if self.on_moved is not None:
+            # rows already gone from the sheet were moved by an earlier run
+            self.on_moved([u for u in batch if u in found or u in recheck])
 
 
 def log(step):
     print(f"➡️ {step}", flush=True)
 
 
-import time
-
-def select2_search(driver, container_id, value, timeout=25):
+def log_step(step):
+    """
+    log() that also starts a new timed step of the expense being logged
+    """
+    log(step)
+    TIMER.mark(step)
+
+
+# ------------------ Select2 ------------------
+# Where the highlighted result of the open Select2 dropdown stands:
+# "loading" while its AJAX search runs, "ready" once the highlighted option
+# matches the search term, "highlighted" if it doesn't, "pending" otherwise
+SELECT2_RESULTS_STATE = """
+const term = String(arguments[0]).toLowerCase();
+const list = document.querySelector('.select2-container--open .select2-results__options');
+if (!list) return 'pending';
+if (list.querySelector('.loading-results, .select2-results__option--loading')) return 'loading';
+const highlighted = list.querySelector('.select2-results__option--highlighted');
+if (!highlighted) return 'pending';
+return highlighted.textContent.toLowerCase().includes(term) ? 'ready' : 'highlighted';
+"""
+
+SELECT_VALUE = """
+const el = document.getElementById(arguments[0]);
+return el ? el.value : null;
+"""
+
+# The result whose text is exactly the search term (ignoring case and spacing),
+# so "Sanjyot Patil" never picks "Sanjyot Patil Caterers" just because it is highlighted
+SELECT2_EXACT_OPTION = """
+const norm = s => String(s).trim().replace(/\\s+/g, ' ').toLowerCase();
+const term = norm(arguments[0]);
+const options = document.querySelectorAll('.select2-container--open .select2-results__option');
+for (const opt of options) {
+    if (norm(opt.textContent) === term) return opt;
+}
+return null;
+"""
+
+def _select2_select_id(container_id):
+    # Select2 renders <select id="x"> as span#select2-x-container
+    return container_id[len("select2-"):-len("-container")]
+
+
+def _select2_attempt(driver, container_id, value, timeout):
+    _load_selenium()
     wait = WebDriverWait(driver, timeout)
+    select_id = _select2_select_id(container_id)
+    old_value = driver.execute_script(SELECT_VALUE, select_id)
 
-    log(f"Select2 open: {container_id}")
     container = wait.until(EC.element_to_be_clickable((By.ID, container_id)))
     driver.execute_script("arguments[0].scrollIntoView({block:'center'});", container)
     container.click()
 
-    time.sleep(0.6)  # ⏸ allow dropdown animation/render
-
+    # open state: the dropdown's search box is visible
     search = wait.until(EC.visibility_of_element_located(
         (By.CSS_SELECTOR, ".select2-container--open .select2-search__field")
     ))
-
     search.clear()
-    time.sleep(0.3)
-
     search.send_keys(value)
-    time.sleep(0.8)  # ⏸ allow results to load
 
-    search.send_keys(Keys.RETURN)
-    time.sleep(0.6)  # ⏸ allow selection to apply
+    # results finished loading and the highlighted option is the one we typed
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: d.execute_script(SELECT2_RESULTS_STATE, value) == "ready"
+        )
+    except TimeoutException:
+        if driver.execute_script(SELECT2_RESULTS_STATE, value) != "highlighted":
+            raise
+        log(f"⚠️ No exact match for '{value}' in {container_id}, taking highlighted option")
+
+    exact = driver.execute_script(SELECT2_EXACT_OPTION, value)
+    if exact is not None:
+        exact.click()
+    else:
+        search.send_keys(Keys.RETURN)
+
+    # selection applied: the dropdown closed and the underlying <select> changed
+    # (or already held the value we asked for)
+    WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+        lambda d: not d.find_elements(By.CSS_SELECTOR, ".select2-container--open")
+        and (
+            d.execute_script(SELECT_VALUE, select_id) != old_value
+            or value.lower() in d.find_element(By.ID, container_id).text.lower()
+        )
+    )
+
+
+def select2_search(driver, container_id, value, timeout=10, retries=2):
+    """
+    Pick value in a Select2 field, waiting on the dropdown's own signals
+    instead of fixed sleeps. Retries from a closed dropdown on failure
+    """
+    _load_selenium()
+    value = str(value)
+    log(f"Select2 open: {container_id}")
+    start = time.perf_counter()
+
+    for attempt in range(1, retries + 1):
+        try:
+            _select2_attempt(driver, container_id, value, timeout)
+            break
+        except TimeoutException:
+            if attempt == retries:
+                raise
+            log(f"⚠️ Select2 {container_id} not ready, retrying ({attempt}/{retries})")
+            RETRIES.labels("select2").inc()
+            driver.find_element(By.TAG_NAME, "body").send_keys(Keys.ESCAPE)
+
+    TIMER.add(f"select2.{_select2_select_id(container_id)}", time.perf_counter() - start)
+
+
+# ------------------ Select2 Option Catalog ------------------
+SELECT2_CATALOG_PATH = os.path.join(os.path.expanduser("~"), ".cache", "stayvista", "select2_catalog.json")
+SELECT2_CATALOG_TTL = 24 * 3600
+# Fields whose options barely change; booking IDs are searched every time
+CATALOG_FIELDS = ("expensetype", "expenshead", "expense_villa_list", "vendor_name")
+
+SCRAPE_SELECT_OPTIONS = """
+const out = {};
+for (const id of arguments[0]) {
+    const el = document.getElementById(id);
+    if (!el) continue;
+    out[id] = Array.from(el.options)
+        .filter(o => o.value !== '')
+        .map(o => [o.text, o.value]);
+}
+return out;
+"""
+
+SELECTED_OPTION = """
+const el = document.getElementById(arguments[0]);
+if (!el || el.selectedIndex < 0) return null;
+const opt = el.options[el.selectedIndex];
+return [opt.text, opt.value];
+"""
+
+# Set a <select> behind Select2 to an option ID (adding the option if the
+# field is AJAX-backed) and fire the events Select2 and the page listen to
+INJECT_SELECT_VALUE = """
+const [id, value, text] = arguments;
+const el = document.getElementById(id);
+if (!el) return false;
+let opt = Array.from(el.options).find(o => o.value === value);
+if (!opt) {
+    opt = new Option(text, value, false, false);
+    el.appendChild(opt);
+}
+if (window.jQuery) {
+    const $el = jQuery(el);
+    $el.val(value).trigger('change');
+    $el.trigger({type: 'select2:select', params: {data: {id: value, text: text}}});
+} else {
+    el.value = value;
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+}
+return el.value === value;
+"""
+
+AJAX_IDLE = "return window.jQuery ? jQuery.active === 0 : true;"
+
+
+def _catalog_key(text):
+    return " ".join(str(text).split()).lower()
+
+
+class Select2Catalog:
+    """
+    Cached option IDs for the slow-changing Select2 fields, persisted with a
+    TTL. Filled by scraping the expenses/log page once per run and by learning
+    from every exact match picked through the search box
+    """
+
+    def __init__(self, path=SELECT2_CATALOG_PATH, ttl=SELECT2_CATALOG_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.fields = {}
+        self.scraped = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=SELECT2_CATALOG_PATH, ttl=SELECT2_CATALOG_TTL):
+        catalog = cls(path, ttl)
+        try:
+            with open(path, encoding="utf-8") as f:
+                fields = json.load(f)
+        except (OSError, ValueError):
+            return catalog
+        cutoff = time.time() - ttl
+        for field, entries in fields.items():
+            catalog.fields[field] = {
+                key: entry for key, entry in entries.items() if entry[2] >= cutoff
+            }
+        return catalog
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.fields, f)
+            os.replace(tmp_path, self.path)
+
+    def learn(self, field, text, value):
+        with self._lock:
+            self.fields.setdefault(field, {})[_catalog_key(text)] = [text, value, time.time()]
+
+    def lookup(self, field, text):
+        """
+        (option text, option value) for an exact match, or None
+        """
+        with self._lock:
+            entry = self.fields.get(field, {}).get(_catalog_key(text))
+        return (entry[0], entry[1]) if entry else None
+
+    def scrape(self, driver):
+        """
+        Read every option already rendered in the catalog fields' <select>s
+        """
+        options = driver.execute_script(SCRAPE_SELECT_OPTIONS, list(CATALOG_FIELDS))
+        for field, pairs in options.items():
+            for text, value in pairs:
+                self.learn(field, text, value)
+        self.scraped = True
+        print(f"Select2 catalog: {sum(len(v) for v in self.fields.values())} options cached")
+
+
+def choose_select2(driver, container_id, value, catalog=None):
+    """
+    Set a Select2 field straight to its cached option ID when the catalog
+    knows the exact value; otherwise search for it and remember what was picked
+    """
+    _load_selenium()
+    value = str(value)
+    field = _select2_select_id(container_id)
+    cached = catalog.lookup(field, value) if catalog is not None else None
+
+    if cached is not None:
+        start = time.perf_counter()
+        idle = WebDriverWait(driver, 10, poll_frequency=0.1)
+        try:
+            # don't race a dependent field that is still reloading its options
+            idle.until(lambda d: d.execute_script(AJAX_IDLE))
+            text, option_id = cached
+            if driver.execute_script(INJECT_SELECT_VALUE, field, option_id, text):
+                idle.until(lambda d: d.execute_script(AJAX_IDLE))
+                if driver.execute_script(SELECT_VALUE, field) == option_id:
+                    log(f"Select2 set from catalog: {field} = {option_id}")
+                    TIMER.add(f"select2.{field}", time.perf_counter() - start)
+                    return
+        except TimeoutException:
+            pass
+        log(f"⚠️ Catalog value for {field} didn't stick, searching instead")
+
+    select2_search(driver, container_id, value)
+
+    if catalog is not None and field in CATALOG_FIELDS:
+        selected = driver.execute_script(SELECTED_OPTION, field)
+        if selected and _catalog_key(selected[0]) == _catalog_key(value):
+            catalog.learn(field, selected[0], selected[1])
+
+
+# ------------------ Expense Ledger ------------------
+EXPENSE_LEDGER = os.getenv("EXPENSE_LEDGER", "1") != "0"
+EXPENSE_LEDGER_PATH = os.path.join(os.path.expanduser("~"), ".cache", "stayvista", "expense_ledger.json")
+EXPENSE_LEDGER_TTL = 14 * 24 * 3600
+# Optional admin URL listing one booking's expenses as JSON, e.g.
+# "/expenses/list?booking_id={booking_id}"; unset means local ledger only
+EXPENSE_LEDGER_PREFETCH_URL = os.getenv("EXPENSE_LEDGER_PREFETCH_URL", "")
+# Popup wait when the ledger already knows the expense is new
+LEDGER_POPUP_WAIT = float(os.getenv("LEDGER_POPUP_WAIT", "1"))
+
+# Field names tried, in order, on each expense of the prefetch response
+LEDGER_REMOTE_FIELDS = {
+    "head": ("expense_head", "head", "expense_head_name"),
+    "vendor": ("vendor_name", "vendor"),
+    "amount": ("amount", "rate_per_unit", "total_amount"),
+    "bill_date": ("bill_date", "date"),
+}
+
+FETCH_JSON = """
+const done = arguments[arguments.length - 1];
+fetch(arguments[0], {
+    credentials: 'same-origin',
+    headers: {'Accept': 'application/json', 'X-Requested-With': 'XMLHttpRequest'}
+})
+    .then(res => res.ok ? res.json() : null)
+    .then(done)
+    .catch(() => done(null));
+"""
+
+
+def _ledger_amount(amount):
+    try:
+        return f"{float(amount):.2f}"
+    except (TypeError, ValueError):
+        return _catalog_key(amount)
+
+
+def _ledger_date(value):
+    if hasattr(value, "strftime"):
+        return value.strftime("%Y-%m-%d")
+    text = str(value).strip()
+    for fmt, size in (("%Y-%m-%d", 10), ("%d-%m-%Y", 10), ("%d/%m/%Y", 10), ("%d-%b-%Y", 11)):
+        try:
+            return datetime.strptime(text[:size], fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def ledger_key(booking_id, head, vendor, amount, bill_date):
+    """
+    What makes two expenses the same expense for the ledger
+    """
+    return "|".join([
+        _catalog_key(booking_id),
+        _catalog_key(head),
+        _catalog_key(vendor),
+        _ledger_amount(amount),
+        _ledger_date(bill_date) or "",
+    ])
+
+
+def fetch_booking_expenses(driver, booking_id, url=EXPENSE_LEDGER_PREFETCH_URL):
+    """
+    A booking's expenses from the admin site, fetched with the browser's
+    session, or None if the endpoint is unset or didn't answer with a list
+    """
+    if not url:
+        return None
+    target = urljoin(ADMIN_URL + "/", url.format(booking_id=quote(str(booking_id).strip())))
+    try:
+        driver.set_script_timeout(15)
+        body = driver.execute_async_script(FETCH_JSON, target)
+    except Exception as e:
+        log(f"⚠️ Expense prefetch failed for {booking_id}: {e}")
+        return None
+    if isinstance(body, dict):
+        body = body.get("data")
+    return body if isinstance(body, list) else None
+
+
+class ExpenseLedger:
+    """
+    Which expenses have already been submitted, keyed on ledger_key, so a
+    retried row is skipped before its form is opened. Local submits are
+    persisted with a TTL. A booking's expenses on the admin site can be
+    prefetched once per run; with those the ledger also knows when an
+    expense is new, and identical sheet rows are told apart by counting
+    """
+
+    def __init__(self, path=EXPENSE_LEDGER_PATH, ttl=EXPENSE_LEDGER_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.logged = {}
+        self.remote = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=EXPENSE_LEDGER_PATH, ttl=EXPENSE_LEDGER_TTL):
+        ledger = cls(path, ttl)
+        try:
+            with open(path, encoding="utf-8") as f:
+                logged = json.load(f)
+        except (OSError, ValueError):
+            return ledger
+        cutoff = time.time() - ttl
+        for key, unqids in logged.items():
+            fresh = {u: ts for u, ts in unqids.items() if ts >= cutoff}
+            if fresh:
+                ledger.logged[key] = fresh
+        return ledger
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.logged, f)
+            os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def row_key(row, bill_date):
+        return ledger_key(row["booking_id"], row["head"], row["vendor"], row["amount"], bill_date)
+
+    def _remote_counts(self, booking_id, items):
+        counts = {}
+        for item in items:
+            values = {}
+            for name, aliases in LEDGER_REMOTE_FIELDS.items():
+                values[name] = next((item[a] for a in aliases if isinstance(item, dict) and item.get(a) not in (None, "")), None)
+            if None in values.values() or _ledger_date(values["bill_date"]) is None:
+                # unknown response shape: deciding "new" from it would be a guess
+                print(f"⚠️ Expense prefetch for {booking_id}: unrecognised expense {item!r}, not used")
+                return None
+            key = ledger_key(booking_id, values["head"], values["vendor"], values["amount"], values["bill_date"])
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def prefetch(self, booking_id, fetch):
+        """
+        Load a booking's admin-side expenses through fetch(booking_id), once
+        """
+        booking_id = _catalog_key(booking_id)
+        with self._lock:
+            if booking_id in self.remote:
+                return
+            # claimed now so other loggers don't fetch it as well
+            self.remote[booking_id] = None
+        items = fetch(booking_id)
+        counts = self._remote_counts(booking_id, items) if items is not None else None
+        with self._lock:
+            self.remote[booking_id] = counts
+
+    def check(self, row, bill_date, fetch=None):
+        """
+        "logged" when this row's expense already exists, "new" when it
+        certainly doesn't, None when the ledger can't tell
+        """
+        if fetch is not None:
+            self.prefetch(row["booking_id"], fetch)
+        key = self.row_key(row, bill_date)
+        unqid = str(row["unqid"])
+        with self._lock:
+            mine = self.logged.get(key, {})
+            if unqid in mine:
+                return "logged"
+            counts = self.remote.get(_catalog_key(row["booking_id"]))
+            if counts is None:
+                return None
+            if counts.get(key, 0) > len(mine):
+                # an expense on the site no row has been matched to yet
+                self.logged.setdefault(key, {})[unqid] = time.time()
+                return "logged"
+            return "new"
+
+    def record(self, row, bill_date):
+        """
+        Note a successful submit of row
+        """
+        key = self.row_key(row, bill_date)
+        with self._lock:
+            mine = self.logged.setdefault(key, {})
+            if str(row["unqid"]) in mine:
+                return
+            mine[str(row["unqid"])] = time.time()
+            counts = self.remote.get(_catalog_key(row["booking_id"]))
+            if counts is not None:
+                counts[key] = counts.get(key, 0) + 1
+
 
-    
 # ------------------ Log Expense ------------------
-def log_expense(driver,unqid, booking_id, head, comment, vendor, property_name, amount, cost_bearer, bills_folder):
+def log_expense(driver,unqid, booking_id, head, comment, vendor, property_name, amount, cost_bearer, bills_folder, pdf_bytes=None, catalog=None,
+                before_submit=None, confirm_duplicate=True, duplicate_wait=6):
+    """
+    Fill and submit the expense form. before_submit() runs right before the
+    submit click. With confirm_duplicate=False a duplicate popup is taken to
+    mean an earlier run already submitted this expense: it is not confirmed
+    and the expense counts as logged. duplicate_wait is how long to look for
+    that popup when the submit isn't confirmed
+    """
+    _load_selenium()
     wait = WebDriverWait(driver, 30)
 
     try:
         # Expense Type
-        log("Expense Type")
-        select2_search(driver, "select2-expensetype-container", "F&B")
+        log_step("Expense Type")
+        choose_select2(driver, "select2-expensetype-container", "F&B", catalog)
 
         # Expense Head
-        log("Expense Head")
-        select2_search(driver, "select2-expenshead-container", head)
+        log_step("Expense Head")
+        choose_select2(driver, "select2-expenshead-container", head, catalog)
 
         # Category / Comment
-        log("Category / Comment")
+        log_step("Category / Comment")
         comment_el = wait.until(
             EC.visibility_of_element_located((By.ID, "expense_head_categoriespart"))
         )
@@ -497,15 +1693,15 @@ def log_expense(driver,unqid, booking_id, head, comment, vendor, property_name,
         comment_el.send_keys(comment)
 
         # Vendor
-        log("Vendor")
-        select_vendor(driver, vendor)
+        log_step("Vendor")
+        select_vendor(driver, vendor, catalog)
 
         # Property
-        log("Property")
-        select2_search(driver, "select2-expense_villa_list-container", property_name)
+        log_step("Property")
+        choose_select2(driver, "select2-expense_villa_list-container", property_name, catalog)
 
         # Cost Bearer
-        log("Cost Bearer")
+        log_step("Cost Bearer")
         cost_select = Select(
             wait.until(EC.element_to_be_clickable((By.NAME, "cost_bearer")))
         )
@@ -520,13 +1716,13 @@ def log_expense(driver,unqid, booking_id, head, comment, vendor, property_name,
             raise Exception("No valid cost bearer available")
 
         # Invoice number
-        log("Invoice Number")
+        log_step("Invoice Number")
         wait.until(EC.visibility_of_element_located(
             (By.ID, "invoice_number"))
         ).send_keys("1")
 
         # Bill date (timezone safe)
-        log("Bill Date")
+        log_step("Bill Date")
         d = now_ist
         driver.execute_script("""
             const el = document.getElementById('bill_date');
@@ -537,11 +1733,11 @@ def log_expense(driver,unqid, booking_id, head, comment, vendor, property_name,
         """, d.year, d.month, d.day)
 
         # Booking ID
-        log("Booking ID")
+        log_step("Booking ID")
         select2_search(driver, "select2-bookingid_expenses-container", booking_id)
 
         # Quantity & Rate
-        log("Quantity & Rate")
+        log_step("Quantity & Rate")
         wait.until(EC.visibility_of_element_located(
             (By.NAME, "quantity[]"))
         ).send_keys("1")
@@ -551,23 +1747,26 @@ def log_expense(driver,unqid, booking_id, head, comment, vendor, property_name,
         ).send_keys(str(amount))
 
         # Tax
-        log("Tax")
+        log_step("Tax")
         set_tax_percentage(driver)
 
         # Upload Bill
-        log("Upload Bill")
-        upload_bill(driver, unqid, booking_id, bills_folder)
+        log_step("Upload Bill")
+        upload_bill(driver, unqid, booking_id, bills_folder, pdf_bytes)
         
         driver.execute_script("""
             window.__expenseSubmitSuccess = false;
         """)
 
         # Submit
-        log("Submit Expense")
+        log_step("Submit Expense")
         submit = wait.until(EC.presence_of_element_located((By.NAME, "submitButton")))
         driver.execute_script("arguments[0].scrollIntoView({block:'center'});", submit)
         wait.until(EC.element_to_be_clickable((By.NAME, "submitButton")))
+        if before_submit is not None:
+            before_submit()
         driver.execute_script("arguments[0].click();", submit)
+        TIMER.mark("Submit Network Wait")
 
         try:
             WebDriverWait(driver, 12).until(
@@ -599,8 +1798,11 @@ def log_expense(driver,unqid, booking_id, head, comment, vendor, property_name,
         #     pass
 
         # Duplicate popup handling
-        log("Check duplicate popup")
-        if handle_duplicate_popup(driver):
+        log_step("Check duplicate popup")
+        if handle_duplicate_popup(driver, timeout=duplicate_wait, confirm=confirm_duplicate):
+            if not confirm_duplicate:
+                log("✅ Expense already submitted by an earlier run")
+                return True
             try:
                 WebDriverWait(driver, 10).until(
                     EC.any_of(
@@ -620,47 +1822,310 @@ def log_expense(driver,unqid, booking_id, head, comment, vendor, property_name,
         driver.save_screenshot(f"log_expense_error_{unqid}.png")
         raise
 
-def upload_expenses(driver, bills_data, bills_folder, gs_client):
-    for row in bills_data:
-        if not navigate_to_expenses_add_page(driver):
-            print(f"Could not open expense page for {row['booking_id']}")
-            continue
+class ExpenseRunReport:
+    """
+    Success/failure of every bill row, safe to fill from several logger threads
+    """
 
-        success = log_expense(
-            driver,
-            row["unqid"],
-            row["booking_id"],
-            row["head"],
-            row["comment"],
-            row["vendor"],
-            row["property_name"],
-            row["amount"],
-            row["cost_bearer"],
-            bills_folder
-        )
+    def __init__(self, total):
+        self.total = total
+        self.succeeded = []
+        self.failed = []
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        with self._lock:
+            return len(self.succeeded) + len(self.failed)
+
+    @property
+    def all_ok(self):
+        return not self.failed and len(self.succeeded) == self.total
+
+    def record_success(self, row):
+        with self._lock:
+            self.succeeded.append(row["unqid"])
+
+    def record_failure(self, row, reason):
+        with self._lock:
+            self.failed.append((row["unqid"], row["booking_id"], reason))
+
+    def print_summary(self):
+        print(f"Expenses: {len(self.succeeded)}/{self.total} logged, {len(self.failed)} failed")
+        for unqid, booking_id, reason in self.failed:
+            print(f"  ⚠️ {booking_id} (unqid {unqid}): {reason}")
+
+
+def _queue_move(mover, unqid, reconcile=False):
+    """
+    mover.add that never fails the row: a failed flush keeps its rows
+    pending, and a row still in the sheet next run is reconciled from the
+    ledger or journal rather than logged again
+    """
+    try:
+        mover.add(unqid, reconcile=reconcile)
+    except Exception as e:
+        print(f"⚠️ Could not move SRNO {unqid} to 'admin logs' yet: {e}")
+
+
+def log_expense_rows(driver, rows, bills_folder, mover, catalog, report, progress=None,
+                     fast_reset=FAST_FORM_RESET, restart=None,
+                     http_client=None, journal=None, ledger=None):
+    """
+    Log rows one after another in one browser session, recording each failure
+    and going on. Returns False only when the browser was lost for good.
+    restart() is called for a new driver when a failed row left the browser dead.
+    With an http_client each row is first tried over plain HTTP and only goes
+    through the browser when the client hands it back. With a journal the
+    submit and its outcome are recorded; rows flagged "resume_ambiguous" always
+    go through the browser and don't confirm the duplicate popup. With a ledger, rows it knows are logged are
+    skipped, and rows it knows are new barely wait for the duplicate popup.
+    Every row gets a timing record, see timing.StepTimer
+    """
+    form_ready = False
+    rows = iter(rows)
+    for row in rows:
+        if progress is not None:
+            progress.update(report.done)
+
+        started = time.perf_counter()
+        TIMER.begin(row["unqid"], booking_id=str(row["booking_id"]))
+        how = "http"
+        success, reason = None, "submit not confirmed"
+        key = journal_key(row) if journal is not None else None
+        before_submit = partial(journal.record, row["unqid"], key, "submitting") if journal is not None else None
+        bill_date = now_ist
+        verdict = None
+        try:
+            if ledger is not None:
+                fetch = partial(fetch_booking_expenses, driver) if EXPENSE_LEDGER_PREFETCH_URL else None
+                verdict = ledger.check(row, bill_date, fetch)
+            if verdict == "logged":
+                print(f"⏭️ Expense for {row['booking_id']} (unqid {row['unqid']}) already logged, skipping")
+                if journal is not None:
+                    journal.record(row["unqid"], key, "submitted", via="ledger")
+                report.record_success(row)
+                _queue_move(mover, row["unqid"], reconcile=True)
+                TIMER.finish(via="ledger", ok=True)
+                continue
+
+            # the HTTP path can't leave a duplicate popup unconfirmed
+            if http_client is not None and not row.get("resume_ambiguous"):
+                if before_submit is not None:
+                    before_submit()
+                with TIMER.span("http.submit"):
+                    success = http_client.submit(row, catalog, bill_date, bill_pdf_bytes(row, bills_folder))
+                if success is False:
+                    reason = "HTTP submit outcome unknown"
+
+            if success is None:
+                how = "reset"
+                if not (fast_reset and form_ready and reset_expense_form(driver)):
+                    how = "reload"
+                    if not navigate_to_expenses_add_page(driver):
+                        raise RuntimeError("could not open expense page")
+
+                if not catalog.scraped:
+                    catalog.scrape(driver)
+
+                success = log_expense(
+                    driver,
+                    row["unqid"],
+                    row["booking_id"],
+                    row["head"],
+                    row["comment"],
+                    row["vendor"],
+                    row["property_name"],
+                    row["amount"],
+                    row["cost_bearer"],
+                    bills_folder,
+                    row.get("pdf"),
+                    catalog,
+                    before_submit=before_submit,
+                    confirm_duplicate=not row.get("resume_ambiguous"),
+                    duplicate_wait=LEDGER_POPUP_WAIT if verdict == "new" else 6
+                )
+        except Exception as e:
+            success, reason = False, f"{type(e).__name__}: {e}"
 
+        TIMER.finish(via=how, ok=bool(success), **({} if success else {"error": reason}))
         if success:
-            move_row_to_log(gs_client, row["unqid"])
+            if ledger is not None:
+                ledger.record(row, bill_date)
+            if journal is not None:
+                journal.record(row["unqid"], key, "submitted", via=how)
+            report.record_success(row)
             print(f"✅ Expense logged for {row['booking_id']}")
-        else:
-            print(f"⚠️ Expense FAILED for {row['booking_id']} (unqid {row['unqid']})")
-            return False
+            _queue_move(mover, row["unqid"])
+            if how != "http":
+                form_ready = True
+                if not fast_reset:
+                    time.sleep(2)
+            TIMER.add(f"expense.{how}", time.perf_counter() - started)
+            continue
+
+        print(f"⚠️ Expense FAILED for {row['booking_id']} (unqid {row['unqid']}): {reason}")
+        report.record_failure(row, reason)
+        form_ready = False
+
+        if restart is not None and not driver_is_alive(driver):
+            driver = restart()
+            if driver is None:
+                for rest in rows:
+                    report.record_failure(rest, "browser session lost")
+                return False
+
+    return True
+
+
+# ------------------ Parallel Logger ------------------
+EXPENSE_LOGGER_WORKERS = int(os.getenv("EXPENSE_LOGGER_WORKERS", "2"))
+# "http" submits the expense form directly (see expense_http.py) and keeps the
+# browser only as a fallback; "selenium" fills every form in Chrome
+EXPENSE_BACKEND = os.getenv("EXPENSE_BACKEND", "selenium")
+
+
+def start_http_client(driver, catalog):
+    """
+    ExpenseHttpClient built from the expense form in a logged-in driver, or
+    None to keep logging through the browser
+    """
+    from expense_http import ExpenseHttpClient
+
+    try:
+        if not navigate_to_expenses_add_page(driver):
+            return None
+        if not catalog.scraped:
+            catalog.scrape(driver)
+        client = ExpenseHttpClient.from_driver(driver)
+    except Exception as e:
+        print(f"⚠️ HTTP logging off, could not read the expense form: {type(e).__name__}: {e}")
+        return None
+    if client is not None:
+        print(f"HTTP logging on: {client.schema['method']} {client.schema['action']}")
+    return client
+
+
+def shard_by_booking(bills_data, workers):
+    """
+    Split rows across workers in sheet order. All rows of a booking land on the
+    same shard, so they are still logged one after another in sheet order
+    """
+    shards = [[] for _ in range(max(1, workers))]
+    assigned = {}
+    for row in bills_data:
+        key = str(row["booking_id"])
+        if key not in assigned:
+            assigned[key] = min(range(len(shards)), key=lambda i: len(shards[i]))
+        shards[assigned[key]].append(row)
+    return [shard for shard in shards if shard]
+
+
+def _expense_worker(worker_id, rows, bills_folder, username, password, session_cache, mover, catalog, report, progress,
+                    journal=None, ledger=None):
+    """
+    One logger thread with its own logged-in browser. rows may be a list or a
+    stream fed by run_expense_pipeline; it is always consumed to the end
+    """
+    rows = iter(rows)
+    log(f"Logger {worker_id}: starting browser")
+
+    def start():
+        try:
+            return start_logged_in_driver(username, password, session_cache)
+        except Exception as e:
+            log(f"❌ Logger {worker_id} could not start Chrome: {e}")
+            return None
+
+    drivers = [start()]
+
+    def restart():
+        log(f"Logger {worker_id}: browser died, starting a new session")
+        try:
+            drivers[-1].quit()
+        except Exception:
+            pass
+        drivers.append(start())
+        return drivers[-1]
 
-        time.sleep(2)
+    http_client = None
+    try:
+        if drivers[0] is None:
+            for row in rows:
+                report.record_failure(row, f"logger {worker_id} could not log in")
+            return
+        if EXPENSE_BACKEND == "http":
+            http_client = start_http_client(drivers[0], catalog)
+        log_expense_rows(
+            drivers[0], rows, bills_folder, mover, catalog, report,
+            progress=progress, restart=restart, http_client=http_client,
+            journal=journal, ledger=ledger
+        )
+    finally:
+        # anything left after a crash still has to be taken off the stream
+        for row in rows:
+            report.record_failure(row, f"logger {worker_id} stopped")
+        if http_client is not None:
+            http_client.close()
+        if drivers[-1] is not None:
+            try:
+                drivers[-1].quit()
+            except Exception:
+                pass
 
 
-def generate_pdfs_from_gsheet(output_folder):
-    worksheet = gs_client.open("vista logs").worksheet("to be logged") #Change INput sheet name here
-    rows = worksheet.get("A:I",value_render_option="UNFORMATTED_VALUE")
+def upload_expenses_parallel(bills_data, bills_folder, gs_client, username, password,
+                             workers=EXPENSE_LOGGER_WORKERS, progress=None, journal=None):
+    """
+    Log bill rows with several independent logged-in browser sessions.
+    Rows are sharded by booking (see shard_by_booking); a failed row is
+    recorded and the rest carry on. Returns the merged ExpenseRunReport
+    """
+    shards = shard_by_booking(bills_data, workers)
+    mover = SheetRowMover(gs_client)
+    catalog = Select2Catalog.load()
+    ledger = ExpenseLedger.load() if EXPENSE_LEDGER else None
+    report = ExpenseRunReport(len(bills_data))
+    session_cache = SessionCache(username, password)
+
+    print(f"Logging {len(bills_data)} expenses with {len(shards)} browser sessions")
+    try:
+        with ThreadPoolExecutor(max_workers=len(shards) or 1, thread_name_prefix="expense-logger") as pool:
+            futures = [
+                pool.submit(
+                    _expense_worker, worker_id, shard, bills_folder, username, password, session_cache,
+                    mover, catalog, report, progress, journal, ledger
+                )
+                for worker_id, shard in enumerate(shards, start=1)
+            ]
+            for future in futures:
+                future.result()
+    finally:
+        mover.flush()
+        catalog.save()
+        if ledger is not None:
+            ledger.save()
+        TIMER.print_summary()
+        report.print_summary()
+
+    return report
+
+
+def read_bill_rows():
+    """
+    Valid rows of "to be logged" as bill row dicts, in sheet order
+    """
+    with TIMER.span("sheets.read"):
+        worksheet = get_gs_client().open("vista logs").worksheet("to be logged") #Change INput sheet name here
+        rows = worksheet.get("A:I",value_render_option="UNFORMATTED_VALUE")
 
     print(rows)
     headers = rows[0]
     data_rows = rows[1:]
 
     bill_rows = []
-
     for row in data_rows:
-        row += [""] * (4 - len(row))
+        row += [""] * (9 - len(row))
 
         unqid          = row[0].strip()
         booking_id     = row[1]
@@ -675,15 +2140,6 @@ def generate_pdfs_from_gsheet(output_folder):
         if not booking_id or not vendor_name or not amount:
             continue
 
-        create_invoice_pdf(
-            unqid,
-            booking_id,
-            vendor_name,
-            property_name,
-            amount,
-            output_folder
-        )
-
         bill_rows.append({
             "unqid": unqid,
             "booking_id": booking_id,
@@ -693,109 +2149,534 @@ def generate_pdfs_from_gsheet(output_folder):
             "vendor": vendor_name,
             "property_name": property_name,
             "amount": amount,
+            "pdf": None,
         })
-
     return bill_rows
-    
 
-def update_status(gs_client, text, bg_color):
+
+def generate_pdfs_from_gsheet(output_folder, parallel=False, max_workers=None, in_memory=False, cache=True):
     """
-    Updates status text & background color in to be logged!M1
+    Render (and upload) an invoice for every valid row in "to be logged".
+    With parallel=True the ReportLab builds are spread across a process pool;
+    rows whose invoice fails are reported and left out instead of stopping the batch.
+    With in_memory=True invoices go straight from memory to Drive and each
+    row carries its PDF bytes under "pdf" for upload_bill to write later.
+    With cache=True invoices already rendered and uploaded by an earlier
+    (failed) run are reused, see invoice_cache_action
     """
+    bill_rows = read_bill_rows()
+
+    manifest = load_invoice_manifest(output_folder) if cache else None
+    session = DriveUploadSession(DRIVE_FOLDER_ID)
+
     try:
+        if not parallel:
+            for r in bill_rows:
+                r["pdf"] = create_invoice_pdf(
+                    r["unqid"],
+                    r["booking_id"],
+                    r["vendor"],
+                    r["property_name"],
+                    r["amount"],
+                    output_folder,
+                    in_memory=in_memory,
+                    manifest=manifest,
+                    session=session
+                )
+            session.summary()
+            return bill_rows
+
+        return _render_and_publish_parallel(bill_rows, output_folder, max_workers, in_memory, manifest, session)
+
+    finally:
+        if manifest is not None:
+            save_invoice_manifest(output_folder, manifest, keep={r["unqid"] for r in bill_rows})
+
+
+def _render_and_publish_parallel(bill_rows, output_folder, max_workers, in_memory, manifest, session):
+    pending = []
+    jobs = []
+    for r in bill_rows:
+        filename = os.path.join(output_folder, f"{r['unqid']}.pdf")
+        key = invoice_cache_key(r["unqid"], r["booking_id"], r["vendor"], r["property_name"], r["amount"])
+        action = invoice_cache_action(manifest, r["unqid"], key, filename, session) if manifest is not None else "upload"
+        if action == "skip":
+            print(f"Unchanged invoice {filename}, skipping render and upload")
+            continue
+        pending.append((r, filename, key, action))
+        jobs.append((r["unqid"], r["booking_id"], r["vendor"], r["property_name"], r["amount"], output_folder))
+
+    failed = {}
+
+    # Renders come back in sheet order and go straight onto the upload queue,
+    # so Drive uploads overlap with the pool rendering the rows behind them
+    uploads = []
+    with ThreadPoolExecutor(max_workers=DRIVE_UPLOAD_WORKERS, thread_name_prefix="drive-upload") as uploader:
+        results = render_invoices_parallel(jobs, max_workers=max_workers, in_memory=in_memory)
+        for (bill_row, filename, key, action), (job, result, error) in zip(pending, results):
+            if error is not None:
+                failed[bill_row["unqid"]] = error
+                continue
+            if in_memory:
+                bill_row["pdf"] = result
+            future = uploader.submit(
+                publish_invoice, bill_row["unqid"], key, filename, bill_row["pdf"], action, manifest, session
+            )
+            uploads.append((bill_row, future))
+
+        for bill_row, future in uploads:
+            try:
+                future.result()
+            except Exception as e:
+                failed[bill_row["unqid"]] = f"Drive upload failed: {e}"
+
+    session.summary()
+
+    for bill_row in bill_rows:
+        if bill_row["unqid"] in failed:
+            print(f"⚠️ Invoice FAILED for {bill_row['booking_id']} (unqid {bill_row['unqid']}): {failed[bill_row['unqid']]}")
+
+    if failed:
+        print(f"⚠️ {len(failed)}/{len(bill_rows)} invoices failed, continuing with {len(bill_rows) - len(failed)}")
+
+    return [r for r in bill_rows if r["unqid"] not in failed]
+
+
+# ------------------ Run Journal ------------------
+JOURNAL_PATH = os.path.join(os.path.expanduser("~"), ".cache", "stayvista", "expense_journal.jsonl")
+JOURNAL_STAGES = ("submitting", "submitted", "moved")
+
+
+def journal_key(row):
+    """
+    Fingerprint of a bill row; journal entries only apply to an unchanged row
+    """
+    parts = [row[k] for k in ("unqid", "booking_id", "head", "comment", "cost_bearer", "vendor", "property_name", "amount")]
+    return hashlib.sha1(json.dumps(parts, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+class RunJournal:
+    """
+    Append-only JSONL record of how far each bill row got, one fsync'd line
+    per stage: submitting (right before the submit click), submitted, moved.
+    A row left at "submitting" may or may not exist on the admin site.
+    Rendering and uploading aren't journaled; the invoice manifest already
+    skips unchanged invoices. Completed rows are dropped by compact() at the
+    end of a run
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._load()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        try:
+            with open(self.path, "rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    # a record cut short by a crash; drop it so the next
+                    # record doesn't get appended to the same line
+                    data = data[:data.rfind(b"\n") + 1]
+                    f.truncate(len(data))
+        except OSError:
+            return
+        for line in data.decode("utf-8", errors="replace").splitlines():
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                # unreadable, or written by a different version of this class
+                continue
+
+    def _apply(self, rec):
+        if rec["stage"] not in JOURNAL_STAGES:
+            return
+        entry = self.entries.get(rec["unqid"])
+        if entry is None or entry["key"] != rec["key"]:
+            entry = self.entries[rec["unqid"]] = {"key": rec["key"], "stages": {}}
+        entry["stages"][rec["stage"]] = rec
+
+    def record(self, unqid, key, stage, **extra):
+        rec = {
+            "ts": datetime.now(ist).isoformat(timespec="seconds"),
+            "unqid": str(unqid),
+            "key": key,
+            "stage": stage,
+            **extra
+        }
+        line = json.dumps(rec) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._apply(rec)
+
+    def stage(self, unqid, key):
+        """
+        Furthest stage recorded for this version of the row, or None
+        """
+        with self._lock:
+            entry = self.entries.get(str(unqid))
+            if entry is None or entry["key"] != key:
+                return None
+            done = [s for s in JOURNAL_STAGES if s in entry["stages"]]
+        return done[-1] if done else None
+
+    def compact(self, current=None):
+        """
+        Rewrite the journal without rows that were moved to "admin logs" and,
+        given current (the unqids still in the sheet), without rows that left
+        the sheet some other way
+        """
+        with self._lock:
+            keep = {
+                u: e for u, e in self.entries.items()
+                if "moved" not in e["stages"] and (current is None or u in current)
+            }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in keep.values():
+                    for stage in JOURNAL_STAGES:
+                        if stage in entry["stages"]:
+                            f.write(json.dumps(entry["stages"][stage]) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self.entries = keep
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+# ------------------ Pipeline ------------------
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+EXPENSE_PIPELINE = os.getenv("EXPENSE_PIPELINE", "1") != "0"
+
+_END = object()
+
+
+def _drain(q):
+    while True:
+        item = q.get()
+        if item is _END:
+            return
+        yield item
+
+
+class _LoggerDispatch:
+    """
+    Routes rows to logger queues: a booking sticks to the logger that got its
+    first row, new bookings go to the logger with the fewest rows so far
+    """
+
+    def __init__(self, queues):
+        self.queues = queues
+        self.assigned = {}
+        self.counts = [0] * len(queues)
+        self._lock = threading.Lock()
+
+    def put(self, row):
+        with self._lock:
+            key = str(row["booking_id"])
+            if key not in self.assigned:
+                self.assigned[key] = min(range(len(self.queues)), key=lambda i: self.counts[i])
+            index = self.assigned[key]
+            self.counts[index] += 1
+        # blocks while that logger is queue_size rows behind
+        self.queues[index].put(row)
+
+    def close(self):
+        for q in self.queues:
+            q.put(_END)
+
+
+def run_expense_pipeline(bills_folder, gs_client, username, password, workers=EXPENSE_LOGGER_WORKERS,
+                         max_workers=None, in_memory=True, cache=True, queue_size=PIPELINE_QUEUE_SIZE):
+    """
+    Streaming version of generate_pdfs_from_gsheet + upload_expenses_parallel:
+    sheet read -> render (process pool) -> Drive upload (thread pool) ->
+    admin log (one browser per logger) -> sheet move (background mover).
+    Stages are joined by bounded queues, and Chrome starts and logs in while
+    the first invoices render. Every row's progress goes to the RunJournal, so
+    a run that died part way resumes where it stopped: rows already submitted
+    are only moved, rows cut off mid-submit are checked against the duplicate
+    popup instead of being logged twice. Returns the ExpenseRunReport, or None
+    when the sheet has no valid rows
+    """
+    bill_rows = read_bill_rows()
+    if not bill_rows:
+        return None
+
+    journal = RunJournal()
+    keys = {r["unqid"]: journal_key(r) for r in bill_rows}
+
+    def moved(unqids):
+        for unqid in unqids:
+            if unqid in keys:
+                journal.record(unqid, keys[unqid], "moved")
+
+    report = ExpenseRunReport(len(bill_rows))
+    progress = StatusProgress(gs_client, len(bill_rows))
+    mover = SheetRowMover(gs_client, background=True, on_moved=moved)
+    ledger = ExpenseLedger.load() if EXPENSE_LEDGER else None
+
+    pending_rows = []
+    for r in bill_rows:
+        stage = journal.stage(r["unqid"], keys[r["unqid"]])
+        if stage in ("submitted", "moved"):
+            print(f"Resuming: {r['booking_id']} (unqid {r['unqid']}) already logged, only moving it")
+            mover.add(r["unqid"], reconcile=True)
+            report.record_success(r)
+            continue
+        if stage == "submitting":
+            print(f"Resuming: {r['booking_id']} (unqid {r['unqid']}) may already be logged, checking for a duplicate")
+            r["resume_ambiguous"] = True
+        pending_rows.append(r)
+    catalog = Select2Catalog.load()
+    session_cache = SessionCache(username, password)
+    manifest = load_invoice_manifest(bills_folder) if cache else None
+    session = DriveUploadSession(DRIVE_FOLDER_ID)
+
+    logger_count = max(1, min(workers, len({str(r["booking_id"]) for r in pending_rows})))
+    dispatch = _LoggerDispatch([queue.Queue(maxsize=queue_size) for _ in range(logger_count)])
+    rendered = queue.Queue(maxsize=queue_size)
+    upload_slots = threading.BoundedSemaphore(queue_size + DRIVE_UPLOAD_WORKERS)
+
+    print(f"Pipeline: {len(pending_rows)}/{len(bill_rows)} rows to log, {logger_count} browser sessions")
+
+    def fail(row, reason):
+        print(f"⚠️ Invoice FAILED for {row['booking_id']} (unqid {row['unqid']}): {reason}")
+        report.record_failure(row, reason)
+
+    def render_stage(render_pool):
+        # submits renders in sheet order; the bounded queue caps renders in flight
+        try:
+            for r in pending_rows:
+                filename = os.path.join(bills_folder, f"{r['unqid']}.pdf")
+                key = invoice_cache_key(r["unqid"], r["booking_id"], r["vendor"], r["property_name"], r["amount"])
+                try:
+                    action = invoice_cache_action(manifest, r["unqid"], key, filename, session) if manifest is not None else "upload"
+                    if action == "skip":
+                        print(f"Unchanged invoice {filename}, skipping render and upload")
+                        render = None
+                    else:
+                        job = (r["unqid"], r["booking_id"], r["vendor"], r["property_name"], r["amount"], bills_folder)
+                        render = render_pool.submit(_render_invoice_job, job, in_memory)
+                except Exception as e:
+                    fail(r, f"Invoice failed: {type(e).__name__}: {e}")
+                    continue
+                rendered.put((r, filename, key, action, render))
+        finally:
+            rendered.put(_END)
+
+    def upload_done(row, future):
+        upload_slots.release()
+        try:
+            future.result()
+        except Exception as e:
+            fail(row, f"Drive upload failed: {e}")
+            return
+        dispatch.put(row)
+
+    def upload_stage(uploader):
+        try:
+            for r, filename, key, action, render in _drain(rendered):
+                if render is None:
+                    dispatch.put(r)
+                    continue
+                try:
+                    result, error = render.result()
+                except Exception as e:
+                    result, error = None, f"{type(e).__name__}: {e}"
+                if error is not None:
+                    fail(r, f"Invoice failed: {error}")
+                    continue
+                if in_memory:
+                    r["pdf"] = result
+                upload_slots.acquire()
+                future = uploader.submit(publish_invoice, r["unqid"], key, filename, r["pdf"], action, manifest, session)
+                future.add_done_callback(partial(upload_done, r))
+        finally:
+            uploader.shutdown(wait=True)
+            dispatch.close()
+
+    try:
+        # nothing to render or log when every row was done by an earlier run
+        if pending_rows:
+            with ThreadPoolExecutor(max_workers=logger_count + 2, thread_name_prefix="pipeline") as stages:
+                # Chrome startup and login overlap with the first renders
+                loggers = [
+                    stages.submit(
+                        _expense_worker, worker_id, _drain(q), bills_folder, username, password, session_cache,
+                        mover, catalog, report, progress, journal, ledger
+                    )
+                    for worker_id, q in enumerate(dispatch.queues, start=1)
+                ]
+                # spawn, not fork: the logger threads are already running
+                renderers = render_pool(max_workers)
+                uploader = ThreadPoolExecutor(max_workers=DRIVE_UPLOAD_WORKERS, thread_name_prefix="drive-upload")
+                with renderers:
+                    stages.submit(render_stage, renderers)
+                    uploads = stages.submit(upload_stage, uploader)
+                    uploads.result()
+                for future in loggers:
+                    future.result()
+    finally:
+        mover.flush()
+        journal.compact(current=set(keys))
+        journal.close()
+        catalog.save()
+        if ledger is not None:
+            ledger.save()
+        session.summary()
+        if manifest is not None:
+            save_invoice_manifest(bills_folder, manifest, keep={r["unqid"] for r in bill_rows})
+        TIMER.print_summary()
+        report.print_summary()
+
+    return report
+    
+
+_status_sheet_ids = None
+
+def _status_sheet(gs_client):
+    """
+    (spreadsheet id, sheet id) of "to be logged", looked up once per run
+    """
+    global _status_sheet_ids
+    if _status_sheet_ids is None:
         ss = gs_client.open("vista logs")
         ws = ss.worksheet("to be logged")
+        _status_sheet_ids = (ss.id, ws.id)
+    return _status_sheet_ids
+
 
-        # ✅ Correct way to update single cell
-        ws.update_acell("M1", text)
-        ws.update_acell("M2", now_ist.strftime("%d-%b-%Y %I:%M %p"))
+def update_status(gs_client, text, bg_color, stamp=True):
+    """
+    Updates status text & background color in to be logged!M1 and the
+    timestamp in M2 (cleared when stamp=False), all in one batchUpdate
+    """
+    try:
+        spreadsheet_id, sheet_id = _status_sheet(gs_client)
+        stamp_text = now_ist.strftime("%d-%b-%Y %I:%M %p") if stamp else ""
 
-        sheets_service.spreadsheets().batchUpdate(
-            spreadsheetId=ss.id,
+        request = get_sheets_service().spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
             body={
                 "requests": [
                     {
-                        "repeatCell": {
-                            "range": {
-                                "sheetId": ws.id,
-                                "startRowIndex": 0,
-                                "endRowIndex": 1,
-                                "startColumnIndex": 12,  # Column M
-                                "endColumnIndex": 13
-                            },
-                            "cell": {
-                                "userEnteredFormat": {
-                                    "backgroundColor": bg_color,
-                                    "textFormat": {
-                                        "bold": True
+                        # M1: text + format
+                        "updateCells": {
+                            "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 12},
+                            "rows": [{
+                                "values": [{
+                                    "userEnteredValue": {"stringValue": text},
+                                    "userEnteredFormat": {
+                                        "backgroundColor": bg_color,
+                                        "textFormat": {
+                                            "bold": True
+                                        }
                                     }
-                                }
-                            },
-                            "fields": "userEnteredFormat(backgroundColor,textFormat)"
+                                }]
+                            }],
+                            "fields": "userEnteredValue,userEnteredFormat(backgroundColor,textFormat)"
+                        }
+                    },
+                    {
+                        # M2: timestamp only, its format is left alone
+                        "updateCells": {
+                            "start": {"sheetId": sheet_id, "rowIndex": 1, "columnIndex": 12},
+                            "rows": [{
+                                "values": [{
+                                    "userEnteredValue": {"stringValue": stamp_text}
+                                }]
+                            }],
+                            "fields": "userEnteredValue"
                         }
                     }
                 ]
             }
-        ).execute()
+        )
+        with TIMER.span("sheets.status"):
+            request.execute()
 
     except Exception as e:
         print("⚠️ Failed to update status cell:", e)
 
 
+class StatusProgress:
+    """
+    Live "37/210 logged, ETA 4m" progress in to be logged!M1. Writes at most
+    once every min_interval seconds so a fast run stays far below the Sheets
+    write quota (60 writes/min per user)
+    """
+
+    def __init__(self, gs_client, total, min_interval=15):
+        self.gs_client = gs_client
+        self.total = total
+        self.min_interval = min_interval
+        self.started = time.monotonic()
+        self._last_write = 0
+        self._lock = threading.Lock()
+
+    def update(self, done, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_write < self.min_interval:
+                return
+            self._last_write = now
+
+        text = f"{done}/{self.total} logged"
+        if 0 < done < self.total:
+            eta = (now - self.started) / done * (self.total - done)
+            text += f", ETA {_format_eta(eta)}"
+        update_status(self.gs_client, text, {"red": 0.8, "green": 1, "blue": 0.8}, stamp=False)
+
+
+def _format_eta(seconds):
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    if seconds < 3600:
+        return f"{round(seconds / 60)}m"
+    return f"{int(seconds // 3600)}h {round(seconds % 3600 / 60)}m"
+
+
 def main():
+    gs_client = get_gs_client()
     try:
         update_status(
             gs_client,
             "Logging expense to admin module",
-            {"red": 0.8, "green": 1, "blue": 0.8}
+            {"red": 0.8, "green": 1, "blue": 0.8},
+            stamp=False
         )
-        ss = gs_client.open("vista logs")
-        ws = ss.worksheet("to be logged")
-        ws.update_acell("M2", "")
 
         username = os.getenv("EMAIL")
         password = os.getenv("PASSWORD")
         bills_folder = "/tmp/stayvista_invoices_pdf"
 
-        bills_data = generate_pdfs_from_gsheet(bills_folder)
+        if EXPENSE_PIPELINE:
+            report = run_expense_pipeline(bills_folder, gs_client, username, password)
+        else:
+            # two phases: every invoice first, then the browser loggers
+            bills_data = generate_pdfs_from_gsheet(bills_folder, parallel=True, in_memory=True)
+            report = None
+            if bills_data:
+                progress = StatusProgress(gs_client, len(bills_data))
+                report = upload_expenses_parallel(
+                    bills_data, bills_folder, gs_client, username, password, progress=progress
+                )
 
-        if not bills_data:
+        if report is None:
             raise Exception("No valid bills found")
 
-        driver = setup_driver()
-        driver.execute_cdp_cmd(
-            "Page.addScriptToEvaluateOnNewDocument",
-            {
-                "source": """
-                (function() {
-                    const origFetch = window.fetch;
-                    window.fetch = function() {
-                        return origFetch.apply(this, arguments).then(res => {
-                            if (res.url.includes('/expenses') && res.status === 200) {
-                                window.__expenseSubmitSuccess = true;
-                            }
-                            return res;
-                        });
-                    };
-
-                    const origOpen = XMLHttpRequest.prototype.open;
-                    XMLHttpRequest.prototype.open = function(method, url) {
-                        this.addEventListener('load', function() {
-                            if (url.includes('/expenses') && this.status === 200) {
-                                window.__expenseSubmitSuccess = true;
-                            }
-                        });
-                        origOpen.apply(this, arguments);
-                    };
-                })();
-                """
-            }
-        )
-
-        if not login_to_stayvista(driver, username, password):
-            raise Exception("Login failed")
-
-        success = upload_expenses(driver, bills_data, bills_folder, gs_client)
+        success = report.all_ok
 
         if not success:
             update_status(
@@ -820,12 +2701,6 @@ def main():
         print("❌ Script failed:", e)
         raise
 
-    finally:
-        try:
-            driver.quit()
-        except:
-            pass
-
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,157 @@
+import argparse
+import secrets
+from flask import Flask, request, jsonify, make_response, redirect
+
+# Stand-in for admin.vistarooms.com: just enough of login, /expenses/log and
+# the expense POST to exercise the HTTP logging backend without the real site.
+# Not for production use
+
+app = Flask(__name__)
+
+CSRF_TOKEN = secrets.token_hex(20)
+SESSIONS = set()
+EXPENSES = []
+
+OPTIONS = {
+    "expensetype": {"11": "F&B", "12": "Maintenance"},
+    "expenshead": {"21": "Cook Charges", "22": "Groceries"},
+    "vendor_name": {"31": "Sanjyot Patil", "32": "Local Vendor"},
+    "expense_villa_list": {"41": "The Blue Horizon", "42": "Casa Verde"},
+}
+BOOKINGS = {"901": "1216298", "902": "1229927", "903": "1229927-A"}
+COST_BEARERS = [("SV Managed", "sv", False), ("Owner", "owner", False), ("Guest", "guest", True)]
+
+FORM = """<!doctype html>
+<html><head><meta name="csrf-token" content="{token}"></head>
+<body>
+<form id="expenseForm" action="/expenses/store" method="post" enctype="multipart/form-data">
+  <input type="hidden" name="_token" value="{token}">
+  <input type="hidden" name="source" value="admin">
+  {selects}
+  <input id="expense_head_categoriespart" name="categories_part">
+  <select name="cost_bearer">{cost_bearers}</select>
+  <input id="invoice_number" name="invoice_no">
+  <input id="bill_date" name="bill_date" type="date">
+  <select id="bookingid_expenses" name="booking_id" data-ajax--url="/bookings/search"></select>
+  <input name="quantity[]">
+  <input name="rate_per_unit[]">
+  <select name="tax_percentage[]"><option value="t0">0</option><option value="t5">5</option></select>
+  <input id="bill" name="bill_file" type="file">
+  <button type="submit" name="submitButton">Save</button>
+</form>
+</body></html>
+"""
+
+REQUIRED = [
+    "expense_type", "expense_head", "categories_part", "vendor_id", "villa_id",
+    "cost_bearer", "invoice_no", "bill_date", "booking_id", "quantity[]",
+    "rate_per_unit[]", "tax_percentage[]",
+]
+SELECT_NAMES = {
+    "expensetype": "expense_type",
+    "expenshead": "expense_head",
+    "vendor_name": "vendor_id",
+    "expense_villa_list": "villa_id",
+}
+
+
+def logged_in():
+    return request.cookies.get("admin_session") in SESSIONS
+
+
+@app.route("/login", methods=["GET", "POST"])
+def login():
+    if request.method == "GET":
+        return '<form method="post"><input name="email"><input name="password" type="password">' \
+               '<button id="loginViaPasswordBtn">Login</button></form>'
+    sid = secrets.token_hex(16)
+    SESSIONS.add(sid)
+    resp = make_response(redirect("/dashboard"))
+    resp.set_cookie("admin_session", sid, httponly=True)
+    return resp
+
+
+@app.route("/dashboard")
+def dashboard():
+    if not logged_in():
+        return redirect("/login")
+    return "dashboard"
+
+
+@app.route("/expenses/log")
+def expense_form():
+    if not logged_in():
+        return redirect("/login")
+    selects = "\n  ".join(
+        f'<select id="{sid}" name="{SELECT_NAMES[sid]}">'
+        + "".join(f'<option value="{v}">{t}</option>' for v, t in opts.items())
+        + "</select>"
+        for sid, opts in OPTIONS.items()
+    )
+    cost_bearers = "".join(
+        f'<option value="{v}"{" disabled" if off else ""}>{t}</option>' for t, v, off in COST_BEARERS
+    )
+    return FORM.format(token=CSRF_TOKEN, selects=selects, cost_bearers=cost_bearers)
+
+
+@app.route("/bookings/search")
+def booking_search():
+    if not logged_in():
+        return jsonify({"message": "Unauthenticated."}), 401
+    term = request.args.get("term", "")
+    results = [{"id": k, "text": v} for k, v in BOOKINGS.items() if term and term in v]
+    return jsonify({"results": results, "pagination": {"more": False}})
+
+
+@app.route("/expenses/store", methods=["POST"])
+def store_expense():
+    if not logged_in():
+        return jsonify({"message": "Unauthenticated."}), 401
+    if CSRF_TOKEN not in (request.form.get("_token"), request.headers.get("X-CSRF-TOKEN")):
+        return jsonify({"message": "CSRF token mismatch."}), 419
+
+    missing = [name for name in REQUIRED if not request.form.get(name)]
+    if "bill_file" not in request.files:
+        missing.append("bill_file")
+    if missing:
+        return jsonify({"status": "error", "errors": {name: ["required"] for name in missing}}), 422
+
+    expense = {name: request.form.get(name) for name in REQUIRED}
+    key = (expense["booking_id"], expense["expense_head"], expense["vendor_id"], expense["rate_per_unit[]"])
+    if any(e["key"] == key for e in EXPENSES) and request.form.get("confirm_duplicate") != "1":
+        return jsonify({"status": "duplicate", "message": "Possible duplicate expense"})
+
+    expense["key"] = key
+    expense["bill_bytes"] = len(request.files["bill_file"].read())
+    EXPENSES.append(expense)
+    return jsonify({"status": "success", "id": len(EXPENSES)})
+
+
+@app.route("/expenses/list")
+def booking_expenses():
+    # shape expected by EXPENSE_LEDGER_PREFETCH_URL="/expenses/list?booking_id={booking_id}"
+    if not logged_in():
+        return jsonify({"message": "Unauthenticated."}), 401
+    booking = request.args.get("booking_id", "")
+    return jsonify({"data": [
+        {
+            "booking_id": BOOKINGS[e["booking_id"]],
+            "expense_head": OPTIONS["expenshead"].get(e["expense_head"]),
+            "vendor_name": OPTIONS["vendor_name"].get(e["vendor_id"]),
+            "amount": e["rate_per_unit[]"],
+            "bill_date": e["bill_date"],
+        }
+        for e in EXPENSES if BOOKINGS.get(e["booking_id"]) == booking
+    ]})
+
+
+@app.route("/dev/expenses")
+def list_expenses():
+    return jsonify([{k: v for k, v in e.items() if k != "key"} for e in EXPENSES])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the StayVista admin expense form")
+    parser.add_argument("--port", type=int, default=5001)
+    args = parser.parse_args()
+    app.run(host="127.0.0.1", port=args.port)
@@ -0,0 +1,286 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# ------------------ Form Schema ------------------
+# Where log_expense types each value, by role. The names the server expects are
+# read from these elements on the live form rather than hardcoded here
+FORM_FIELDS = {
+    "expense_type": "#expensetype",
+    "head": "#expenshead",
+    "comment": "#expense_head_categoriespart",
+    "vendor": "#vendor_name",
+    "property": "#expense_villa_list",
+    "cost_bearer": "[name='cost_bearer']",
+    "invoice_number": "#invoice_number",
+    "bill_date": "#bill_date",
+    "booking": "#bookingid_expenses",
+    "quantity": "[name='quantity[]']",
+    "rate": "[name='rate_per_unit[]']",
+    "tax": "[name='tax_percentage[]']",
+    "bill": "#bill",
+}
+
+# Select2 catalog field behind each role that takes an option ID
+CATALOG_ROLES = {
+    "expense_type": "expensetype",
+    "head": "expenshead",
+    "vendor": "vendor_name",
+    "property": "expense_villa_list",
+}
+
+# "status" of the JSON answer to the expense POST. Anything else leaves the
+# outcome unknown
+SUBMIT_OK = (True, "success", "ok")
+SUBMIT_REJECTED = (False, "error")
+
+# Must run on a freshly loaded, blank /expenses/log
+READ_FORM_SCHEMA = """
+const submit = document.querySelector('[name="submitButton"]');
+const form = submit && submit.form;
+if (!form) return null;
+
+const fields = {}, options = {};
+for (const [role, selector] of Object.entries(arguments[0])) {
+    const el = form.querySelector(selector);
+    fields[role] = el ? el.name : null;
+    if (el && el.tagName === 'SELECT' && !(window.jQuery && jQuery(el).data('select2'))) {
+        options[role] = [...el.options].map(o => [o.text.trim(), o.value, o.disabled]);
+    }
+}
+
+// everything else the form would send untouched (_token, hidden defaults)
+const mapped = new Set(Object.values(fields));
+const extra = [];
+for (const el of form.elements) {
+    if (!el.name || mapped.has(el.name) || el.disabled) continue;
+    if (['file', 'submit', 'button', 'reset'].includes(el.type)) continue;
+    if (['checkbox', 'radio'].includes(el.type) && !el.checked) continue;
+    extra.push([el.name, el.value]);
+}
+
+const booking = form.querySelector(arguments[0].booking);
+let bookingUrl = null;
+if (booking) {
+    const s2 = window.jQuery && jQuery(booking).data('select2');
+    const ajax = s2 && s2.options.get('ajax');
+    bookingUrl = ajax && typeof ajax.url === 'string' ? ajax.url : booking.getAttribute('data-ajax--url');
+    if (bookingUrl) bookingUrl = new URL(bookingUrl, location.href).href;
+}
+
+const meta = document.querySelector('meta[name="csrf-token"]');
+const token = form.querySelector('[name="_token"]');
+return {
+    action: form.action,
+    method: (form.getAttribute('method') || 'post').toUpperCase(),
+    fields: fields,
+    options: options,
+    extra: extra,
+    booking_url: bookingUrl,
+    csrf: meta ? meta.content : (token ? token.value : null),
+    referer: location.href,
+    user_agent: navigator.userAgent
+};
+"""
+
+
+def _norm(text):
+    return " ".join(str(text).split()).lower()
+
+
+class ExpenseHttpClient:
+    """
+    Submits the expense form straight over HTTP with the cookies of a logged-in
+    browser, using the field names, action and CSRF token read from the live
+    form. submit() returns None whenever a row can't be mapped or the server
+    turns it away, so the caller can log it through the browser instead.
+    Not thread-safe: one per logger
+    """
+
+    def __init__(self, schema, cookies, pool_size=4, timeout=30):
+        self.schema = schema
+        self.timeout = timeout
+        self.disabled = None
+        self._bookings = {}
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain"),
+                path=cookie.get("path", "/")
+            )
+        self.session.headers.update({
+            "User-Agent": schema["user_agent"],
+            "Referer": schema["referer"],
+            "X-Requested-With": "XMLHttpRequest",
+            "Accept": "application/json, text/html;q=0.9",
+        })
+        if schema.get("csrf"):
+            self.session.headers["X-CSRF-TOKEN"] = schema["csrf"]
+
+    @classmethod
+    def from_driver(cls, driver, **kwargs):
+        """
+        Client for the expense form currently open in driver, or None if the
+        page doesn't look like the form log_expense fills
+        """
+        schema = driver.execute_script(READ_FORM_SCHEMA, FORM_FIELDS)
+        if not schema:
+            return None
+        missing = [role for role, name in schema["fields"].items() if not name]
+        if missing:
+            print(f"⚠️ HTTP logging off, form fields not found: {', '.join(missing)}")
+            return None
+        return cls(schema, driver.get_cookies(), **kwargs)
+
+    @property
+    def enabled(self):
+        return self.disabled is None
+
+    def close(self):
+        self.session.close()
+
+    # ---------- field values ----------
+    def _plain_option(self, role, *texts):
+        for text in texts:
+            for label, value, disabled in self.schema["options"].get(role, []):
+                if _norm(label) == _norm(text) and not disabled:
+                    return value
+        return None
+
+    def resolve_booking(self, booking_id):
+        """
+        Option value for a booking from the same endpoint the Select2 box
+        searches, or None unless exactly one option matches
+        """
+        booking_id = str(booking_id).strip()
+        with self._lock:
+            if booking_id in self._bookings:
+                return self._bookings[booking_id]
+        url = self.schema.get("booking_url")
+        if not url:
+            return None
+        resp = self.session.get(
+            url,
+            params={"term": booking_id, "q": booking_id, "_type": "query", "page": 1},
+            timeout=self.timeout
+        )
+        resp.raise_for_status()
+        results = []
+        for item in resp.json().get("results", []):
+            results.extend(item.get("children", [item]))
+
+        exact = [r for r in results if _norm(r.get("text", "")) == _norm(booking_id)]
+        match = exact or (results if len(results) == 1 else [])
+        value = str(match[0]["id"]) if len(match) == 1 else None
+        with self._lock:
+            self._bookings[booking_id] = value
+        return value
+
+    def build_form(self, row, catalog, bill_date):
+        """
+        (form fields, reason) for one bill row. Fields are None, with the reason,
+        when a value can't be mapped without the browser
+        """
+        fields = self.schema["fields"]
+        values = {
+            "expense_type": "F&B",
+            "head": row["head"],
+            "vendor": row["vendor"],
+            "property": row["property_name"],
+        }
+        data = list(self.schema["extra"])
+        for role, text in values.items():
+            cached = catalog.lookup(CATALOG_ROLES[role], text) if catalog is not None else None
+            if cached is None:
+                return None, f"no cached option for {role} {text!r}"
+            data.append((fields[role], cached[1]))
+
+        cost_bearer = self._plain_option("cost_bearer", row["cost_bearer"], "SV Managed")
+        if cost_bearer is None:
+            return None, "no valid cost bearer"
+        tax = self._plain_option("tax", "0")
+        if tax is None:
+            return None, "no 0% tax option"
+        booking = self.resolve_booking(row["booking_id"])
+        if booking is None:
+            return None, f"booking {row['booking_id']} not found"
+
+        data += [
+            (fields["comment"], row["comment"]),
+            (fields["cost_bearer"], cost_bearer),
+            (fields["invoice_number"], "1"),
+            (fields["bill_date"], bill_date.strftime("%Y-%m-%d")),
+            (fields["booking"], booking),
+            (fields["quantity"], "1"),
+            (fields["rate"], str(row["amount"])),
+            (fields["tax"], tax),
+        ]
+        return data, None
+
+    # ---------- submit ----------
+    def submit(self, row, catalog, bill_date, pdf_bytes):
+        """
+        True when the server accepted the expense, None to log this row through
+        the browser instead (nothing was created, or the site flagged a
+        duplicate), False when the outcome is unknown. Only the JSON "status"
+        decides. Session or CSRF failures turn the client off
+        """
+        if not self.enabled:
+            return None
+        if pdf_bytes is None:
+            return None
+        try:
+            data, reason = self.build_form(row, catalog, bill_date)
+        except (requests.RequestException, ValueError) as e:
+            data, reason = None, f"booking lookup failed: {e}"
+        if data is None:
+            print(f"HTTP logging skipped for {row['booking_id']}: {reason}")
+            return None
+
+        files = {self.schema["fields"]["bill"]: (f"{row['unqid']}.pdf", pdf_bytes, "application/pdf")}
+        try:
+            resp = self.session.request(
+                self.schema["method"],
+                self.schema["action"],
+                data=data,
+                files=files,
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            # the expense may exist now, so don't hand it to the browser as well
+            print(f"❌ HTTP submit failed for {row['booking_id']}: {e}")
+            return False
+
+        if resp.status_code in (401, 403, 419) or "/login" in resp.url:
+            self.disabled = f"session rejected ({resp.status_code})"
+            print(f"⚠️ HTTP logging off: {self.disabled}")
+            return None
+        if resp.status_code >= 500:
+            print(f"❌ HTTP submit for {row['booking_id']} returned {resp.status_code}")
+            return False
+        if not resp.ok:
+            print(f"⚠️ HTTP submit for {row['booking_id']} returned {resp.status_code}")
+            return None
+        try:
+            body = resp.json()
+        except ValueError:
+            body = None
+        status = body.get("status") if isinstance(body, dict) else None
+        if status in SUBMIT_OK:
+            return True
+        # the browser path knows how to confirm the site's duplicate popup
+        if status == "duplicate":
+            return None
+        if status in SUBMIT_REJECTED or (isinstance(body, dict) and body.get("errors")):
+            print(f"⚠️ HTTP submit for {row['booking_id']} rejected: {body}")
+            return None
+        # may or may not have been created; never hand it to the browser as well
+        print(f"❌ HTTP submit for {row['booking_id']}: unrecognised response {resp.text[:200]!r}")
+        return False
@@ -0,0 +1,181 @@
+import threading
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer
+from reportlab.lib.styles import ParagraphStyle
+
+# ---------- PASTEL PEACH THEME ----------
+PEACH_BG = colors.HexColor("#FFF1E6")
+PEACH_DARK = colors.HexColor("#E07A5F")
+PEACH_LIGHT = colors.HexColor("#FDE8D7")
+BORDER = colors.HexColor("#E6A57E")
+TEXT = colors.HexColor("#333333")
+CONTENT_WIDTH = 420
+
+# Bump whenever the layout changes so cached invoices get re-rendered
+TEMPLATE_VERSION = "1"
+
+
+class InvoiceTemplate:
+    """
+    StayVista invoice layout, built once and reused for every invoice.
+    Styles, table styles and the static header/footer flowables live on the
+    instance; render() only creates the flowables that carry booking data.
+    Flowables are mutated while a document is laid out, so one instance must
+    not be shared between threads (see get_invoice_template)
+    """
+
+    def __init__(self):
+        # ---------- STYLES ----------
+        self.title_style = ParagraphStyle(
+            "Title",
+            fontName="Helvetica-Bold",
+            fontSize=22,
+            textColor=PEACH_DARK,
+            alignment=1
+        )
+        self.vendor_style = ParagraphStyle(
+            "Vendor",
+            fontName="Helvetica-Bold",
+            fontSize=13,
+            alignment=1,
+            textColor=TEXT
+        )
+        self.property_style = ParagraphStyle(
+            "Property",
+            fontName="Helvetica",
+            fontSize=10,
+            alignment=1,
+            textColor=colors.grey
+        )
+        self.footer_style = ParagraphStyle(
+            "Footer",
+            fontName="Helvetica",
+            fontSize=9,
+            alignment=1,
+            textColor=colors.grey
+        )
+
+        # ---------- TABLE STYLES ----------
+        self.item_table_style = TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), PEACH_DARK),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("BACKGROUND", (0, 1), (-1, -1), PEACH_LIGHT),
+            ("GRID", (0, 0), (-1, -1), 0.5, BORDER),
+            ("ALIGN", (1, 1), (1, -1), "CENTER"),
+            ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
+            ("TOPPADDING", (0, 0), (-1, -1), 10),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 10),
+        ])
+        self.totals_table_style = TableStyle([
+            ("BOX", (0, 0), (-1, -1), 1, PEACH_DARK),
+            ("INNERGRID", (0, 0), (-1, -1), 0.25, BORDER),
+            ("BACKGROUND", (0, 0), (-1, -1), colors.whitesmoke),
+            ("BACKGROUND", (0, 2), (-1, 3), PEACH_LIGHT),
+            ("FONTNAME", (0, 2), (-1, 3), "Helvetica-Bold"),
+            ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
+            ("LEFTPADDING", (0, 0), (-1, -1), 12),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 12),
+            ("TOPPADDING", (0, 0), (-1, -1), 8),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
+        ])
+        self.wrapper_style = TableStyle([
+            ("BACKGROUND", (0, 0), (-1, -1), PEACH_BG),
+            ("BOX", (0, 0), (-1, -1), 1, BORDER),
+            ("LEFTPADDING", (0, 0), (-1, -1), 20),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 20),
+            ("TOPPADDING", (0, 0), (-1, -1), 20),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 20),
+            ("ALIGN", (0, 0), (-1, -1), "CENTER")
+        ])
+        self.item_col_widths = [220, 50, 75, 75]
+        self.totals_col_widths = [CONTENT_WIDTH * 0.6, CONTENT_WIDTH * 0.4]
+
+        # ---------- STATIC FLOWABLES ----------
+        self.header = [
+            Paragraph("STAYVISTA", self.title_style),
+            Spacer(1, 6),
+            Paragraph("INVOICE", self.title_style),
+            Spacer(1, 20),
+        ]
+        self.footer = [
+            Paragraph(
+                "This is a system-generated invoice. No signature is required.",
+                self.footer_style
+            )
+        ]
+        self.gap_small = Spacer(1, 4)
+        self.gap_details = Spacer(1, 20)
+        self.gap_items = Spacer(1, 22)
+        self.gap_totals = Spacer(1, 18)
+
+    def build_story(self, booking_id, vendor_name, property_name, amount):
+        """
+        Return the flowables for one invoice
+        """
+        amt = f"Rs. {amount}"
+        item_table = Table(
+            [
+                ["Description", "Qty", "Rate", "Amount"],
+                [f"Cook Arranged – Booking {booking_id}", "1", amt, amt]
+            ],
+            colWidths=self.item_col_widths,
+            style=self.item_table_style
+        )
+        totals_table = Table(
+            [
+                ["Subtotal", amt],
+                ["Tax", "Rs. 0"],
+                ["Total Amount", amt],
+                ["Amount Paid", "Rs. 0"]
+            ],
+            colWidths=self.totals_col_widths,
+            style=self.totals_table_style
+        )
+        content = self.header + [
+            Paragraph(vendor_name, self.vendor_style),
+            self.gap_small,
+            Paragraph(property_name, self.property_style),
+            self.gap_small,
+            Paragraph(f"Booking ID: {booking_id}", self.property_style),
+            self.gap_details,
+            item_table,
+            self.gap_items,
+            totals_table,
+            self.gap_totals,
+        ] + self.footer
+        # ---------------- PEACH BACKGROUND WRAPPER ----------------
+        wrapper = Table([[content]], colWidths=[CONTENT_WIDTH], style=self.wrapper_style)
+        return [wrapper]
+
+    def render(self, target, booking_id, vendor_name, property_name, amount):
+        """
+        Render one invoice into target (a file path or a binary file object)
+        """
+        doc = SimpleDocTemplate(
+            target,
+            pagesize=A4,
+            leftMargin=40,
+            rightMargin=40,
+            topMargin=40,
+            bottomMargin=40,
+            # no timestamps or random document IDs: the same booking always
+            # renders to the same bytes, so re-runs can compare against
+            # Drive's md5Checksum
+            invariant=1
+        )
+        doc.build(self.build_story(booking_id, vendor_name, property_name, amount))
+
+
+_local = threading.local()
+
+
+def get_invoice_template():
+    """
+    Per-thread (and so per-process) cached InvoiceTemplate
+    """
+    template = getattr(_local, "template", None)
+    if template is None:
+        template = _local.template = InvoiceTemplate()
+    return template
@@ -0,0 +1,327 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from metrics import RETRIES
+
+JOB_DB_PATH = os.getenv(
+    "JOB_DB_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "stayvista", "jobs.sqlite3")
+)
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    result      TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    owner       TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobFailed(Exception):
+    """
+    A handler's way of marking its job failed with a readable message, and
+    optionally a result to keep with it
+    """
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+
+# ------------------ Job Queue ------------------
+class JobQueue:
+    """
+    Durable FIFO of jobs in a local SQLite file. Each process holds an flock
+    on its own owner file for as long as it lives, and running jobs record
+    that owner. On startup, jobs whose owner's lock is free (the process is
+    gone) are put back in the queue with "resumed" set in their payload,
+    because they may have been cut off after the expense was submitted. Jobs
+    still running in another live process (several server workers) are left alone
+    """
+
+    def __init__(self, path=JOB_DB_PATH, max_attempts=JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.owner_dir = os.path.abspath(path) + ".owners"
+        os.makedirs(self.owner_dir, exist_ok=True)
+        self.owner = uuid.uuid4().hex
+        self._owner_file = self._lock_owner_file()
+
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self.recover()
+
+    def _lock_owner_file(self):
+        # the lock is released by the OS when the process dies, however it dies
+        lock_path = os.path.join(self.owner_dir, self.owner)
+        while True:
+            f = open(lock_path, "w")
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            try:
+                # another process's sweep may have removed it before we locked it
+                if os.path.samestat(os.fstat(f.fileno()), os.stat(lock_path)):
+                    return f
+            except FileNotFoundError:
+                pass
+            f.close()
+
+    def _owner_alive(self, owner):
+        """
+        False once the owner's process is gone; its owner file is removed then
+        """
+        if owner is None:
+            return False
+        if owner == self.owner:
+            return True
+        lock_path = os.path.join(self.owner_dir, owner)
+        try:
+            f = open(lock_path, "r+")
+        except OSError:
+            return False
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+        return False
+
+    def recover(self):
+        """
+        Queue again the running jobs whose process died. Returns how many
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, payload, owner FROM jobs WHERE status = ?", (RUNNING,)
+            ).fetchall()
+            recovered = 0
+            for row in rows:
+                if self._owner_alive(row["owner"]):
+                    continue
+                payload = json.loads(row["payload"])
+                payload["resumed"] = True
+                conn.execute(
+                    "UPDATE jobs SET status = ?, payload = ?, started_at = NULL, owner = NULL WHERE id = ?",
+                    (QUEUED, json.dumps(payload), row["id"])
+                )
+                recovered += 1
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        for owner in os.listdir(self.owner_dir):
+            # drop the owner files of processes that exited
+            self._owner_alive(owner)
+        if recovered:
+            print(f"Job queue: {recovered} interrupted jobs queued again")
+        return recovered
+
+    def _conn(self):
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, kind, payload):
+        job_id = uuid.uuid4().hex
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), QUEUED, time.time())
+        )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def claim(self):
+        """
+        Mark the oldest queued job running and return it, or None if the queue is empty
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, owner = ? WHERE id = ?",
+                    (RUNNING, time.time(), self.owner, row["id"])
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["attempts"] += 1
+        job["owner"] = self.owner
+        return job
+
+    def complete(self, job_id, result=None):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ? WHERE id = ?",
+            (SUCCEEDED, json.dumps(result), time.time(), job_id)
+        )
+
+    def fail(self, job_id, error, retry=False, result=None):
+        """
+        Record a failed attempt. With retry the job goes back in the queue
+        unless it has used up max_attempts
+        """
+        conn = self._conn()
+        attempts = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        if retry and attempts < self.max_attempts:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, started_at = NULL, owner = NULL WHERE id = ?",
+                (QUEUED, error, job_id)
+            )
+            return
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, result = ?, finished_at = ? WHERE id = ?",
+            (FAILED, error, json.dumps(result), time.time(), job_id)
+        )
+
+    def get(self, job_id):
+        """
+        Public view of a job, or None if the id is unknown
+        """
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": _iso(row["created_at"]),
+            "started_at": _iso(row["started_at"]),
+            "finished_at": _iso(row["finished_at"]),
+        }
+
+    def counts(self):
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        counts.update({status: n for status, n in rows})
+        return counts
+
+    def wait_for_work(self, timeout):
+        with self._wakeup:
+            self._wakeup.wait(timeout)
+
+    def wake_all(self):
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+
+# ------------------ Workers ------------------
+class JobWorkers:
+    """
+    Background threads that drain a JobQueue. handlers maps a job kind to a
+    function taking the payload and returning a JSON-able result; raising
+    JobFailed fails the job, raising one of retry_on puts it back in the queue
+    """
+
+    def __init__(self, queue, handlers, workers=2, retry_on=(), poll_interval=2.0):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.retry_on = tuple(retry_on)
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the worker threads; calling it again is a no-op
+        """
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, daemon=True, name=f"job-worker-{i + 1}")
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self.queue.wake_all()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim()
+            except sqlite3.Error as e:
+                print(f"⚠️ Job queue unavailable: {e}")
+                job = None
+            if job is None:
+                self.queue.wait_for_work(self.poll_interval)
+                continue
+            self._execute(job)
+
+    def _execute(self, job):
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            self.queue.fail(job["id"], f"no handler for job kind {job['kind']!r}")
+            return
+        try:
+            result = handler(job["payload"])
+        except JobFailed as e:
+            self.queue.fail(job["id"], str(e), result=e.result)
+        except self.retry_on as e:
+            if job["attempts"] < self.queue.max_attempts:
+                print(f"Job {job['id']} will be retried: {e}")
+                RETRIES.labels("job").inc()
+            else:
+                print(f"❌ Job {job['id']} out of attempts: {e}")
+            self.queue.fail(job["id"], str(e), retry=True)
+        except Exception as e:
+            print(f"❌ Job {job['id']} failed: {e}")
+            self.queue.fail(job["id"], f"{type(e).__name__}: {e}")
+        else:
+            self.queue.complete(job["id"], result)
@@ -0,0 +1,245 @@
+import bisect
+import threading
+from timing import TIMER
+
+# Prometheus text exposition (format 0.0.4) without the client library.
+# Every labelled series has its own lock, held only for one addition, so
+# instrumenting a hot path costs a dict lookup and an uncontended lock
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+# ------------------ Metric Types ------------------
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """
+        The series for these label values, created on first use
+        """
+        values = tuple(str(v) for v in values)
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def samples(self):
+        """
+        [(label values, series)] in a stable order
+        """
+        with self._lock:
+            return sorted(self._series.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in self.samples():
+            lines.extend(series.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        with self._lock:
+            self.value = float(value)
+
+    def render(self, name, labelnames, values):
+        return [f"{name}{_labels(labelnames, values)} {_number(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_series(self):
+        return _Value()
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class _Buckets:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def render(self, name, labelnames, values):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labelnames, values, [('le', _number(bound))])} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labelnames, values)} {_number(total)}")
+        lines.append(f"{name}_count{_labels(labelnames, values)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+# ------------------ Registry ------------------
+class Registry:
+    """
+    The metrics rendered by /metrics. Collectors run on every scrape to set
+    gauges from state kept elsewhere (job queue, browser pool)
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        with self._lock:
+            self.collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            metrics, collectors = list(self.metrics), list(self.collectors)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"⚠️ Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "stayvista_http_request_duration_seconds",
+    "Flask request latency",
+    ("method", "endpoint", "status")
+))
+EXPENSES = REGISTRY.register(Counter(
+    "stayvista_expenses_total",
+    "Expenses processed by the API workers",
+    ("kind", "status")
+))
+RETRIES = REGISTRY.register(Counter(
+    "stayvista_retries_total",
+    "Retried operations (Drive requests, logins, Select2 picks, jobs)",
+    ("operation",)
+))
+EXPENSE_STEP_SECONDS = REGISTRY.register(Histogram(
+    "stayvista_expense_step_duration_seconds",
+    "Time per log_expense step",
+    ("step",)
+))
+API_CALL_SECONDS = REGISTRY.register(Histogram(
+    "stayvista_api_call_duration_seconds",
+    "Google Drive and Sheets calls, retries included",
+    ("api", "call")
+))
+SPAN_SECONDS = REGISTRY.register(Histogram(
+    "stayvista_span_duration_seconds",
+    "Other timed operations (page loads, login, Select2, whole expenses)",
+    ("span",)
+))
+JOBS = REGISTRY.register(Gauge(
+    "stayvista_jobs",
+    "Jobs in the queue by status",
+    ("status",)
+))
+BROWSER_SESSIONS = REGISTRY.register(Gauge(
+    "stayvista_browser_sessions",
+    "Pooled Chrome sessions by state",
+    ("state",)
+))
+BROWSER_POOL_EVENTS = REGISTRY.register(Counter(
+    "stayvista_browser_pool_events_total",
+    "Browser pool leases, starts, start failures, recycles, crashes and lease timeouts",
+    ("event",)
+))
+
+
+def observe_span(name, seconds):
+    """
+    StepTimer listener: files every timed step and call under a histogram
+    """
+    group, _, rest = name.partition(".")
+    if group == "step":
+        EXPENSE_STEP_SECONDS.labels(rest).observe(seconds)
+    elif group in ("drive", "sheets") and rest:
+        API_CALL_SECONDS.labels(group, rest).observe(seconds)
+    else:
+        SPAN_SECONDS.labels(name).observe(seconds)
+
+
+TIMER.listeners.append(observe_span)
@@ -0,0 +1,234 @@
+import hashlib
+import itertools
+import os
+import sys
+
+import pytest
+
+# the modules live at the repo root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BILL_ROW = {
+    "unqid": "1",
+    "booking_id": "1216298",
+    "head": "Cook Charges",
+    "comment": "Cook for 2 days",
+    "cost_bearer": "SV Managed",
+    "vendor": "Sanjyot Patil",
+    "property_name": "The Blue Horizon",
+    "amount": 2500,
+    "pdf": None,
+}
+
+SHEET_HEADER = ["SRNO", "Booking ID", "Head", "Comment", "Cost Bearer", "Amount", "Tax", "Vendor", "Property"]
+
+
+def sheet_row(row):
+    """
+    A bill row as the A:I cells of "to be logged"
+    """
+    return [
+        row["unqid"], row["booking_id"], row["head"], row["comment"], row["cost_bearer"],
+        row["amount"], 0, row["vendor"], row["property_name"],
+    ]
+
+
+@pytest.fixture(autouse=True)
+def timing_log(tmp_path, monkeypatch):
+    """
+    Keep the timing records of a test out of ~/.cache
+    """
+    from timing import TIMER
+
+    path = str(tmp_path / "timings.jsonl")
+    monkeypatch.setattr(TIMER, "path", path)
+    return path
+
+
+@pytest.fixture
+def bill_row():
+    """
+    Factory for bill rows shaped like read_bill_rows() output
+    """
+    def make(unqid="1", **fields):
+        return {**BILL_ROW, "unqid": str(unqid), **fields}
+    return make
+
+
+# ------------------ Fake Sheets ------------------
+class FakeWorksheet:
+    def __init__(self, rows, sheet_id=0):
+        self.rows = rows
+        self.id = sheet_id
+        self.appended = []
+
+    def get(self, cells, value_render_option=None):
+        return [list(row) for row in self.rows]
+
+    def get_all_values(self, value_render_option=None):
+        return [list(row) for row in self.rows]
+
+    def col_values(self, col):
+        return [row[col - 1] for row in self.rows if len(row) >= col]
+
+    def append_rows(self, rows, value_input_option=None):
+        self.appended.extend(rows)
+        self.rows.extend(rows)
+
+
+class FakeSpreadsheet:
+    """
+    "vista logs" with its two sheets; batch_update applies row deletes the
+    way Sheets does, one request after another. Set fail to make it raise
+    """
+
+    def __init__(self, source, logs):
+        self.id = "vista-logs"
+        self.sheets = {"to be logged": source, "admin logs": logs}
+        self.updates = []
+        self.fail = False
+
+    def worksheet(self, name):
+        return self.sheets[name]
+
+    def batch_update(self, body):
+        if self.fail:
+            raise ConnectionError("sheets down")
+        self.updates.append(body)
+        for request in body["requests"]:
+            del self.sheets["to be logged"].rows[request["deleteDimension"]["range"]["startIndex"]]
+
+
+class FakeSheetsClient:
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def open(self, name):
+        assert name == "vista logs"
+        return self.spreadsheet
+
+
+@pytest.fixture
+def sheets(bill_row):
+    """
+    "vista logs" with five rows to log, bookings alternating between two
+    """
+    rows = [
+        bill_row(i, booking_id=booking, amount=i * 100)
+        for i, booking in enumerate(["1216298", "1229927", "1216298", "1229927", "1216298"], start=1)
+    ]
+    source = FakeWorksheet([SHEET_HEADER] + [sheet_row(r) for r in rows], sheet_id=7)
+    logs = FakeWorksheet([["Date"] + SHEET_HEADER])
+    return FakeSpreadsheet(source, logs)
+
+
+@pytest.fixture
+def gs_client(sheets):
+    return FakeSheetsClient(sheets)
+
+
+# ------------------ Fake Drive ------------------
+class FakeDriveRequest:
+    def __init__(self, drive, call, run):
+        self.drive = drive
+        self.call = call
+        self.run = run
+
+    def execute(self, http=None, num_retries=0):
+        self.drive.calls.append(self.call)
+        if self.drive.errors:
+            raise self.drive.errors.pop(0)
+        return self.run()
+
+
+class FakeDriveBatch:
+    def __init__(self, drive, callback):
+        self.drive = drive
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request, request_id))
+
+    def execute(self, http=None):
+        self.drive.calls.append(f"batch({len(self.requests)})")
+        for request, request_id in self.requests:
+            self.callback(request_id, request.run(), None)
+
+
+class FakeDriveFiles:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def list(self, q=None, pageSize=None, pageToken=None, **kwargs):
+        def run():
+            name = q.split("name = '")[1].split("'")[0] if "name = '" in q else None
+            files = [dict(f) for f in self.drive.files_by_id.values() if name in (None, f["name"])]
+            start = int(pageToken or 0)
+            size = pageSize or 100
+            response = {"files": files[start:start + size]}
+            if start + size < len(files):
+                response["nextPageToken"] = str(start + size)
+            return response
+        return FakeDriveRequest(self.drive, "list", run)
+
+    def create(self, body=None, media_body=None, **kwargs):
+        def run():
+            return self.drive.add(body["name"], media_body.getbytes(0, media_body.size()))
+        return FakeDriveRequest(self.drive, "create", run)
+
+    def update(self, fileId=None, media_body=None, **kwargs):
+        def run():
+            data = media_body.getbytes(0, media_body.size())
+            self.drive.files_by_id[fileId]["md5Checksum"] = hashlib.md5(data).hexdigest()
+            self.drive.contents[fileId] = data
+            return dict(self.drive.files_by_id[fileId])
+        return FakeDriveRequest(self.drive, "update", run)
+
+    def delete(self, fileId=None, **kwargs):
+        def run():
+            self.drive.files_by_id.pop(fileId)
+            self.drive.contents.pop(fileId)
+        return FakeDriveRequest(self.drive, "delete", run)
+
+
+class FakeDrive:
+    """
+    One Drive folder in memory. calls lists every request executed; errors
+    queued in errors are raised by the next requests, one each
+    """
+
+    def __init__(self):
+        self.files_by_id = {}
+        self.contents = {}
+        self.calls = []
+        self.errors = []
+        self._ids = itertools.count(1)
+
+    def add(self, name, data):
+        file_id = f"id{next(self._ids)}"
+        self.files_by_id[file_id] = {"id": file_id, "name": name, "md5Checksum": hashlib.md5(data).hexdigest()}
+        self.contents[file_id] = data
+        return dict(self.files_by_id[file_id])
+
+    def named(self, name):
+        return [f for f in self.files_by_id.values() if f["name"] == name]
+
+    def files(self):
+        return FakeDriveFiles(self)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeDriveBatch(self, callback)
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    import bill_generation
+
+    drive = FakeDrive()
+    monkeypatch.setattr(bill_generation, "get_drive_service", lambda: drive)
+    monkeypatch.setattr(bill_generation.DriveUploadSession, "_http", lambda self: None)
+    # retries without the real backoff sleeps
+    monkeypatch.setattr(bill_generation.time, "sleep", lambda seconds: None)
+    return drive
+
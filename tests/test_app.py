@@ -0,0 +1,151 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import app as server
+from job_queue import QUEUED, JobQueue
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class IdleWorkers:
+    """
+    JobWorkers stand-in that leaves jobs in the queue
+    """
+
+    def __init__(self):
+        self.started = 0
+
+    def start(self):
+        self.started += 1
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(server, "_job_queue", queue)
+    monkeypatch.setattr(server, "_job_workers", IdleWorkers())
+    return queue
+
+
+@pytest.fixture
+def client(queue):
+    return server.app.test_client()
+
+
+def test_import_opens_no_queue(tmp_path):
+    env = {**os.environ, "HOME": str(tmp_path), "JOB_DB_PATH": str(tmp_path / "jobs.sqlite3")}
+    script = "import app; assert app._job_queue is None"
+    subprocess.run([sys.executable, "-c", script], cwd=REPO, env=env, check=True, timeout=60)
+    assert not os.path.exists(tmp_path / "jobs.sqlite3")
+    assert not os.path.exists(tmp_path / "jobs.sqlite3.owners")
+
+
+def test_log_expense_queues_a_job(client, queue):
+    resp = client.post("/log-expense", json={
+        "booking_id": "1216298", "vendor_name": "Sanjyot Patil", "property_name": "The Blue Horizon", "amount": 2500,
+    })
+    assert resp.status_code == 202
+    body = resp.get_json()
+    assert resp.headers["Location"] == body["status_url"] == f"/jobs/{body['job_id']}"
+    assert server._job_workers.started == 1
+
+    job = client.get(body["status_url"]).get_json()
+    assert (job["kind"], job["status"]) == ("expense", QUEUED)
+    assert client.get("/jobs").get_json()[QUEUED] == 1
+
+
+def test_invalid_expense_is_rejected(client, queue):
+    resp = client.post("/log-expense", json={"booking_id": "1216298"})
+    assert resp.status_code == 400
+    assert queue.counts()[QUEUED] == 0
+
+
+def test_unknown_job(client):
+    assert client.get("/jobs/nope").status_code == 404
+
+
+def expense(booking_id):
+    return {"booking_id": booking_id, "vendor_name": "V", "property_name": "P", "amount": 1}
+
+
+@pytest.mark.parametrize("booking_id", ["../../etc/cron.d/x", "12/34", "..", "12 34", True, ["1"]])
+def test_booking_id_must_be_safe_in_paths(booking_id):
+    payload, message = server.validate_expense(expense(booking_id))
+    assert payload is None
+    assert "booking_id" in message
+
+
+@pytest.mark.parametrize("booking_id, expected", [(1229927, "1229927"), (" 1216298 ", "1216298"), ("1229927-A", "1229927-A")])
+def test_booking_id_is_kept_as_text(booking_id, expected):
+    payload, message = server.validate_expense(expense(booking_id))
+    assert message is None
+    assert payload["booking_id"] == expected
+
+
+def queued_expenses(queue, job_id):
+    row = queue._conn().execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return json.loads(row["payload"])["expenses"]
+
+
+def test_log_expenses_queues_a_json_array(client, queue):
+    batch = [expense("1216298"), expense(1229927)]
+    resp = client.post("/log-expenses", json=batch)
+    assert resp.status_code == 202
+    body = resp.get_json()
+    assert body["count"] == 2
+    assert [e["booking_id"] for e in queued_expenses(queue, body["job_id"])] == ["1216298", "1229927"]
+    assert client.get(body["status_url"]).get_json()["kind"] == "expense_batch"
+
+
+def test_log_expenses_reads_ndjson(client, queue):
+    lines = "\n".join(json.dumps(expense(b)) for b in ("1216298", "1229927", "1216298")) + "\n\n"
+    resp = client.post("/log-expenses", data=lines, content_type="application/x-ndjson")
+    assert resp.status_code == 202
+    assert len(queued_expenses(queue, resp.get_json()["job_id"])) == 3
+
+
+def test_bad_ndjson_line_is_reported_by_index(client, queue):
+    lines = "\n".join([json.dumps(expense("1216298")), "{oops", json.dumps(expense("1229927"))])
+    resp = client.post("/log-expenses", data=lines, content_type="application/x-ndjson")
+    assert resp.status_code == 400
+    [error] = resp.get_json()["errors"]
+    assert error["index"] == 1 and error["message"].startswith("Invalid JSON")
+    assert queue.counts()[QUEUED] == 0
+
+
+def test_invalid_expenses_are_reported_by_index(client, queue):
+    resp = client.post("/log-expenses", json=[expense("1216298"), expense("../x"), {"booking_id": "1"}])
+    assert resp.status_code == 400
+    assert [e["index"] for e in resp.get_json()["errors"]] == [1, 2]
+    assert queue.counts()[QUEUED] == 0
+
+
+@pytest.mark.parametrize("body", [{"expenses": []}, [], "not json"])
+def test_batch_must_be_a_non_empty_array(client, queue, body):
+    if isinstance(body, str):
+        resp = client.post("/log-expenses", data=body, content_type="application/json")
+    else:
+        resp = client.post("/log-expenses", json=body)
+    assert resp.status_code == 400
+    assert resp.get_json()["errors"][0]["index"] is None
+
+
+def test_batch_size_is_capped(client, queue):
+    resp = client.post("/log-expenses", json=[expense("1216298")] * (server.MAX_BATCH_SIZE + 1))
+    assert resp.status_code == 400
+    assert str(server.MAX_BATCH_SIZE) in resp.get_json()["errors"][0]["message"]
+    assert client.post("/log-expenses", json=[expense("1216298")] * server.MAX_BATCH_SIZE).status_code == 202
+
+
+def test_metrics_endpoint(client, queue):
+    client.get("/jobs")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["Content-Type"] == server.CONTENT_TYPE
+    body = resp.get_data(as_text=True)
+    assert 'stayvista_jobs{status="queued"} 0.0' in body
+    assert 'stayvista_http_request_duration_seconds_count{method="GET",endpoint="/jobs",status="200"}' in body
@@ -0,0 +1,129 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from bill_generation import DriveUploadSession, execute_with_backoff, upload_to_drive
+from metrics import RETRIES
+
+FOLDER = "folder"
+
+
+def http_error(status, reason=None):
+    errors = [{"reason": reason}] if reason else []
+    content = json.dumps({"error": {"code": status, "errors": errors}}).encode("utf-8")
+    return HttpError(httplib2.Response({"status": status}), content)
+
+
+def test_session_lists_the_folder_once(drive):
+    for i in range(1000):
+        drive.add(f"{i}.pdf", b"%PDF old")
+    drive.add("7.pdf", b"%PDF copy")
+
+    session = DriveUploadSession(FOLDER)
+    # one listing of 1000 per page, no per-file query afterwards
+    assert drive.calls == ["list", "list"]
+    assert len(session.find("7.pdf")) == 2
+    assert session.find("missing.pdf") == []
+
+
+def test_session_upload_keeps_the_index_current(drive):
+    session = DriveUploadSession(FOLDER)
+    drive.calls.clear()
+
+    uploaded = session.upload("/tmp/bills/1.pdf", data=b"%PDF one")
+    assert drive.calls == ["create"]
+    assert session.find("1.pdf") == [uploaded]
+    assert session.latencies and session.failures == 0
+
+    session.upload("/tmp/bills/1.pdf", data=b"%PDF two")
+    assert drive.calls == ["create", "update"]
+    assert len(drive.named("1.pdf")) == 1
+
+
+def test_upload_replaces_an_existing_file_in_place(drive):
+    old = drive.add("1.pdf", b"%PDF old")
+
+    uploaded = upload_to_drive("/tmp/bills/1.pdf", FOLDER, data=b"%PDF new")
+    assert drive.calls == ["list", "update"]
+    assert uploaded["id"] == old["id"]
+    assert drive.contents[old["id"]] == b"%PDF new"
+
+
+def test_upload_deletes_extra_duplicates_in_one_batch(drive):
+    copies = [drive.add("1.pdf", b"%PDF copy") for _ in range(4)]
+
+    uploaded = upload_to_drive("/tmp/bills/1.pdf", FOLDER, data=b"%PDF new", existing=copies)
+    assert drive.calls == ["batch(3)", "update"]
+    assert drive.named("1.pdf") == [drive.files_by_id[uploaded["id"]]]
+    assert uploaded["id"] == copies[0]["id"]
+
+
+def test_upload_creates_a_missing_file(drive):
+    uploaded = upload_to_drive("/tmp/bills/1.pdf", FOLDER, data=b"%PDF new", existing=[])
+    assert drive.calls == ["create"]
+    assert uploaded["name"] == "1.pdf"
+    assert drive.contents[uploaded["id"]] == b"%PDF new"
+
+
+@pytest.mark.parametrize("error", [
+    http_error(429),
+    http_error(503),
+    http_error(403, "rateLimitExceeded"),
+    ConnectionError("reset"),
+])
+def test_backoff_retries_transient_errors(drive, error):
+    drive.errors = [error, error]
+    retries = []
+    before = RETRIES.labels("drive").value
+
+    response = execute_with_backoff(drive.files().list(q=""), on_retry=lambda e, attempt, delay: retries.append(attempt))
+    assert response == {"files": []}
+    assert drive.calls == ["list"] * 3
+    assert retries == [1, 2]
+    assert RETRIES.labels("drive").value == before + 2
+
+
+@pytest.mark.parametrize("error", [http_error(404), http_error(403, "forbidden"), http_error(400)])
+def test_backoff_raises_permanent_errors_at_once(drive, error):
+    drive.errors = [error]
+
+    with pytest.raises(HttpError):
+        execute_with_backoff(drive.files().list(q=""))
+    assert drive.calls == ["list"]
+
+
+def test_backoff_gives_up_after_max_retries(drive):
+    drive.errors = [http_error(500)] * 4
+
+    with pytest.raises(HttpError):
+        execute_with_backoff(drive.files().list(q=""), max_retries=2)
+    assert drive.calls == ["list"] * 3
+
+
+def test_session_counts_retries_and_failures(drive):
+    session = DriveUploadSession(FOLDER)
+    drive.errors = [http_error(429)]
+    session.upload("/tmp/bills/1.pdf", data=b"%PDF one")
+    assert session.retries == 1 and session.failures == 0
+
+    drive.errors = [http_error(404)]
+    with pytest.raises(HttpError):
+        session.upload("/tmp/bills/2.pdf", data=b"%PDF two")
+    assert session.failures == 1
+    assert session.find("2.pdf") == []
+
+
+def test_session_uploads_from_many_threads(drive):
+    session = DriveUploadSession(FOLDER)
+    names = [f"/tmp/bills/{i}.pdf" for i in range(40)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda name: session.upload(name, data=name.encode("utf-8")), names))
+    assert len(drive.files_by_id) == 40
+    assert len(session.latencies) == 40
+    for i in range(40):
+        [file] = session.find(f"{i}.pdf")
+        assert drive.contents[file["id"]] == f"/tmp/bills/{i}.pdf".encode("utf-8")
@@ -0,0 +1,155 @@
+import threading
+import time
+
+import pytest
+
+import automation
+from automation import DriverPool, PoolExhausted
+from bill_generation import Select2Catalog
+
+
+class FakeDriver:
+    def __init__(self, n):
+        self.n = n
+        self.alive = True
+        self.quit_called = False
+
+    def execute_script(self, script, *args):
+        if not self.alive:
+            raise ConnectionError("chrome is gone")
+        return 1
+
+    def quit(self):
+        self.quit_called = True
+        self.alive = False
+
+
+class StartedDrivers(list):
+    """
+    Every fake browser the pool started, in order
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.failures = []
+
+    def fail_next(self):
+        self.failures.append(None)
+
+
+@pytest.fixture
+def started(tmp_path, monkeypatch):
+    drivers = StartedDrivers()
+
+    def start(username, password, cache=None):
+        if drivers.failures:
+            return drivers.failures.pop(0)
+        drivers.append(FakeDriver(len(drivers) + 1))
+        return drivers[-1]
+    monkeypatch.setattr(automation, "start_logged_in_driver", start)
+    monkeypatch.setattr(automation.Select2Catalog, "load", lambda: Select2Catalog(str(tmp_path / "catalog.json")))
+    return drivers
+
+
+def make_pool(**kwargs):
+    return DriverPool(None, None, **kwargs)
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_cold_pool_starts_a_browser_and_reuses_it(started):
+    pool = make_pool(size=2)
+    with pool.lease() as slot:
+        assert slot.driver is started[0]
+    with pool.lease() as again:
+        assert again is slot
+    assert len(started) == 1
+    stats = pool.stats()
+    assert (stats["leases"], stats["started"], stats["idle"], stats["leased"]) == (2, 1, 1, 0)
+    assert stats["idle_uses"] == [2]
+
+
+def test_warm_fills_the_pool_in_the_background(started):
+    pool = make_pool(size=3)
+    pool.warm()
+    wait_for(lambda: pool.stats()["idle"] == 3)
+    pool.warm()
+    assert len(started) == 3
+
+
+def test_browser_is_recycled_after_max_uses(started):
+    pool = make_pool(size=1, max_uses=2)
+    for _ in range(2):
+        with pool.lease() as slot:
+            pass
+    assert started[0].quit_called
+    wait_for(lambda: pool.stats()["idle"] == 1)
+    with pool.lease() as fresh:
+        assert fresh is not slot and fresh.driver is started[1]
+    assert pool.stats()["recycled"] == 1
+
+
+def test_dead_idle_browser_is_replaced(started):
+    pool = make_pool(size=1)
+    with pool.lease():
+        pass
+    started[0].alive = False
+
+    with pool.lease() as slot:
+        assert slot.driver is started[1]
+    assert pool.stats()["crashed"] == 1
+
+
+def test_lease_times_out_when_every_browser_is_busy(started):
+    pool = make_pool(size=1)
+    with pool.lease():
+        with pytest.raises(PoolExhausted):
+            with pool.lease(timeout=0.05):
+                pass
+    assert pool.stats()["timeouts"] == 1
+    assert pool.stats()["leased"] == 0
+
+
+def test_waiting_lease_gets_the_released_browser(started):
+    pool = make_pool(size=1)
+    got = []
+
+    def wait():
+        with pool.lease(timeout=2) as slot:
+            got.append(slot)
+
+    with pool.lease() as slot:
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        time.sleep(0.05)
+        assert got == []
+    waiter.join()
+    assert got == [slot]
+
+
+def test_failed_start_frees_the_lease(started):
+    pool = make_pool(size=1)
+    started.fail_next()
+    with pytest.raises(RuntimeError):
+        with pool.lease():
+            pass
+    assert pool.stats()["start_failures"] == 1
+    assert pool.stats()["leased"] == 0
+    with pool.lease() as slot:
+        assert slot.driver is started[0]
+
+
+def test_close_quits_idle_browsers(started):
+    pool = make_pool(size=2)
+    pool.warm()
+    wait_for(lambda: pool.stats()["idle"] == 2)
+    pool.close()
+    assert all(d.quit_called for d in started)
+    with pytest.raises(RuntimeError):
+        with pool.lease():
+            pass
@@ -0,0 +1,147 @@
+import threading
+from datetime import date
+
+import pytest
+import requests
+from werkzeug.serving import make_server
+
+import bill_generation
+import dev_admin_server
+from bill_generation import Select2Catalog, start_http_client
+from expense_http import CATALOG_ROLES, ExpenseHttpClient
+
+
+@pytest.fixture
+def server():
+    dev_admin_server.EXPENSES.clear()
+    httpd = make_server("127.0.0.1", 0, dev_admin_server.app, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    thread.join()
+
+
+@pytest.fixture
+def cookies(server):
+    session = requests.Session()
+    session.post(f"{server}/login", data={"email": "a@b.c", "password": "x"})
+    return [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path} for c in session.cookies]
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = Select2Catalog(str(tmp_path / "catalog.json"))
+    for role, field in CATALOG_ROLES.items():
+        for value, text in dev_admin_server.OPTIONS[field].items():
+            catalog.learn(field, text, value)
+    return catalog
+
+
+def schema(server, token=dev_admin_server.CSRF_TOKEN):
+    """
+    What READ_FORM_SCHEMA reads from the dev server's /expenses/log
+    """
+    return {
+        "action": f"{server}/expenses/store",
+        "method": "POST",
+        "fields": {
+            "expense_type": "expense_type",
+            "head": "expense_head",
+            "comment": "categories_part",
+            "vendor": "vendor_id",
+            "property": "villa_id",
+            "cost_bearer": "cost_bearer",
+            "invoice_number": "invoice_no",
+            "bill_date": "bill_date",
+            "booking": "booking_id",
+            "quantity": "quantity[]",
+            "rate": "rate_per_unit[]",
+            "tax": "tax_percentage[]",
+            "bill": "bill_file",
+        },
+        "options": {
+            "cost_bearer": [[text, value, off] for text, value, off in dev_admin_server.COST_BEARERS],
+            "tax": [["0", "t0", False], ["5", "t5", False]],
+        },
+        "extra": [["_token", token], ["source", "admin"]],
+        "booking_url": f"{server}/bookings/search",
+        "csrf": token,
+        "referer": f"{server}/expenses/log",
+        "user_agent": "pytest",
+    }
+
+
+@pytest.fixture
+def row(bill_row):
+    def make(unqid="1216298-1", **fields):
+        return bill_row(unqid, **fields)
+    return make
+
+
+def submit(client, catalog, expense):
+    return client.submit(expense, catalog, date(2024, 5, 1), b"%PDF-1.4 test")
+
+
+def test_submit_success(server, cookies, catalog, row):
+    client = ExpenseHttpClient(schema(server), cookies)
+    assert submit(client, catalog, row()) is True
+    [expense] = dev_admin_server.EXPENSES
+    assert expense["booking_id"] == "901"
+    assert expense["expense_head"] == "21"
+    assert expense["cost_bearer"] == "sv"
+    assert expense["rate_per_unit[]"] == "2500"
+    assert expense["bill_bytes"] == len(b"%PDF-1.4 test")
+
+
+def test_duplicate_goes_to_browser(server, cookies, catalog, row):
+    client = ExpenseHttpClient(schema(server), cookies)
+    assert submit(client, catalog, row()) is True
+    assert submit(client, catalog, row(unqid="1216298-2")) is None
+    assert client.enabled
+    assert len(dev_admin_server.EXPENSES) == 1
+
+
+def test_csrf_mismatch_disables_client(server, cookies, catalog, row):
+    client = ExpenseHttpClient(schema(server, token="stale"), cookies)
+    assert submit(client, catalog, row()) is None
+    assert not client.enabled
+    assert "419" in client.disabled
+    # every later row goes to the browser without another request
+    assert submit(client, catalog, row(unqid="1216298-2")) is None
+    assert dev_admin_server.EXPENSES == []
+
+
+def test_validation_error_goes_to_browser(server, cookies, catalog, row):
+    client = ExpenseHttpClient(schema(server), cookies)
+    assert submit(client, catalog, row(comment="")) is None
+    assert client.enabled
+    assert dev_admin_server.EXPENSES == []
+
+
+def answer_with(monkeypatch, response):
+    monkeypatch.setitem(dev_admin_server.app.view_functions, "store_expense", lambda: response)
+
+
+def test_success_is_read_from_status_only(server, cookies, catalog, row, monkeypatch):
+    answer_with(monkeypatch, {"status": "success", "message": "Saved for vendor Duplicate Caterers"})
+    client = ExpenseHttpClient(schema(server), cookies)
+    assert submit(client, catalog, row()) is True
+
+
+def test_unrecognised_answer_is_unknown(server, cookies, catalog, row, monkeypatch):
+    answer_with(monkeypatch, "<html>Expense list</html>")
+    client = ExpenseHttpClient(schema(server), cookies)
+    # may have been created, so it must not go to the browser as well
+    assert submit(client, catalog, row()) is False
+    assert client.enabled
+
+
+def test_form_read_errors_fall_back_to_browser(catalog, monkeypatch):
+    class BrokenDriver:
+        def execute_script(self, script, *args):
+            raise RuntimeError("javascript error: jQuery is not defined")
+
+    monkeypatch.setattr(bill_generation, "navigate_to_expenses_add_page", lambda driver: True)
+    catalog.scraped = True
+    assert start_http_client(BrokenDriver(), catalog) is None
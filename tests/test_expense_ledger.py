@@ -0,0 +1,84 @@
+import json
+import time
+from datetime import date
+
+import pytest
+
+from bill_generation import ExpenseLedger
+
+BILL_DATE = date(2024, 5, 1)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return ExpenseLedger(str(tmp_path / "ledger.json"))
+
+
+def remote(*items):
+    return lambda booking_id: [
+        {"expense_head": "Cook Charges", "vendor_name": "Sanjyot Patil", "amount": "2500.00",
+         "bill_date": "2024-05-01", **item}
+        for item in items
+    ]
+
+
+def test_unknown_without_prefetch(ledger, bill_row):
+    assert ledger.check(bill_row("1"), BILL_DATE) is None
+    ledger.record(bill_row("1"), BILL_DATE)
+    assert ledger.check(bill_row("1"), BILL_DATE) == "logged"
+    # an identical row is a separate expense, and nothing says it is new
+    assert ledger.check(bill_row("2"), BILL_DATE) is None
+
+
+def test_identical_rows_matched_to_remote_expenses_by_count(ledger, bill_row):
+    fetch = remote({}, {})
+    assert ledger.check(bill_row("1"), BILL_DATE, fetch) == "logged"
+    assert ledger.check(bill_row("2"), BILL_DATE, fetch) == "logged"
+    # only two exist on the site, the third identical row is new
+    assert ledger.check(bill_row("3"), BILL_DATE, fetch) == "new"
+    # and a row already matched stays matched
+    assert ledger.check(bill_row("1"), BILL_DATE, fetch) == "logged"
+
+
+def test_record_counts_towards_remote(ledger, bill_row):
+    fetch = remote()
+    assert ledger.check(bill_row("1"), BILL_DATE, fetch) == "new"
+    ledger.record(bill_row("1"), BILL_DATE)
+    ledger.record(bill_row("1"), BILL_DATE)
+    assert ledger.check(bill_row("2"), BILL_DATE, fetch) == "new"
+    assert ledger.remote["1216298"] == {ledger.row_key(bill_row("1"), BILL_DATE): 1}
+
+
+def test_key_normalises_amount_date_and_case(ledger, bill_row):
+    fetch = remote({"expense_head": " cook  charges", "amount": "2500", "bill_date": "01-05-2024"})
+    assert ledger.check(bill_row("1", vendor="SANJYOT PATIL"), "2024-05-01", fetch) == "logged"
+    assert ledger.check(bill_row("2", amount=2600), BILL_DATE, fetch) == "new"
+
+
+def test_prefetch_runs_once_per_booking(ledger, bill_row):
+    calls = []
+
+    def fetch(booking_id):
+        calls.append(booking_id)
+        return []
+
+    ledger.check(bill_row("1"), BILL_DATE, fetch)
+    ledger.check(bill_row("2"), BILL_DATE, fetch)
+    assert calls == ["1216298"]
+
+
+def test_unrecognised_remote_shape_is_not_trusted(ledger, bill_row):
+    assert ledger.check(bill_row("1"), BILL_DATE, lambda b: [{"id": 5}]) is None
+    assert ledger.check(bill_row("2"), BILL_DATE, lambda b: None) is None
+
+
+def test_save_and_load_drop_expired(ledger, bill_row, tmp_path):
+    ledger.record(bill_row("1"), BILL_DATE)
+    ledger.save()
+    key = ledger.row_key(bill_row("1"), BILL_DATE)
+    assert ExpenseLedger.load(ledger.path).check(bill_row("1"), BILL_DATE) == "logged"
+
+    with open(ledger.path, "w", encoding="utf-8") as f:
+        json.dump({key: {"1": time.time() - 3600}}, f)
+    assert ExpenseLedger.load(ledger.path, ttl=60).logged == {}
+    assert ExpenseLedger.load(str(tmp_path / "missing.json")).logged == {}
@@ -0,0 +1,118 @@
+from functools import partial
+
+import pytest
+
+import bill_generation
+from bill_generation import RunJournal, Select2Catalog, run_expense_pipeline
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.quit_called = False
+
+    def execute_script(self, script, *args):
+        return 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+class AdminSite:
+    """
+    Stands in for Chrome and the admin expense form: records every expense
+    logged, and fails the unqids in reject
+    """
+
+    def __init__(self):
+        self.browsers = []
+        self.logged = []
+        self.reject = set()
+        self.login_fails = False
+
+    def start(self, username, password, cache=None):
+        if self.login_fails:
+            return None
+        self.browsers.append(FakeBrowser())
+        return self.browsers[-1]
+
+    def log_expense(self, driver, unqid, booking_id, head, comment, vendor, property_name, amount, cost_bearer,
+                    bills_folder, pdf_bytes=None, catalog=None, before_submit=None, confirm_duplicate=True,
+                    duplicate_wait=6):
+        if before_submit is not None:
+            before_submit()
+        if unqid in self.reject:
+            return False
+        assert pdf_bytes.startswith(b"%PDF")
+        self.logged.append(unqid)
+        return True
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch, gs_client, drive):
+    site = AdminSite()
+    catalog = Select2Catalog(str(tmp_path / "catalog.json"))
+    catalog.scraped = True
+    monkeypatch.setattr(bill_generation, "get_gs_client", lambda: gs_client)
+    monkeypatch.setattr(bill_generation, "start_logged_in_driver", site.start)
+    monkeypatch.setattr(bill_generation, "navigate_to_expenses_add_page", lambda driver: True)
+    monkeypatch.setattr(bill_generation, "reset_expense_form", lambda driver: True)
+    monkeypatch.setattr(bill_generation, "log_expense", site.log_expense)
+    monkeypatch.setattr(bill_generation, "update_status", lambda *args, **kwargs: None)
+    monkeypatch.setattr(bill_generation.Select2Catalog, "load", lambda: catalog)
+    monkeypatch.setattr(bill_generation, "RunJournal", partial(RunJournal, str(tmp_path / "journal.jsonl")))
+    monkeypatch.setattr(bill_generation, "EXPENSE_LEDGER", False)
+    monkeypatch.setattr(bill_generation, "EXPENSE_BACKEND", "selenium")
+    return site
+
+
+def run(tmp_path, gs_client):
+    return run_expense_pipeline(str(tmp_path / "bills"), gs_client, None, None, workers=2, max_workers=1)
+
+
+def source_unqids(sheets):
+    return [row[0] for row in sheets.worksheet("to be logged").rows[1:]]
+
+
+def test_every_row_is_rendered_uploaded_logged_and_moved(tmp_path, site, sheets, gs_client, drive):
+    report = run(tmp_path, gs_client)
+
+    assert report.all_ok
+    assert sorted(report.succeeded) == ["1", "2", "3", "4", "5"]
+    assert sorted(site.logged) == ["1", "2", "3", "4", "5"]
+    # one browser per booking, both closed at the end
+    assert len(site.browsers) == 2
+    assert all(b.quit_called for b in site.browsers)
+    assert sorted(f["name"] for f in drive.files_by_id.values()) == [f"{i}.pdf" for i in range(1, 6)]
+    assert source_unqids(sheets) == []
+    assert sorted(row[1] for row in sheets.worksheet("admin logs").appended) == ["1", "2", "3", "4", "5"]
+
+
+def test_failed_row_stays_and_is_all_that_the_next_run_logs(tmp_path, site, sheets, gs_client, drive):
+    site.reject = {"3"}
+    report = run(tmp_path, gs_client)
+    assert report.failed == [("3", "1216298", "submit not confirmed")]
+    assert source_unqids(sheets) == ["3"]
+
+    site.reject = set()
+    site.logged.clear()
+    drive.calls.clear()
+    report = run(tmp_path, gs_client)
+    assert report.all_ok and report.succeeded == ["3"]
+    assert site.logged == ["3"]
+    # its invoice is already in Drive with the same bytes
+    assert "create" not in drive.calls and "update" not in drive.calls
+    assert source_unqids(sheets) == []
+
+
+def test_rows_are_failed_not_lost_when_the_browser_cannot_log_in(tmp_path, site, sheets, gs_client):
+    site.login_fails = True
+    report = run(tmp_path, gs_client)
+
+    assert report.succeeded == []
+    assert sorted(unqid for unqid, _, _ in report.failed) == ["1", "2", "3", "4", "5"]
+    assert source_unqids(sheets) == ["1", "2", "3", "4", "5"]
+
+
+def test_empty_sheet_is_nothing_to_do(tmp_path, site, sheets, gs_client):
+    del sheets.worksheet("to be logged").rows[1:]
+    assert run(tmp_path, gs_client) is None
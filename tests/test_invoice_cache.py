@@ -0,0 +1,93 @@
+import hashlib
+import os
+
+from bill_generation import (
+    INVOICE_MANIFEST,
+    DriveUploadSession,
+    create_invoice_pdf,
+    invoice_cache_action,
+    invoice_cache_key,
+    load_invoice_manifest,
+    save_invoice_manifest,
+)
+
+ROW = ("1", "1216298", "Sanjyot Patil", "The Blue Horizon", 2500)
+
+
+def touch(folder, name):
+    with open(os.path.join(folder, name), "wb") as f:
+        f.write(b"%PDF")
+
+
+def test_save_prunes_manifest_and_pdfs_of_rows_gone_from_the_sheet(tmp_path):
+    folder = str(tmp_path / "bills")
+    os.makedirs(os.path.join(folder, "api"))
+    for name in ("1.pdf", "2.pdf", "3.pdf", "notes.txt"):
+        touch(folder, name)
+    touch(os.path.join(folder, "api"), "api-1.pdf")
+    manifest = {u: {"key": f"k{u}", "md5": "m", "drive_id": f"d{u}"} for u in ("1", "2", "3")}
+
+    save_invoice_manifest(folder, manifest, keep={"2", "4"})
+
+    assert load_invoice_manifest(folder) == {"2": manifest["2"]}
+    assert sorted(os.listdir(folder)) == sorted(["2.pdf", INVOICE_MANIFEST, "api", "notes.txt"])
+    assert os.listdir(os.path.join(folder, "api")) == ["api-1.pdf"]
+
+
+def test_save_without_keep_leaves_everything(tmp_path):
+    folder = str(tmp_path)
+    touch(folder, "1.pdf")
+    save_invoice_manifest(folder, {"9": {"key": "k"}})
+    assert load_invoice_manifest(folder) == {"9": {"key": "k"}}
+    assert os.path.exists(os.path.join(folder, "1.pdf"))
+
+
+def test_missing_or_corrupt_manifest_is_empty(tmp_path):
+    assert load_invoice_manifest(str(tmp_path)) == {}
+    with open(tmp_path / INVOICE_MANIFEST, "w") as f:
+        f.write("{")
+    assert load_invoice_manifest(str(tmp_path)) == {}
+
+
+def test_unchanged_invoice_is_neither_rendered_nor_uploaded_again(tmp_path, drive):
+    folder = str(tmp_path)
+    manifest = {}
+    create_invoice_pdf(*ROW, folder, manifest=manifest, session=DriveUploadSession("folder"))
+    assert drive.calls == ["list", "create"]
+    [uploaded] = drive.named("1.pdf")
+    assert manifest["1"] == {"key": invoice_cache_key(*ROW), "md5": uploaded["md5Checksum"], "drive_id": uploaded["id"]}
+
+    drive.calls.clear()
+    session = DriveUploadSession("folder")
+    assert invoice_cache_action(manifest, "1", invoice_cache_key(*ROW), os.path.join(folder, "1.pdf"), session) == "skip"
+    assert create_invoice_pdf(*ROW, folder, manifest=manifest, session=session) is None
+    assert drive.calls == ["list"]
+
+
+def test_missing_local_copy_is_rendered_but_not_uploaded(tmp_path, drive):
+    folder = str(tmp_path)
+    manifest = {}
+    create_invoice_pdf(*ROW, folder, manifest=manifest, session=DriveUploadSession("folder"))
+    os.remove(os.path.join(folder, "1.pdf"))
+
+    drive.calls.clear()
+    session = DriveUploadSession("folder")
+    assert invoice_cache_action(manifest, "1", invoice_cache_key(*ROW), os.path.join(folder, "1.pdf"), session) == "render"
+    data = create_invoice_pdf(*ROW, folder, in_memory=True, manifest=manifest, session=session)
+    assert hashlib.md5(data).hexdigest() == manifest["1"]["md5"]
+    assert drive.calls == ["list"]
+
+
+def test_changed_row_or_drive_copy_is_uploaded_again(tmp_path, drive):
+    folder = str(tmp_path)
+    filename = os.path.join(folder, "1.pdf")
+    manifest = {}
+    create_invoice_pdf(*ROW, folder, manifest=manifest, session=DriveUploadSession("folder"))
+    key = invoice_cache_key(*ROW)
+
+    changed = invoice_cache_key("1", "1216298", "Sanjyot Patil", "The Blue Horizon", 2600)
+    assert invoice_cache_action(manifest, "1", changed, filename, DriveUploadSession("folder")) == "upload"
+    assert invoice_cache_action({}, "1", key, filename, DriveUploadSession("folder")) == "upload"
+
+    drive.add("1.pdf", b"%PDF copy")
+    assert invoice_cache_action(manifest, "1", key, filename, DriveUploadSession("folder")) == "upload"
@@ -0,0 +1,39 @@
+import io
+import threading
+
+from reportlab import rl_config
+
+import invoice_template
+from invoice_template import InvoiceTemplate, get_invoice_template
+
+ROW = ("1216298", "Sanjyot Patil", "The Blue Horizon", 1940)
+
+
+def render(template, *row):
+    buffer = io.BytesIO()
+    template.render(buffer, *(row or ROW))
+    return buffer.getvalue()
+
+
+def test_import_leaves_reportlab_defaults_alone():
+    assert invoice_template.TEMPLATE_VERSION
+    assert rl_config.invariant == 0
+    assert rl_config.useA85 == 1
+
+
+def test_same_booking_renders_to_same_bytes():
+    template = InvoiceTemplate()
+    first = render(template)
+    assert first.startswith(b"%PDF")
+    assert render(template) == first
+    assert render(InvoiceTemplate()) == first
+    assert render(template, "1229927", "Local Vendor", "Casa Verde", 500) != first
+
+
+def test_one_template_per_thread():
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(get_invoice_template()))
+    thread.start()
+    thread.join()
+    assert get_invoice_template() is get_invoice_template()
+    assert seen[0] is not get_invoice_template()
@@ -0,0 +1,131 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from job_queue import FAILED, QUEUED, RUNNING, SUCCEEDED, JobFailed, JobQueue, JobWorkers
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def status(queue, job_id):
+    return queue.get(job_id)["status"]
+
+
+def test_claims_oldest_first(path):
+    queue = JobQueue(path)
+    first = queue.enqueue("expense", {"n": 1})
+    second = queue.enqueue("expense", {"n": 2})
+
+    job = queue.claim()
+    assert job["id"] == first
+    assert job["payload"] == {"n": 1}
+    assert job["attempts"] == 1
+    assert job["owner"] == queue.owner
+    assert status(queue, first) == RUNNING
+    assert queue.claim()["id"] == second
+    assert queue.claim() is None
+
+    queue.complete(first, {"ok": True})
+    assert queue.get(first)["result"] == {"ok": True}
+    assert queue.counts() == {QUEUED: 0, RUNNING: 1, SUCCEEDED: 1, FAILED: 0}
+
+
+def test_retry_until_max_attempts(path):
+    queue = JobQueue(path, max_attempts=2)
+    job_id = queue.enqueue("expense", {})
+
+    queue.fail(queue.claim()["id"], "pool busy", retry=True)
+    assert status(queue, job_id) == QUEUED
+    job = queue.claim()
+    assert job["attempts"] == 2
+    queue.fail(job["id"], "pool busy", retry=True)
+    assert status(queue, job_id) == FAILED
+    assert queue.get(job_id)["error"] == "pool busy"
+    assert queue.claim() is None
+
+
+def test_running_jobs_of_a_live_owner_are_left_alone(path):
+    first = JobQueue(path)
+    job_id = first.enqueue("expense", {"n": 1})
+    first.claim()
+
+    # another server worker starting up
+    second = JobQueue(path)
+    assert status(second, job_id) == RUNNING
+    assert second.claim() is None
+
+    # the first process dies: its lock goes with it
+    first._owner_file.close()
+    assert second.recover() == 1
+    job = second.claim()
+    assert job["id"] == job_id
+    assert job["payload"] == {"n": 1, "resumed": True}
+    assert os.listdir(second.owner_dir) == [second.owner]
+
+
+def test_jobs_of_a_killed_process_resume_on_restart(path):
+    script = (
+        "import os, sys\n"
+        "from job_queue import JobQueue\n"
+        "queue = JobQueue(sys.argv[1])\n"
+        "queue.enqueue('expense', {'n': 1})\n"
+        "queue.claim()\n"
+        "os._exit(1)\n"
+    )
+    subprocess.run([sys.executable, "-c", script, path], cwd=REPO, check=False, timeout=60)
+
+    queue = JobQueue(path)
+    job = queue.claim()
+    assert job["payload"] == {"n": 1, "resumed": True}
+    assert job["attempts"] == 2
+
+
+def wait_for(queue, job_id, statuses, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if status(queue, job_id) in statuses:
+            return queue.get(job_id)
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {status(queue, job_id)}")
+
+
+def test_workers_retry_then_complete(path):
+    class Busy(Exception):
+        pass
+
+    calls = []
+
+    def handler(payload):
+        calls.append(payload)
+        if len(calls) < 2:
+            raise Busy("no browser free")
+        return {"logged": payload["n"]}
+
+    def rejected(payload):
+        raise JobFailed("bad row", result={"row": payload["n"]})
+
+    queue = JobQueue(path)
+    workers = JobWorkers(queue, {"expense": handler, "bad": rejected}, workers=1, retry_on=(Busy,), poll_interval=0.05)
+    workers.start()
+    try:
+        retried = queue.enqueue("expense", {"n": 7})
+        failed = queue.enqueue("bad", {"n": 8})
+        unknown = queue.enqueue("other", {})
+        job = wait_for(queue, retried, (SUCCEEDED, FAILED))
+        assert job["status"] == SUCCEEDED
+        assert job["attempts"] == 2
+        assert job["result"] == {"logged": 7}
+
+        job = wait_for(queue, failed, (SUCCEEDED, FAILED))
+        assert (job["status"], job["error"], job["result"]) == (FAILED, "bad row", {"row": 8})
+        assert "no handler" in wait_for(queue, unknown, (FAILED,))["error"]
+    finally:
+        workers.stop()
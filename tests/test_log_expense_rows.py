@@ -0,0 +1,52 @@
+from bill_generation import ExpenseRunReport, Select2Catalog, log_expense_rows
+
+
+class FakeHttpClient:
+    def __init__(self, outcomes=None):
+        self.outcomes = outcomes or {}
+        self.submitted = []
+
+    def submit(self, row, catalog, bill_date, pdf_bytes):
+        self.submitted.append(row["unqid"])
+        return self.outcomes.get(row["unqid"], True)
+
+
+class FakeMover:
+    def __init__(self, error=None):
+        self.error = error
+        self.added = []
+
+    def add(self, unqid, reconcile=False):
+        self.added.append(unqid)
+        if self.error is not None:
+            raise self.error
+
+
+def test_sheet_errors_dont_fail_submitted_rows(tmp_path, bill_row):
+    rows = [bill_row(i, pdf=b"%PDF") for i in (1, 2, 3)]
+    report = ExpenseRunReport(len(rows))
+    mover = FakeMover(ConnectionError("sheets down"))
+    client = FakeHttpClient()
+
+    ok = log_expense_rows(
+        None, rows, str(tmp_path), mover, Select2Catalog(str(tmp_path / "catalog.json")), report,
+        http_client=client
+    )
+
+    assert ok is True
+    assert client.submitted == ["1", "2", "3"]
+    assert report.succeeded == ["1", "2", "3"]
+    assert report.failed == []
+    assert mover.added == ["1", "2", "3"]
+
+
+def test_unknown_http_outcome_is_a_failure(tmp_path, bill_row):
+    rows = [bill_row(1, pdf=b"%PDF"), bill_row(2, pdf=b"%PDF")]
+    report = ExpenseRunReport(len(rows))
+    client = FakeHttpClient({"1": False})
+    mover = FakeMover()
+    log_expense_rows(None, rows, str(tmp_path), mover, Select2Catalog(str(tmp_path / "c.json")), report, http_client=client)
+
+    assert report.succeeded == ["2"]
+    assert report.failed == [("1", "1216298", "HTTP submit outcome unknown")]
+    assert mover.added == ["2"]
@@ -0,0 +1,79 @@
+import pytest
+
+import metrics
+from metrics import Counter, Gauge, Histogram, Registry, observe_span
+
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+
+def test_counter_and_gauge_render(registry):
+    expenses = registry.register(Counter("expenses_total", "Expenses", ("kind", "status")))
+    jobs = registry.register(Gauge("jobs", "Jobs"))
+    expenses.labels("single", "success").inc()
+    expenses.labels("single", "success").inc(2)
+    expenses.labels("batch", "failed").inc()
+    jobs.set(4)
+
+    assert registry.render() == "\n".join([
+        "# HELP expenses_total Expenses",
+        "# TYPE expenses_total counter",
+        'expenses_total{kind="batch",status="failed"} 1.0',
+        'expenses_total{kind="single",status="success"} 3.0',
+        "# HELP jobs Jobs",
+        "# TYPE jobs gauge",
+        "jobs 4.0",
+    ]) + "\n"
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    latency = registry.register(Histogram("latency_seconds", "Latency", ("call",), buckets=(1, 0.1)))
+    for seconds in (0.05, 0.5, 0.7, 3):
+        latency.labels("update").observe(seconds)
+
+    assert latency.render()[2:] == [
+        'latency_seconds_bucket{call="update",le="0.1"} 1',
+        'latency_seconds_bucket{call="update",le="1.0"} 3',
+        'latency_seconds_bucket{call="update",le="+Inf"} 4',
+        'latency_seconds_sum{call="update"} 4.25',
+        'latency_seconds_count{call="update"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("errors_total", "Errors", ("message",))
+    counter.labels('bad "quote"\\ and\nnewline').inc()
+    assert counter.render()[2] == 'errors_total{message="bad \\"quote\\"\\\\ and\\nnewline"} 1.0'
+
+
+def test_wrong_label_count_is_an_error():
+    with pytest.raises(ValueError):
+        Counter("expenses_total", "Expenses", ("kind", "status")).labels("single")
+
+
+def test_failing_collector_does_not_break_the_scrape(registry, capsys):
+    jobs = registry.register(Gauge("jobs", "Jobs", ("status",)))
+
+    def broken():
+        raise RuntimeError("queue locked")
+
+    registry.add_collector(broken)
+    registry.add_collector(lambda: jobs.labels("queued").set(2))
+    assert 'jobs{status="queued"} 2.0' in registry.render()
+    assert "Metrics collector broken failed: queue locked" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("name, metric, labels", [
+    ("step.select2", "EXPENSE_STEP_SECONDS", ("select2",)),
+    ("drive.update", "API_CALL_SECONDS", ("drive", "update")),
+    ("sheets.read", "API_CALL_SECONDS", ("sheets", "read")),
+    ("login", "SPAN_SECONDS", ("login",)),
+    ("drive", "SPAN_SECONDS", ("drive",)),
+])
+def test_spans_are_filed_by_name(name, metric, labels):
+    series = getattr(metrics, metric).labels(*labels)
+    before = sum(series.counts)
+    observe_span(name, 0.2)
+    assert sum(series.counts) == before + 1
@@ -0,0 +1,46 @@
+import os
+
+import bill_generation
+from bill_generation import generate_pdfs_from_gsheet, render_invoices_parallel
+
+
+def jobs(folder, n):
+    return [(str(i), "1216298", "Sanjyot Patil", "The Blue Horizon", i * 100, folder) for i in range(1, n + 1)]
+
+
+def test_parallel_results_come_back_in_job_order(tmp_path):
+    folder = str(tmp_path)
+    blocked = tmp_path / "file"
+    blocked.write_text("not a folder")
+    batch = jobs(folder, 5)
+    batch[2] = ("3", "1216298", "Sanjyot Patil", "The Blue Horizon", 300, str(blocked / "bills"))
+
+    results = list(render_invoices_parallel(batch, max_workers=2))
+    assert [job for job, _, _ in results] == batch
+    for job, result, error in results:
+        if job[0] == "3":
+            assert result is None and error.startswith(("FileExistsError", "NotADirectoryError"))
+        else:
+            assert error is None and result == os.path.join(folder, f"{job[0]}.pdf")
+            assert os.path.exists(result)
+
+
+def test_in_memory_returns_the_same_bytes_as_serial(tmp_path):
+    batch = jobs(str(tmp_path), 3)
+
+    serial = list(render_invoices_parallel(batch, max_workers=1, in_memory=True))
+    parallel = list(render_invoices_parallel(batch, max_workers=2, in_memory=True))
+    assert [r for _, r, _ in parallel] == [r for _, r, _ in serial]
+    assert all(r.startswith(b"%PDF") for _, r, _ in parallel)
+    assert os.listdir(tmp_path) == []
+
+
+def test_generate_parallel_uploads_every_row(tmp_path, monkeypatch, gs_client, drive):
+    monkeypatch.setattr(bill_generation, "get_gs_client", lambda: gs_client)
+    folder = str(tmp_path / "bills")
+
+    rows = generate_pdfs_from_gsheet(folder, parallel=True, max_workers=2, in_memory=True)
+    assert [r["unqid"] for r in rows] == ["1", "2", "3", "4", "5"]
+    for r in rows:
+        [file] = drive.named(f"{r['unqid']}.pdf")
+        assert drive.contents[file["id"]] == r["pdf"]
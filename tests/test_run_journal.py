@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from bill_generation import RunJournal, journal_key
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "journal" / "run.jsonl")
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resume_from_furthest_stage(path, bill_row):
+    key = journal_key(bill_row())
+    journal = RunJournal(path)
+    journal.record("1", key, "submitting")
+    journal.record("1", key, "submitted", via="http")
+    journal.close()
+
+    resumed = RunJournal(path)
+    assert resumed.stage("1", key) == "submitted"
+    assert resumed.entries["1"]["stages"]["submitted"]["via"] == "http"
+    assert resumed.stage("2", key) is None
+    resumed.close()
+
+
+def test_changed_row_starts_over(path, bill_row):
+    journal = RunJournal(path)
+    journal.record("1", journal_key(bill_row()), "submitted")
+    journal.close()
+
+    edited = journal_key(bill_row(amount=3000))
+    assert edited != journal_key(bill_row())
+    resumed = RunJournal(path)
+    assert resumed.stage("1", edited) is None
+    resumed.record("1", edited, "submitting")
+    assert resumed.stage("1", edited) == "submitting"
+    resumed.close()
+
+
+def test_compact_drops_moved_rows(path):
+    journal = RunJournal(path)
+    journal.record("1", "k1", "submitted")
+    journal.record("1", "k1", "moved")
+    journal.record("2", "k2", "submitting")
+    journal.record("2", "k2", "submitted")
+    journal.compact()
+    # still appendable after the rewrite
+    journal.record("3", "k3", "submitting")
+    journal.close()
+
+    assert [(r["unqid"], r["stage"]) for r in read_lines(path)] == [
+        ("2", "submitting"), ("2", "submitted"), ("3", "submitting"),
+    ]
+    resumed = RunJournal(path)
+    assert resumed.stage("1", "k1") is None
+    assert resumed.stage("2", "k2") == "submitted"
+    resumed.close()
+
+
+def test_compact_drops_rows_gone_from_the_sheet(path):
+    journal = RunJournal(path)
+    journal.record("1", "k1", "submitting")
+    journal.record("2", "k2", "submitting")
+    journal.compact(current={"2", "3"})
+    journal.close()
+    assert [r["unqid"] for r in read_lines(path)] == ["2"]
+
+
+def test_torn_tail_is_dropped_before_appending(path):
+    journal = RunJournal(path)
+    journal.record("1", "k1", "submitted")
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"unqid": "2", "key": "k2", "sta')
+
+    resumed = RunJournal(path)
+    assert resumed.stage("1", "k1") == "submitted"
+    assert "2" not in resumed.entries
+    resumed.record("2", "k2", "submitting")
+    resumed.close()
+
+    assert [(r["unqid"], r["stage"]) for r in read_lines(path)] == [
+        ("1", "submitted"), ("2", "submitting"),
+    ]
+    reopened = RunJournal(path)
+    assert reopened.stage("2", "k2") == "submitting"
+    reopened.close()
+
+
+def test_unreadable_lines_are_skipped(path):
+    RunJournal(path).close()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("not json\n")
+        f.write(json.dumps({"unqid": "1", "key": "k1", "stage": "submitting"}) + "\n")
+        # well-formed, but missing fields or from an older schema
+        f.write(json.dumps({"unqid": "1", "stage": "submitted"}) + "\n")
+        f.write(json.dumps(["1", "k1", "submitted"]) + "\n")
+        f.write(json.dumps({"unqid": "1", "key": "k1", "stage": "uploaded"}) + "\n")
+    journal = RunJournal(path)
+    assert journal.stage("1", "k1") == "submitting"
+    journal.compact()
+    journal.close()
+    assert [r["stage"] for r in read_lines(path)] == ["submitting"]
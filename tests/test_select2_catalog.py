@@ -0,0 +1,109 @@
+import json
+import time
+
+import bill_generation
+from bill_generation import (
+    AJAX_IDLE,
+    INJECT_SELECT_VALUE,
+    SCRAPE_SELECT_OPTIONS,
+    SELECT_VALUE,
+    SELECTED_OPTION,
+    Select2Catalog,
+    choose_select2,
+)
+
+VENDOR = "select2-vendor_name-container"
+
+
+class FakeSelectDriver:
+    """
+    Answers the catalog's scripts for one page of <select>s: options maps
+    field -> [(text, value)], selected field -> (text, value)
+    """
+
+    def __init__(self, options=None):
+        self.options = options or {}
+        self.selected = {}
+        self.scripts = []
+
+    def execute_script(self, script, *args):
+        self.scripts.append(script)
+        if script == AJAX_IDLE:
+            return True
+        if script == SCRAPE_SELECT_OPTIONS:
+            return {field: [list(o) for o in self.options.get(field, [])] for field in args[0]}
+        if script == INJECT_SELECT_VALUE:
+            field, value, text = args
+            self.selected[field] = (text, value)
+            return True
+        if script == SELECT_VALUE:
+            return self.selected.get(args[0], (None, None))[1]
+        if script == SELECTED_OPTION:
+            return list(self.selected[args[0]]) if args[0] in self.selected else None
+        raise AssertionError(f"unexpected script {script[:40]!r}")
+
+
+def test_lookup_ignores_case_and_spacing(tmp_path):
+    catalog = Select2Catalog(str(tmp_path / "catalog.json"))
+    catalog.learn("vendor_name", "Sanjyot  Patil", "41")
+    assert catalog.lookup("vendor_name", " sanjyot patil") == ("Sanjyot  Patil", "41")
+    assert catalog.lookup("vendor_name", "Sanjyot Patil Caterers") is None
+    assert catalog.lookup("expenshead", "Sanjyot Patil") is None
+
+
+def test_save_and_load_drop_entries_past_the_ttl(tmp_path):
+    path = str(tmp_path / "stayvista" / "catalog.json")
+    catalog = Select2Catalog(path)
+    catalog.learn("vendor_name", "Sanjyot Patil", "41")
+    catalog.learn("expenshead", "Cook Charges", "7")
+    catalog.fields["expenshead"]["cook charges"][2] = time.time() - 2 * 3600
+    catalog.save()
+
+    loaded = Select2Catalog.load(path, ttl=3600)
+    assert loaded.lookup("vendor_name", "Sanjyot Patil") == ("Sanjyot Patil", "41")
+    assert loaded.lookup("expenshead", "Cook Charges") is None
+    assert not loaded.scraped
+
+
+def test_missing_or_corrupt_catalog_loads_empty(tmp_path):
+    path = tmp_path / "catalog.json"
+    assert Select2Catalog.load(str(path)).fields == {}
+    path.write_text("{")
+    assert Select2Catalog.load(str(path)).fields == {}
+
+
+def test_scrape_learns_every_rendered_option(tmp_path):
+    driver = FakeSelectDriver({"vendor_name": [("Sanjyot Patil", "41")], "expenshead": [("Cook Charges", "7")]})
+    catalog = Select2Catalog(str(tmp_path / "catalog.json"))
+    catalog.scrape(driver)
+
+    assert catalog.scraped
+    assert catalog.lookup("expenshead", "cook charges") == ("Cook Charges", "7")
+    catalog.save()
+    with open(catalog.path, encoding="utf-8") as f:
+        assert set(json.load(f)) == {"vendor_name", "expenshead"}
+
+
+def test_known_value_is_set_without_searching(tmp_path, monkeypatch):
+    searched = []
+    monkeypatch.setattr(bill_generation, "select2_search", lambda *args: searched.append(args))
+    catalog = Select2Catalog(str(tmp_path / "catalog.json"))
+    catalog.learn("vendor_name", "Sanjyot Patil", "41")
+    driver = FakeSelectDriver()
+
+    choose_select2(driver, VENDOR, "Sanjyot Patil", catalog)
+    assert searched == []
+    assert driver.selected["vendor_name"] == ("Sanjyot Patil", "41")
+
+
+def test_unknown_value_is_searched_and_learned(tmp_path, monkeypatch):
+    driver = FakeSelectDriver()
+
+    def search(driver, container_id, value):
+        driver.selected["vendor_name"] = ("Sanjyot Patil", "41")
+    monkeypatch.setattr(bill_generation, "select2_search", search)
+    catalog = Select2Catalog(str(tmp_path / "catalog.json"))
+
+    choose_select2(driver, VENDOR, "sanjyot patil", catalog)
+    assert INJECT_SELECT_VALUE not in driver.scripts
+    assert catalog.lookup("vendor_name", "Sanjyot Patil") == ("Sanjyot Patil", "41")
@@ -0,0 +1,123 @@
+import os
+import time
+
+import pytest
+
+import bill_generation
+from bill_generation import READ_LOCAL_STORAGE, SESSION_IS_VALID, WRITE_LOCAL_STORAGE, SessionCache, login_with_session_cache
+
+COOKIE = {"name": "laravel_session", "value": "s3cret", "domain": "admin.vistarooms.com", "expiry": time.time() + 3600}
+
+
+class FakeSessionDriver:
+    """
+    Cookie jar and localStorage of one browser; valid is what the
+    authenticated session check resolves to
+    """
+
+    def __init__(self, cookies=(), local_storage=None, valid=True):
+        self.cookies = list(cookies)
+        self.local_storage = dict(local_storage or {})
+        self.valid = valid
+        self.visited = []
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def get_cookies(self):
+        return [dict(c) for c in self.cookies]
+
+    def add_cookie(self, cookie):
+        self.cookies.append(dict(cookie))
+
+    def delete_all_cookies(self):
+        self.cookies = []
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_script(self, script, *args):
+        if script == READ_LOCAL_STORAGE:
+            return dict(self.local_storage)
+        if script == WRITE_LOCAL_STORAGE:
+            self.local_storage.update(args[0])
+            return None
+        raise AssertionError(f"unexpected script {script[:40]!r}")
+
+    def execute_async_script(self, script, *args):
+        assert script == SESSION_IS_VALID
+        return self.valid
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.delenv("SESSION_CACHE_KEY", raising=False)
+    return SessionCache("ops@stayvista.com", "hunter2", path=str(tmp_path / "stayvista" / "admin_session.bin"))
+
+
+def test_saved_session_is_encrypted_and_private(cache):
+    cache.save(FakeSessionDriver([COOKIE], {"token": "abc"}))
+
+    with open(cache.path, "rb") as f:
+        assert b"s3cret" not in f.read()
+    assert os.stat(cache.path).st_mode & 0o777 == 0o600
+    state = cache.load()
+    assert state["cookies"] == [COOKIE]
+    assert state["local_storage"] == {"token": "abc"}
+
+
+def test_other_credentials_cannot_read_the_session(cache):
+    cache.save(FakeSessionDriver([COOKIE]))
+    other = SessionCache("ops@stayvista.com", "other", path=cache.path)
+    assert other.load() is None
+
+
+def test_expired_cookies_are_dropped(cache):
+    expired = {**COOKIE, "name": "old", "expiry": time.time() - 1}
+    cache.save(FakeSessionDriver([COOKIE, expired]))
+    assert [c["name"] for c in cache.load()["cookies"]] == ["laravel_session"]
+
+    cache.save(FakeSessionDriver([expired]))
+    assert cache.load() is None
+
+
+def test_cache_is_off_without_credentials_or_key(tmp_path, monkeypatch):
+    monkeypatch.delenv("SESSION_CACHE_KEY", raising=False)
+    cache = SessionCache("", "", path=str(tmp_path / "admin_session.bin"))
+    assert not cache.enabled
+    cache.save(FakeSessionDriver([COOKIE]))
+    assert not os.path.exists(cache.path)
+    assert cache.load() is None
+
+
+def test_restore_loads_a_valid_session_into_the_driver(cache):
+    cache.save(FakeSessionDriver([COOKIE], {"token": "abc"}))
+    driver = FakeSessionDriver()
+
+    assert cache.restore(driver)
+    assert driver.visited == ["https://admin.vistarooms.com/robots.txt"]
+    assert driver.cookies == [COOKIE]
+    assert driver.local_storage == {"token": "abc"}
+
+
+def test_restore_clears_an_expired_session(cache):
+    cache.save(FakeSessionDriver([COOKIE]))
+    driver = FakeSessionDriver(valid=False)
+
+    assert not cache.restore(driver)
+    assert driver.cookies == []
+    assert not os.path.exists(cache.path)
+
+
+def test_login_caches_the_new_session(cache, monkeypatch):
+    logins = []
+
+    def login(driver, username, password):
+        logins.append(username)
+        driver.cookies = [COOKIE]
+        return True
+    monkeypatch.setattr(bill_generation, "login_to_stayvista", login)
+
+    assert login_with_session_cache(FakeSessionDriver(), "ops@stayvista.com", "hunter2", cache)
+    assert login_with_session_cache(FakeSessionDriver(), "ops@stayvista.com", "hunter2", cache)
+    assert logins == ["ops@stayvista.com"]
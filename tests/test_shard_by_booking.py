@@ -0,0 +1,31 @@
+from bill_generation import shard_by_booking
+
+
+def rows(*bookings):
+    return [{"unqid": str(i), "booking_id": b} for i, b in enumerate(bookings, start=1)]
+
+
+def layout(shards):
+    return [[r["unqid"] for r in shard] for shard in shards]
+
+
+def test_booking_stays_on_one_shard_in_sheet_order():
+    shards = shard_by_booking(rows("A", "B", "A", "C", "B", "A"), 2)
+    # C arrives when the first shard is the bigger one
+    assert layout(shards) == [["1", "3", "6"], ["2", "4", "5"]]
+
+
+def test_new_bookings_go_to_the_smallest_shard():
+    shards = shard_by_booking(rows("A", "A", "A", "B", "C", "D"), 2)
+    assert layout(shards) == [["1", "2", "3"], ["4", "5", "6"]]
+
+
+def test_booking_ids_compare_as_text():
+    shards = shard_by_booking([{"unqid": "1", "booking_id": 1216298}, {"unqid": "2", "booking_id": "1216298"}], 2)
+    assert layout(shards) == [["1", "2"]]
+
+
+def test_empty_shards_are_dropped():
+    assert layout(shard_by_booking(rows("A", "A"), 4)) == [["1", "2"]]
+    assert shard_by_booking([], 3) == []
+    assert layout(shard_by_booking(rows("A", "B"), 0)) == [["1", "2"]]
@@ -0,0 +1,73 @@
+import pytest
+
+from bill_generation import SheetRowMover
+
+
+def deleted_indices(update):
+    return [r["deleteDimension"]["range"]["startIndex"] for r in update["requests"]]
+
+
+def test_moves_batch_in_sheet_order_and_deletes_bottom_up(sheets, gs_client):
+    moved = []
+    mover = SheetRowMover(gs_client, batch_size=10, on_moved=moved.extend)
+    for unqid in ("4", "2", "5", "missing"):
+        mover.add(unqid)
+    mover.flush()
+
+    logs = sheets.worksheet("admin logs")
+    assert [row[1:3] for row in logs.appended] == [["2", "1229927"], ["4", "1229927"], ["5", "1216298"]]
+    assert [row[6] for row in logs.appended] == [200, 400, 500]
+    [update] = sheets.updates
+    assert deleted_indices(update) == [5, 4, 2]
+    assert all(r["deleteDimension"]["range"]["sheetId"] == 7 for r in update["requests"])
+    assert [row[0] for row in sheets.worksheet("to be logged").rows] == ["SRNO", "1", "3"]
+    assert sorted(moved) == ["2", "4", "5"]
+
+
+def test_flushes_when_batch_is_full(sheets, gs_client):
+    mover = SheetRowMover(gs_client, batch_size=2)
+    mover.add("1")
+    assert sheets.updates == []
+    mover.add("3")
+    assert len(sheets.updates) == 1
+    assert mover.pending == []
+
+
+def test_reconcile_skips_rows_already_in_admin_logs(sheets, gs_client):
+    logs = sheets.worksheet("admin logs")
+    logs.rows.append(["01-Jan-2024", "1", "1216298"])
+    moved = []
+    mover = SheetRowMover(gs_client, on_moved=moved.extend)
+    mover.add("1", reconcile=True)
+    mover.add("3", reconcile=True)
+    mover.flush()
+
+    # "1" was appended by the interrupted run, "3" was not
+    assert [row[1] for row in logs.appended] == ["3"]
+    assert deleted_indices(sheets.updates[0]) == [3, 1]
+    assert mover.reconcile == set()
+    assert sorted(moved) == ["1", "3"]
+
+
+def test_reconciled_row_already_gone_counts_as_moved(sheets, gs_client):
+    moved = []
+    mover = SheetRowMover(gs_client, on_moved=moved.extend)
+    mover.add("gone", reconcile=True)
+    mover.add("missing")
+    mover.flush()
+    assert moved == ["gone"]
+    assert sheets.worksheet("admin logs").appended == []
+
+
+def test_failed_flush_keeps_rows_pending(sheets, gs_client):
+    mover = SheetRowMover(gs_client)
+    mover.add("1")
+    sheets.fail = True
+    with pytest.raises(ConnectionError):
+        mover.flush()
+    assert mover.pending == ["1"]
+    sheets.fail = False
+    mover.add("3")
+    mover.flush()
+    assert mover.pending == []
+    assert deleted_indices(sheets.updates[0]) == [3, 1]
@@ -0,0 +1,85 @@
+import pytest
+
+import bill_generation
+from bill_generation import StatusProgress, update_status
+
+GREEN = {"red": 0.8, "green": 1, "blue": 0.8}
+
+
+class FakeSheetsService:
+    """
+    spreadsheets().batchUpdate(...).execute() of the Sheets v4 API
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def spreadsheets(self):
+        return self
+
+    def batchUpdate(self, spreadsheetId=None, body=None):
+        self.batches.append((spreadsheetId, body))
+        return self
+
+    def execute(self):
+        if self.fail:
+            raise ConnectionError("sheets down")
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = FakeSheetsService()
+    monkeypatch.setattr(bill_generation, "get_sheets_service", lambda: service)
+    monkeypatch.setattr(bill_generation, "_status_sheet_ids", None)
+    return service
+
+
+def cells(batch):
+    """
+    (row, text) of every cell one batchUpdate writes
+    """
+    _, body = batch
+    return [
+        (r["updateCells"]["start"]["rowIndex"], r["updateCells"]["rows"][0]["values"][0]["userEnteredValue"]["stringValue"])
+        for r in body["requests"]
+    ]
+
+
+def test_status_and_stamp_are_one_batch_update(service, gs_client):
+    update_status(gs_client, "Failed to Log", GREEN)
+    update_status(gs_client, "Logging", GREEN, stamp=False)
+
+    assert len(service.batches) == 2
+    assert service.batches[0][0] == "vista-logs"
+    [(row, text), (stamp_row, stamp)] = cells(service.batches[0])
+    assert (row, text, stamp_row) == (0, "Failed to Log", 1)
+    assert stamp
+    assert cells(service.batches[1]) == [(0, "Logging"), (1, "")]
+
+
+def test_failed_status_write_is_only_reported(service, gs_client, capsys):
+    service.fail = True
+    update_status(gs_client, "Logging", GREEN)
+    assert "Failed to update status cell" in capsys.readouterr().out
+
+
+def test_progress_writes_at_most_once_per_interval(service, gs_client, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(bill_generation.time, "monotonic", lambda: clock[0])
+    progress = StatusProgress(gs_client, 10, min_interval=15)
+
+    clock[0] += 20
+    progress.update(2)
+    clock[0] += 5
+    progress.update(3)
+    progress.update(4)
+    clock[0] += 15
+    progress.update(5)
+    progress.update(10, force=True)
+
+    assert [cells(b)[0][1] for b in service.batches] == [
+        "2/10 logged, ETA 1m",
+        "5/10 logged, ETA 40s",
+        "10/10 logged",
+    ]
@@ -0,0 +1,103 @@
+import json
+import threading
+
+import pytest
+
+import timing
+from timing import StepTimer, percentile
+
+
+@pytest.fixture
+def timer(tmp_path):
+    return StepTimer(str(tmp_path / "logs" / "timings.jsonl"))
+
+
+def records(timer):
+    with open(timer.path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_expense_record_has_steps_and_spans(timer):
+    timer.begin("7", booking_id="1216298")
+    timer.mark("form")
+    with timer.span("select2.vendor_name"):
+        pass
+    timer.mark("submit")
+    record = timer.finish(ok=True)
+
+    assert [step for step, _ in record["steps"]] == ["form", "submit"]
+    assert [name for name, _ in record["spans"]] == ["select2.vendor_name"]
+    assert (record["unqid"], record["booking_id"], record["ok"], record["run"]) == ("7", "1216298", True, timer.run_id)
+    assert records(timer) == [record]
+    assert set(timer.summary()) == {"step.form", "step.submit", "select2.vendor_name", "expense.total"}
+
+
+def test_records_are_per_thread(timer):
+    timer.begin("1")
+    thread = threading.Thread(target=lambda: (timer.mark("elsewhere"), timer.finish()))
+    thread.start()
+    thread.join()
+    timer.mark("form")
+
+    assert timer.finish()["unqid"] == "1"
+    assert len(records(timer)) == 1
+    assert "step.elsewhere" not in timer.summary()
+
+
+def test_log_is_rotated_past_the_size_limit(timer, monkeypatch):
+    monkeypatch.setattr(timing, "TIMING_LOG_MAX_BYTES", 200)
+    for unqid in range(5):
+        timer.begin(unqid)
+        timer.finish()
+
+    with open(timer.path + ".1", encoding="utf-8") as f:
+        rotated = [json.loads(line)["unqid"] for line in f]
+    current = [r["unqid"] for r in records(timer)]
+    assert rotated and current
+    # older rotations are dropped; what is kept is the latest, in order
+    kept = rotated + current
+    assert kept == [str(i) for i in range(5 - len(kept), 5)]
+
+
+def test_summary_percentiles_and_window(timer, monkeypatch):
+    monkeypatch.setattr(timing, "TIMING_WINDOW", 10)
+    for seconds in range(1, 21):
+        timer.add("drive.update", seconds)
+
+    stats = timer.summary()["drive.update"]
+    # only the latest 10 durations: 11..20
+    assert stats == {"n": 10, "total": 155, "p50": 16, "p95": 20, "max": 20}
+    assert percentile([1, 2, 3, 4], 0.5) == 3
+
+
+def test_listeners_see_every_duration(timer):
+    seen = []
+    timer.listeners.append(lambda name, seconds: seen.append(name))
+
+    @timer.timed("sheets.read")
+    def read():
+        return "rows"
+
+    assert read() == "rows"
+    timer.begin("1")
+    timer.mark("form")
+    timer.finish()
+    assert seen == ["sheets.read", "step.form", "expense.total"]
+
+
+def test_summary_is_appended_as_a_run_record(timer, capsys):
+    timer.add("login", 2.5)
+    timer.print_summary()
+
+    assert "login" in capsys.readouterr().out
+    [record] = records(timer)
+    assert record["type"] == "run" and record["stats"]["login"]["n"] == 1
+
+
+def test_unwritable_log_is_only_reported(tmp_path, capsys):
+    blocked = tmp_path / "file"
+    blocked.write_text("")
+    timer = StepTimer(str(blocked / "timings.jsonl"))
+    timer.begin("1")
+    assert timer.finish()["unqid"] == "1"
+    assert "Could not write timing record" in capsys.readouterr().out
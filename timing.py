@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+
+TIMING_LOG_PATH = os.getenv(
+    "TIMING_LOG_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "stayvista", "expense_timings.jsonl")
+)
+# The log is moved to <path>.1 once it grows past this
+TIMING_LOG_MAX_BYTES = int(os.getenv("TIMING_LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+# Durations kept per name for summary(); a long-running server keeps the latest
+TIMING_WINDOW = int(os.getenv("TIMING_WINDOW", "10000"))
+
+
+def percentile(sorted_values, q):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+# ------------------ Step Timer ------------------
+class StepTimer:
+    """
+    Durations per step and external call for the whole process, plus one
+    timing record per expense. span() times a block; mark() ends the
+    current step of the expense this thread is logging and starts the next.
+    Each expense record goes to the JSONL log as it finishes. listeners are
+    called with (name, seconds) for everything timed
+    """
+
+    def __init__(self, path=TIMING_LOG_PATH):
+        self.path = path
+        self.run_id = uuid.uuid4().hex[:12]
+        self.durations = {}
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _aggregate(self, name, seconds):
+        with self._lock:
+            times = self.durations.get(name)
+            if times is None:
+                times = self.durations[name] = deque(maxlen=TIMING_WINDOW)
+            times.append(seconds)
+        for listener in self.listeners:
+            listener(name, seconds)
+
+    def add(self, name, seconds):
+        self._aggregate(name, seconds)
+        record = getattr(self._local, "record", None)
+        if record is not None:
+            record["spans"].append([name, round(seconds, 4)])
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """
+        Decorator form of span()
+        """
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # ---------- per-expense records ----------
+    def begin(self, unqid, **fields):
+        """
+        Start the timing record of one expense on this thread
+        """
+        self._local.record = {
+            "type": "expense",
+            "run": self.run_id,
+            "ts": _now(),
+            "unqid": str(unqid),
+            **fields,
+            "steps": [],
+            "spans": [],
+        }
+        self._local.started = self._local.step_started = time.perf_counter()
+        self._local.step = None
+
+    def mark(self, step):
+        """
+        End the current step of this thread's expense and start step
+        """
+        if getattr(self._local, "record", None) is None:
+            return
+        now = time.perf_counter()
+        self._end_step(now)
+        self._local.step = step
+        self._local.step_started = now
+
+    def _end_step(self, now):
+        step = self._local.step
+        if step is None:
+            return
+        seconds = now - self._local.step_started
+        self._local.record["steps"].append([step, round(seconds, 4)])
+        self._aggregate(f"step.{step}", seconds)
+
+    def finish(self, **fields):
+        """
+        Close this thread's expense record and append it to the log
+        """
+        record = getattr(self._local, "record", None)
+        if record is None:
+            return None
+        now = time.perf_counter()
+        self._end_step(now)
+        self._local.record = None
+        total = now - self._local.started
+        record.update(fields)
+        record["total"] = round(total, 4)
+        self._aggregate("expense.total", total)
+        self._write(record)
+        return record
+
+    def _write(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        try:
+            with self._write_lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                try:
+                    if os.path.getsize(self.path) > TIMING_LOG_MAX_BYTES:
+                        os.replace(self.path, self.path + ".1")
+                except OSError:
+                    pass
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            print(f"⚠️ Could not write timing record: {e}")
+
+    # ---------- summary ----------
+    def summary(self):
+        """
+        {name: {n, total, p50, p95, max}} over everything timed so far (the
+        latest TIMING_WINDOW per name)
+        """
+        with self._lock:
+            durations = {name: sorted(times) for name, times in self.durations.items()}
+        return {
+            name: {
+                "n": len(times),
+                "total": round(sum(times), 4),
+                "p50": round(percentile(times, 0.5), 4),
+                "p95": round(percentile(times, 0.95), 4),
+                "max": round(times[-1], 4),
+            }
+            for name, times in durations.items() if times
+        }
+
+    def print_summary(self):
+        """
+        Print p50/p95/max per step and call, slowest total first, and append
+        the same numbers to the log as a "run" record
+        """
+        stats = self.summary()
+        if not stats:
+            return
+        print(f"{'Timing':<40} {'n':>5} {'p50':>8} {'p95':>8} {'max':>8} {'total':>9}")
+        for name, s in sorted(stats.items(), key=lambda item: -item[1]["total"]):
+            print(
+                f"  {name[:38]:<38} {s['n']:>5} {s['p50']:>7.2f}s {s['p95']:>7.2f}s"
+                f" {s['max']:>7.2f}s {s['total']:>8.1f}s"
+            )
+        self._write({"type": "run", "run": self.run_id, "ts": _now(), "stats": stats})
+
+
+TIMER = StepTimer()